@@ -0,0 +1,63 @@
+import numpy as np
+
+from skat_text import EventRenderer, EVENT_VERBOSITY, VERBOSE_PRIVATE_INFO
+
+
+class GameLog:
+    """
+    Events of a single SkatGame as compact (event type, player, card, value) integer tuples, see EVENT_ constants in skat.
+
+    Logging an event only appends a tuple. Text is rendered when the log is read, so whole games can be logged in
+    large runs and only the interesting ones are looked at.
+    """
+
+    def __init__(self, player_texts, behaviours):
+        """
+        Args:
+            player_texts: Text of each player, like 'BasicAI (0)'
+            behaviours: Behaviour of each player
+        """
+        self.player_texts = list(player_texts)
+        self.behaviours = behaviours
+        self.events = []
+
+    def add(self, event_type, player=-1, card=-1, value=0):
+        self.events.append((event_type, player, card, value))
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def to_array(self):
+        """
+        Returns:
+            np.array: int64 (number of events, 4)
+        """
+        return np.array(self.events, dtype=np.int64).reshape(-1, 4)
+
+    def get_lines(self, verbosity=VERBOSE_PRIVATE_INFO):
+        """
+        Args:
+            verbosity (int): VERBOSE_ constant, events above it are left out
+
+        Returns:
+            list: German text of every event, as printed by SkatGame with this verbosity
+        """
+        renderer = EventRenderer(self.player_texts, self.behaviours)
+        lines = []
+        line = ""
+        for event in self.events:
+            if EVENT_VERBOSITY[event[0]] <= verbosity:
+                line += renderer.render(event)
+                if renderer.ends_line(event):
+                    lines.append(line)
+                    line = ""
+        return lines
+
+    def get_text(self, verbosity=VERBOSE_PRIVATE_INFO):
+        return "\n".join(self.get_lines(verbosity))
+
+    def print(self, verbosity=VERBOSE_PRIVATE_INFO):
+        print(self.get_text(verbosity))
@@ -0,0 +1,199 @@
+import numpy as np
+from numba import int8, int64, uint32
+from numba.experimental import jitclass
+
+from skat import get_valid_actions, get_trick_winner, count_points, remove_card, add_card, get_bitmap, get_decided_outcome, NULL, EXTRA_TIER_SCHWARZ, \
+    EXTRA_TIER_SCHNEIDER
+
+# Sides for points and tricks_won
+SOLO = 0
+TEAM = 1
+
+spec = [
+    ("hands", uint32[:]),  # hand cards of each player, bitmaps
+    ("game_type", int64),
+    ("extra_tier", int64),
+    ("solo_player", int64),
+    ("leader", int64),  # player who leads the current trick
+    ("player", int64),  # player to move
+    ("trick_number", int64),  # completed tricks
+    ("cards_in_trick", int64),  # cards played in the current trick
+    ("points", int64[:]),  # card points of SOLO (including the Skat) and TEAM
+    ("tricks_won", int64[:]),  # tricks of SOLO and TEAM
+    # The tricks are the undo stack: every played card stays in tricks, every completed trick in leaders/winners/trick_points
+    ("tricks", int8[:, :]),  # card played by each player in each trick, -1 if not played yet
+    ("leaders", int8[:]),  # leader of each trick
+    ("winners", int8[:]),  # winner of each completed trick
+    ("trick_points", int64[:]),  # points of each completed trick
+]
+
+
+@jitclass(spec)
+class GameState:
+    """
+    Compiled state of the playing phase, for search agents that apply and undo millions of moves.
+
+    Players are indexes like in SkatGame. make_move and unmake_move only change a few fields, the tricks played
+    so far act as the undo stack.
+    """
+
+    def __init__(self, hands, skat, game_type, extra_tier, solo_player, leader):
+        """
+        Args:
+            hands: np.uint32 array of the 3 hands, copied
+            skat (int): bitmap, counts for the solo player
+            game_type (int): Color (0-3), Grand (4), Null (5)
+            extra_tier (int): EXTRA_TIER_ constant
+            solo_player (int): 0-2
+            leader (int): Player who leads the first trick (forehand)
+        """
+        self.hands = hands.copy()
+        self.game_type = game_type
+        self.extra_tier = extra_tier
+        self.solo_player = solo_player
+        self.leader = leader
+        self.player = leader
+        self.trick_number = 0
+        self.cards_in_trick = 0
+        self.points = np.zeros(2, dtype=np.int64)
+        self.points[SOLO] = count_points(np.uint32(skat))
+        self.tricks_won = np.zeros(2, dtype=np.int64)
+        self.tricks = np.full((10, 3), -1, dtype=np.int8)
+        self.leaders = np.full(10, -1, dtype=np.int8)
+        self.leaders[0] = leader
+        self.winners = np.full(10, -1, dtype=np.int8)
+        self.trick_points = np.zeros(10, dtype=np.int64)
+
+    def copy(self):
+        state = GameState(self.hands, np.uint32(0), self.game_type, self.extra_tier, self.solo_player, self.leader)
+        state.player = self.player
+        state.trick_number = self.trick_number
+        state.cards_in_trick = self.cards_in_trick
+        state.points[:] = self.points
+        state.tricks_won[:] = self.tricks_won
+        state.tricks[:] = self.tricks
+        state.leaders[:] = self.leaders
+        state.winners[:] = self.winners
+        state.trick_points[:] = self.trick_points
+        return state
+
+    def load(self, other):
+        """Copies the state of other into this state without allocating, for reusing one state across search iterations"""
+        self.hands[:] = other.hands
+        self.game_type = other.game_type
+        self.extra_tier = other.extra_tier
+        self.solo_player = other.solo_player
+        self.leader = other.leader
+        self.player = other.player
+        self.trick_number = other.trick_number
+        self.cards_in_trick = other.cards_in_trick
+        self.points[:] = other.points
+        self.tricks_won[:] = other.tricks_won
+        self.tricks[:] = other.tricks
+        self.leaders[:] = other.leaders
+        self.winners[:] = other.winners
+        self.trick_points[:] = other.trick_points
+
+    def get_legal_moves(self):
+        """
+        Returns:
+            np.uint32: Bitmap of the cards the player to move may play
+        """
+        hand_cards = self.hands[self.player]
+        if self.cards_in_trick == 0:
+            return hand_cards
+        return get_valid_actions(self.game_type, self.tricks[self.trick_number, self.leader], hand_cards)
+
+    def get_current_trick(self):
+        """
+        Returns:
+            np.array: int8 size 3, cards of the current trick by player, -1 if not played yet
+        """
+        if self.trick_number == 10:
+            return np.full(3, -1, dtype=np.int8)
+        return self.tricks[self.trick_number]
+
+    def make_move(self, card):
+        """Plays card (has to be a legal move) for the player to move"""
+        t = self.trick_number
+        self.tricks[t, self.player] = card
+        self.hands[self.player] = remove_card(self.hands[self.player], card)
+        if self.cards_in_trick < 2:
+            self.cards_in_trick += 1
+            self.player = (self.player + 1) % 3
+            return
+        winner = get_trick_winner(self.game_type, self.tricks[t], self.tricks[t, self.leader])
+        points = count_points(get_bitmap(self.tricks[t]))
+        side = SOLO if winner == self.solo_player else TEAM
+        self.points[side] += points
+        self.tricks_won[side] += 1
+        self.winners[t] = winner
+        self.trick_points[t] = points
+        self.trick_number = t + 1
+        self.cards_in_trick = 0
+        self.leader = winner
+        self.player = winner
+        if t < 9:
+            self.leaders[t + 1] = winner
+
+    def unmake_move(self):
+        """Takes back the last card played"""
+        if self.cards_in_trick == 0:
+            # The last card completed a trick
+            t = self.trick_number - 1
+            if t < 0:
+                return
+            winner = self.winners[t]
+            side = SOLO if winner == self.solo_player else TEAM
+            self.points[side] -= self.trick_points[t]
+            self.tricks_won[side] -= 1
+            self.winners[t] = -1
+            self.trick_points[t] = 0
+            if t < 9:
+                self.leaders[t + 1] = -1
+            self.trick_number = t
+            self.leader = self.leaders[t]
+            self.cards_in_trick = 2
+            self.player = (self.leader + 2) % 3
+        else:
+            self.cards_in_trick -= 1
+            self.player = (self.player + 2) % 3
+        t = self.trick_number
+        card = self.tricks[t, self.player]
+        self.tricks[t, self.player] = -1
+        self.hands[self.player] = add_card(self.hands[self.player], card)
+
+    def is_terminal(self):
+        """All cards played, or the game is decided early like in SkatGame.playing (Null and Schwarz announced)"""
+        if self.trick_number == 10:
+            return True
+        if self.game_type == NULL:
+            return self.tricks_won[SOLO] > 0
+        return self.extra_tier >= EXTRA_TIER_SCHWARZ and self.tricks_won[TEAM] > 0
+
+    def is_solo_win(self):
+        """Result of a terminal state, decided like in SkatGame.playing"""
+        if self.game_type == NULL:
+            return self.tricks_won[SOLO] == 0
+        if self.extra_tier >= EXTRA_TIER_SCHWARZ and self.tricks_won[TEAM] > 0:
+            return False
+        if self.extra_tier == EXTRA_TIER_SCHNEIDER:
+            return self.points[TEAM] <= 30
+        return self.points[SOLO] > 60
+
+    def get_decided_outcome(self):
+        """
+        Lets search stop early once the outcome is fixed, see skat.get_decided_outcome. Only checked between tricks.
+
+        Returns:
+            tuple: (decided, solo_win, schneider, schwarz), always decided for terminal states
+        """
+        if self.is_terminal():
+            # Like SkatGame, Schneider and Schwarz are only set when all tricks of a non Null game have been played
+            counted = self.trick_number == 10 and self.game_type != NULL
+            return True, self.is_solo_win(), counted and self.points[TEAM] <= 30, counted and self.points[TEAM] == 0
+        if self.cards_in_trick != 0 or self.game_type == NULL:
+            return False, False, False, False
+        team_cards = self.hands[(self.solo_player + 1) % 3] | self.hands[(self.solo_player + 2) % 3]
+        return get_decided_outcome(self.game_type, self.extra_tier, self.points[SOLO], self.points[TEAM], self.hands[self.solo_player],
+                                   team_cards, self.leader == self.solo_player)
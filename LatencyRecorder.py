@@ -0,0 +1,114 @@
+from time import perf_counter_ns
+
+import numpy as np
+from tabulate import tabulate
+
+# Histogram bucket i counts calls that took less than 2^i nanoseconds, the last bucket everything slower
+NUMBER_OF_BUCKETS = 40
+
+# Agent methods that are timed
+AGENT_METHODS = ("receive_hand_cards", "say", "hear", "pickup_skat", "announce", "start_playing", "play_card")
+
+# Game phases timed by SkatGame
+PHASE_GAME = "game"
+PHASE_BIDDING = "bidding"
+PHASE_PLAYING = "playing"
+
+
+class LatencyRecorder:
+    """
+    Records call counts and latency histograms per agent and method, and per phase of SkatGame.
+
+    SkatGame only uses a recorder if one is passed, by wrapping its players in TimedPlayer. Without a recorder
+    nothing is wrapped and no timing code runs at all.
+    """
+
+    def __init__(self):
+        self.histograms = {}  # (label, method) -> np.int64 array of bucket counts
+        self.totals = {}  # (label, method) -> total nanoseconds
+        self.maxima = {}  # (label, method) -> slowest call in nanoseconds
+        self.labels = {}  # id(agent) -> label
+
+    def register(self, players):
+        """Names players by their index, so that equal agents can be told apart. Unregistered agents use get_name()."""
+        for i, player in enumerate(players):
+            self.labels[id(player)] = f"{player.get_name()} ({i})"
+
+    def get_label(self, player):
+        return self.labels.get(id(player)) or player.get_name()
+
+    def wrap(self, player):
+        return TimedPlayer(player, self, self.get_label(player))
+
+    def record(self, label, method, nanoseconds):
+        key = (label, method)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = np.zeros(NUMBER_OF_BUCKETS, dtype=np.int64)
+            self.totals[key] = 0
+            self.maxima[key] = 0
+        histogram[min(nanoseconds.bit_length(), NUMBER_OF_BUCKETS - 1)] += 1
+        self.totals[key] += nanoseconds
+        self.maxima[key] = max(self.maxima[key], nanoseconds)
+
+    def merge(self, other):
+        """Adds the recordings of another recorder, for example from a worker process"""
+        for key, histogram in other.histograms.items():
+            if key not in self.histograms:
+                self.histograms[key] = np.zeros(NUMBER_OF_BUCKETS, dtype=np.int64)
+                self.totals[key] = 0
+                self.maxima[key] = 0
+            self.histograms[key] += histogram
+            self.totals[key] += other.totals[key]
+            self.maxima[key] = max(self.maxima[key], other.maxima[key])
+
+    def get_percentile(self, key, percentile):
+        """Upper bound of the histogram bucket that contains the percentile, in nanoseconds"""
+        histogram = self.histograms[key]
+        bucket = np.searchsorted(np.cumsum(histogram), percentile / 100 * histogram.sum())
+        return min(1 << int(bucket), self.maxima[key])
+
+    def get_table(self):
+        """
+        Returns:
+            list: [label, method, calls, mean µs, p50 µs, p90 µs, p99 µs, max µs, total s] per recorded (label, method)
+        """
+        data = []
+        for key in sorted(self.histograms):
+            calls = int(self.histograms[key].sum())
+            data.append([*key, calls, round(self.totals[key] / calls / 1000, 2),
+                         *[round(self.get_percentile(key, p) / 1000, 2) for p in (50, 90, 99)],
+                         round(self.maxima[key] / 1000, 2), round(self.totals[key] / 1e9, 3)])
+        return data
+
+    def print_table(self):
+        print(tabulate(self.get_table(), headers=["Agent / Game", "Call / Phase", "Calls", "Mean µs", "p50 µs", "p90 µs", "p99 µs", "Max µs", "Total s"]))
+
+
+class TimedPlayer:
+    """
+    Wraps a player and records the latency of its agent methods. Everything else is passed through.
+    """
+
+    def __init__(self, player, recorder, label):
+        self.player = player
+        self.recorder = recorder
+        self.label = label
+        for method in AGENT_METHODS:
+            setattr(self, method, self._timed(method))
+
+    def _timed(self, method):
+        function = getattr(self.player, method)
+        record = self.recorder.record
+        label = self.label
+
+        def timed(*args):
+            start = perf_counter_ns()
+            result = function(*args)
+            record(label, method, perf_counter_ns() - start)
+            return result
+
+        return timed
+
+    def __getattr__(self, name):
+        return getattr(self.player, name)
@@ -1,47 +1,82 @@
 from numbers import Number
+from time import perf_counter_ns
 
 import numpy as np
 
+import tracing
+from GameLog import GameLog
+from history import new_history, add_bidding_event, add_played_card, get_read_only_view
+from LatencyRecorder import PHASE_GAME, PHASE_BIDDING, PHASE_PLAYING
+
 from skat import deal_new_cards, BIDDING_VALUES, deal_new_cards_as_bitmaps, add_skat_to_hand, get_cards_that_have_been_removed, count_points, get_valid_actions, get_trick_winner, get_card_points, \
     NULL, EXTRA_TIER_SCHWARZ, EXTRA_TIER_SCHNEIDER, calculate_game_tier, BIDDING_BASE_VALUES, BIDDING_NULL, get_bitmap, remove_card, is_card_present, count_cards, EXTRA_TIER_OUVERT, \
-    EXTRA_TIER_NULL_OUVERT, EXTRA_TIER_NULL_HAND_OUVERT, RESULT_SOLO_WIN, RESULT_TEAM_WIN, RESULT_PASSED
-from skat_text import get_card_name, get_game_name, get_bitmap_text, VERBOSE_PUBLIC_INFO, VERBOSE_PRIVATE_INFO, get_list_text
+    EXTRA_TIER_NULL_OUVERT, EXTRA_TIER_NULL_HAND_OUVERT, RESULT_SOLO_WIN, RESULT_TEAM_WIN, RESULT_PASSED, \
+    CARD_LOCATION_SKAT, EVENT_GAME_START, EVENT_CARDS_DEALT, EVENT_PASS, EVENT_SAY, EVENT_HEAR, EVENT_HIGHEST_BID, EVENT_PICKUP_SKAT, \
+    EVENT_SKAT_PUT_BACK, EVENT_ANNOUNCE, EVENT_TRICK_HAND, EVENT_CARD_PLAYED, EVENT_TRICK_WON, EVENT_NULL_LOST, EVENT_SCHWARZ_LOST, \
+    EVENT_ALL_CARDS_PLAYED, EVENT_NULL_WON, EVENT_POINTS_COUNTED, EVENT_SCHNEIDER, EVENT_SCHWARZ, EVENT_WINNER, EVENT_GAME_VALUE, \
+    EVENT_GAME_POINTS, EVENT_GAME_OVER, EVENT_ALL_PASSED, EVENT_START_CARDS, EVENT_OUTCOME_DECIDED, get_decided_outcome
+from skat_text import get_card_name, get_bitmap_text, VERBOSE_PUBLIC_INFO, VERBOSE_SILENT, EVENT_VERBOSITY, EventRenderer
 
 
 class SkatGame:
 
-    def __init__(self, players, forehand, cards=None, verbosity=VERBOSE_PUBLIC_INFO, behaviours=np.array([1, 1, 1])):
+    def __init__(self, players, forehand, cards=None, verbosity=VERBOSE_PUBLIC_INFO, behaviours=np.array([1, 1, 1]), latency=None, log=False, claim_outcome=True):
         """
 
         Args:
             players: list of 3 instances of SkatPlayer-like classes
             forehand: 0-2 index of forehand player in players array
             cards: np array [player0_cards, player1_cards, player2_cards, skat]
-            verbose: bool
+            verbosity (int): VERBOSE_ constant, events up to this verbosity are printed while the game is played
+            latency (LatencyRecorder): Records the latency of the game phases and of every agent call, None disables timing completely
+            log (bool): Keep the events of the game in self.log (GameLog), to be rendered later
+            claim_outcome (bool): Stop playing once solo win, Schneider and Schwarz can't change anymore. The result is the same as playing all tricks.
         """
         self.players = list(players)
+        self.latency = latency
+        if latency is not None:
+            self.players = [latency.wrap(player) for player in self.players]
+        self.trace = tracing.start_sample() # Record spans of this game, see tracing
+        if self.trace:
+            self.players = [tracing.TracedPlayer(player, f"{player.get_name()} ({i})") for i, player in enumerate(self.players)]
         self.cards = cards
         self.solo_cards = 0
         self.forehand = forehand  # index of player in self.players
         self.middlehand = (forehand + 1) % 3  # index of player in self.players
         self.rearhand = (forehand + 2) % 3  # index of player in self.players
         self.verbosity = verbosity
+        self.claim_outcome = claim_outcome
         self.behaviours = behaviours
         self.highest_bid = 0
         self.highest_bidder = None # player instance
-        self.history = None
+        self.history = new_history(forehand)  # see history, appended to while the game is played
+        self.history_view = get_read_only_view(self.history)  # given to the agents
         self.game_type = 0
         self.extra_tier = 0
         self.solo_player = 0 # index of player in self.players
 
-        if self.verbose():
-            print(f"Beginne Spiel mit {self.get_player_text(0)} {self.get_player_text(1)} {self.get_player_text(2)}. Vorhand: {self.get_player_text(self.forehand)} Verhalten: {self.behaviours}")
+        # Events are only created if they are logged or printed, call sites check self.logging
+        self.logging = log or verbosity > VERBOSE_SILENT
+        self.log = None
+        self.renderer = None
+        if self.logging:
+            player_texts = [self.get_player_text(i) for i in range(3)]
+            if log:
+                self.log = GameLog(player_texts, behaviours)
+            if verbosity > VERBOSE_SILENT:
+                self.renderer = EventRenderer(player_texts, behaviours)
+            self.log_event(EVENT_GAME_START, self.forehand)
 
         if self.cards is None:
             # Deal cards, 10 to each player and 2 to the skat
+            if self.trace:
+                deal_start = tracing.now()
             self.cards = deal_new_cards_as_bitmaps()
-            if self.verbose(VERBOSE_PRIVATE_INFO):
-                print(f"Karten ausgeteilt:\n{self.get_player_text(0)} {get_bitmap_text(self.cards[0])}\n{self.get_player_text(1)} {get_bitmap_text(self.cards[1])}\n{self.get_player_text(2)} {get_bitmap_text(self.cards[2])}\nSkat {get_bitmap_text(self.cards[3])}")
+            if self.trace:
+                tracing.add_span("deal", "game", deal_start)
+            if self.logging:
+                for location in range(4):
+                    self.log_event(EVENT_CARDS_DEALT, location, -1, int(self.cards[location]))
         self.start_cards = self.cards.copy()
         self.solo_win = False
         self.schneider = False
@@ -52,6 +87,22 @@ class SkatGame:
     def verbose(self, verbosity=VERBOSE_PUBLIC_INFO):
         return self.verbosity >= verbosity
 
+    def log_event(self, event_type, player=-1, card=-1, value=0):
+        """
+        Adds an event to self.log and prints it if the verbosity is high enough. Only call it if self.logging is True.
+
+        Args:
+            event_type (int): EVENT_ constant
+            player (int): Index of player in self.players
+            card (int): Card id
+            value (int): Bid, bitmap or points, depending on the event
+        """
+        if self.log is not None:
+            self.log.add(event_type, player, card, value)
+        if self.verbosity >= EVENT_VERBOSITY[event_type]:
+            event = (event_type, player, card, value)
+            print(self.renderer.render(event), end="\n" if self.renderer.ends_line(event) else "")
+
     def run(self):
         """
 
@@ -59,14 +110,22 @@ class SkatGame:
             tuple: (result, points) RESULT_ constant, np.array size 3 int
 
         """
+        timed = self.latency is not None
+        if timed or self.trace:
+            game_start = perf_counter_ns()
         self.highest_bid, self.highest_bidder = self.bidding()
+        if timed:
+            self.latency.record("SkatGame", PHASE_BIDDING, perf_counter_ns() - game_start)
+        if self.trace:
+            tracing.add_span("bidding", "game", game_start, {"highest_bid": int(self.highest_bid)})
         if self.highest_bid > 0:
+            if self.trace:
+                announce_start = tracing.now()
             self.solo_player = self.players.index(self.highest_bidder)
-            pickup_skat = self.highest_bidder.pickup_skat(self.highest_bid, self.history)
-            if self.verbose():
-                print(f"{self.get_player_text(self.highest_bidder)} hat mit {self.highest_bid} das höchste Gebot abgegeben und sagt an.")
-                pickup_text = "" if pickup_skat else "nicht "
-                print(f"{self.get_player_text(self.highest_bidder)} nimmt den Skat {pickup_text}auf.")
+            pickup_skat = self.highest_bidder.pickup_skat(self.highest_bid, self.history_view)
+            if self.logging:
+                self.log_event(EVENT_HIGHEST_BID, self.solo_player, -1, int(self.highest_bid))
+                self.log_event(EVENT_PICKUP_SKAT, self.solo_player, -1, int(bool(pickup_skat)))
             hand_cards = self.cards[self.solo_player]
             original_hand_cards = hand_cards
             self.solo_cards = add_skat_to_hand(hand_cards, self.cards[3]) # Used for points calculation
@@ -80,21 +139,32 @@ class SkatGame:
                 self.cards[3] = get_cards_that_have_been_removed(hand_cards, self.cards[self.solo_player])
                 if count_cards(self.cards[self.solo_player]) != 10 or count_cards(self.cards[3]) != 2:
                     raise DirtyCheatingError(self.get_player_text(self.solo_player), f"Hat nicht ordentlich Karten in den Skat zurückgelegt. Handkarten inkl. Skat {get_bitmap_text(hand_cards)} Handkarten nachher {get_bitmap_text(self.cards[self.solo_player])} Skat neu {get_bitmap_text(self.cards[3])}")
-                if self.verbose(VERBOSE_PRIVATE_INFO):
-                    print(f"{self.get_player_text(self.highest_bidder)} legt {get_bitmap_text(self.cards[3])} zurück in den Skat.")
-            if self.verbose():
-                print(f"{self.get_player_text(self.highest_bidder)} spielt {get_game_name(self.game_type, self.extra_tier)}")
+                if self.logging:
+                    self.log_event(EVENT_SKAT_PUT_BACK, self.solo_player, -1, int(self.cards[3]))
+            if self.trace:
+                tracing.add_span("announce", "game", announce_start, {"game_type": int(self.game_type), "extra_tier": int(self.extra_tier)})
+            if self.logging:
+                self.log_event(EVENT_ANNOUNCE, self.solo_player, int(self.game_type), int(self.extra_tier))
+            if timed:
+                playing_start = perf_counter_ns()
             self.playing()
+            if timed:
+                self.latency.record("SkatGame", PHASE_PLAYING, perf_counter_ns() - playing_start)
             self.calculate_points()
-            if self.verbose():
-                print("Spiel vorbei.")
+            if self.logging:
+                self.log_event(EVENT_GAME_OVER)
             result = RESULT_SOLO_WIN if self.solo_win else RESULT_TEAM_WIN
         else:
-            if self.verbose():
-                print("Alle haben gepasst, Spiel vorbei.")
+            if self.logging:
+                self.log_event(EVENT_ALL_PASSED)
             result = RESULT_PASSED
-        if self.verbose():
-            print(f"Kartenverteilung war {self.get_player_text(self.players[0])}: {get_bitmap_text(self.start_cards[0])} {self.get_player_text(self.players[1])}: {get_bitmap_text(self.start_cards[1])} {self.get_player_text(self.players[2])}: {get_bitmap_text(self.start_cards[2])} Skat: {get_bitmap_text(self.start_cards[3])}")
+        if timed:
+            self.latency.record("SkatGame", PHASE_GAME, perf_counter_ns() - game_start)
+        if self.trace:
+            tracing.add_span("game", "game", game_start, {"result": int(result)})
+        if self.logging:
+            for location in range(4):
+                self.log_event(EVENT_START_CARDS, location, -1, int(self.start_cards[location]))
         return result, self.points.copy()
 
     def get_player_text(self, player):
@@ -102,17 +172,23 @@ class SkatGame:
             player = self.players[player]
         return f"{player.get_name()} ({self.players.index(player)})";
 
-    def print_passed(self, player):
-        if self.verbose():
-            print(f"{self.get_player_text(player)} passt.")
+    def record_passed(self, player):
+        player = self.players.index(player)
+        add_bidding_event(self.history, player, 0)
+        if self.logging:
+            self.log_event(EVENT_PASS, player)
 
-    def print_say(self, player, player_bid):
-        if self.verbose():
-            print(f"{self.get_player_text(player)} sagt {player_bid}.")
+    def record_say(self, player, player_bid):
+        player = self.players.index(player)
+        add_bidding_event(self.history, player, player_bid)
+        if self.logging:
+            self.log_event(EVENT_SAY, player, -1, int(player_bid))
 
-    def print_hear(self, player):
-        if self.verbose():
-            print(f"{self.get_player_text(player)} sagt Ja.")
+    def record_hear(self, player, player_bid):
+        player = self.players.index(player)
+        add_bidding_event(self.history, player, player_bid)
+        if self.logging:
+            self.log_event(EVENT_HEAR, player)
 
 
     def bidding(self):
@@ -136,25 +212,25 @@ class SkatGame:
         i = 0
         while i < len(BIDDING_VALUES):
             bid = BIDDING_VALUES[i]
-            player_bid = saying.say(bid, self.history)
+            player_bid = saying.say(bid, self.history_view)
             if player_bid < bid or player_bid not in BIDDING_VALUES:
                 # Passed
-                self.print_passed(saying)
+                self.record_passed(saying)
                 if saying == middle:
                     saying = rear
                 else:
                     # No more saying, bidding is over
                     break
             else:
-                self.print_say(saying, player_bid)
+                self.record_say(saying, player_bid)
                 highest_bid = player_bid
                 highest_bidder = saying
-                accepted = hearing.hear(player_bid, self.history)
+                accepted = hearing.hear(player_bid, self.history_view)
                 if accepted:
-                    self.print_hear(hearing)
+                    self.record_hear(hearing, player_bid)
                     highest_bidder = hearing
                 else:
-                    self.print_passed(hearing)
+                    self.record_passed(hearing)
                     if saying == middle:
                         hearing = middle
                         saying = rear
@@ -164,13 +240,13 @@ class SkatGame:
                 i += 1
 
         if highest_bid == 0:
-            player_bid = fore.say(18, self.history)
+            player_bid = fore.say(18, self.history_view)
             if player_bid in BIDDING_VALUES:
-                self.print_say(fore, player_bid)
+                self.record_say(fore, player_bid)
                 highest_bid = player_bid
                 highest_bidder = fore
             else:
-                self.print_passed(fore)
+                self.record_passed(fore)
 
         return highest_bid, highest_bidder
 
@@ -193,7 +269,7 @@ class SkatGame:
             valid_actions,
             self.tricks[trick],
             leader,
-            self.history
+            self.history_view
         )
         if not is_card_present(hand_cards, card):
             raise DirtyCheatingError(self.get_player_text(player), f"Hat {get_card_name(card)} aus dem Ärmel gezaubert, bei diesen Handkarten: {get_bitmap_text(hand_cards)}")
@@ -201,8 +277,9 @@ class SkatGame:
             raise DirtyCheatingError(self.get_player_text(player), f"Hat {get_card_name(card)} aus gespielt, obwohl nur diese Optionen erlaubt waren: {get_bitmap_text(valid_actions)}")
         self.tricks[trick, player] = card
         self.cards[player] = remove_card(hand_cards, card)
-        if self.verbose():
-            print(f"{self.get_player_text(player)} spielt {get_card_name(card)}")
+        add_played_card(self.history, player, card)
+        if self.logging:
+            self.log_event(EVENT_CARD_PLAYED, player, int(card))
 
     def playing(self):
 
@@ -215,76 +292,95 @@ class SkatGame:
         ouvert_hand = self.cards[self.solo_player] if ouvert else 0
 
         for i in range(3):
-            self.players[i].start_playing(self.game_type, self.extra_tier, self.cards[i].copy(), i, self.solo_player, ouvert_hand, self.history, self.behaviours[i])
+            self.players[i].start_playing(self.game_type, self.extra_tier, self.cards[i].copy(), i, self.solo_player, ouvert_hand, self.history_view, self.behaviours[i])
 
         solo_points = count_points(self.cards[3])
         team_points = 0
         for i in range(10):
             second = (leader + 1) % 3
             third = (leader + 2) % 3
-            if self.verbose(VERBOSE_PRIVATE_INFO):
-                print(f"Stich {i+1} Handkarten: {self.get_player_text(0)} {get_bitmap_text(self.cards[0], self.game_type)}     {self.get_player_text(1)} {get_bitmap_text(self.cards[1], self.game_type)}     {self.get_player_text(2)} {get_bitmap_text(self.cards[2], self.game_type)}")
+            if self.trace:
+                trick_start = tracing.now()
+            if self.logging:
+                for player in range(3):
+                    self.log_event(EVENT_TRICK_HAND, player, i, int(self.cards[player]))
             self.play_card(leader, leader, i)
             self.play_card(second, leader, i)
             self.play_card(third, leader, i)
             # play_card(hand_cards, valid_actions, current_trick, trick_giver, history)
             winner = get_trick_winner(self.game_type, self.tricks[i], self.tricks[i, leader])
-            if self.verbose():
-                print(f"Stich geht an {self.get_player_text(winner)}")
             points = count_points(get_bitmap(self.tricks[i]))
+            if self.logging:
+                self.log_event(EVENT_TRICK_WON, int(winner), -1, int(points))
+            if self.trace:
+                tracing.add_span(f"trick {i + 1}", "game", trick_start, {"winner": int(winner), "points": int(points)})
 
             if winner == self.solo_player:
                 solo_points += points
                 if self.game_type == NULL:
                     # Solo player loses upon getting a trick in a Null game
                     self.solo_win = False
-                    if self.verbose():
-                        print("Alleinspieler hat einen Stich bekommen: Nullspiel verloren.")
+                    if self.logging:
+                        self.log_event(EVENT_NULL_LOST)
                     return
             else:
                 team_points += points
                 if self.game_type != NULL and self.extra_tier >= EXTRA_TIER_SCHWARZ:
                     # Solo player loses upon giving up a trick in a Schwarz or Ouvert game
                     self.solo_win = False
-                    if self.verbose():
-                        print("Gegenpartei hat einen Stich bekommen: Schwarz kann nicht mehr erreicht werden.")
+                    if self.logging:
+                        self.log_event(EVENT_SCHWARZ_LOST)
                     return
             leader = winner
 
-        if self.verbose():
-            print("Alle Karten wurden gespielt.")
+            if self.claim_outcome and i < 9 and self.game_type != NULL:
+                team_cards = self.cards[(self.solo_player + 1) % 3] | self.cards[(self.solo_player + 2) % 3]
+                decided, solo_win, schneider, schwarz = get_decided_outcome(self.game_type, self.extra_tier, solo_points, team_points,
+                                                                            self.cards[self.solo_player], team_cards, winner == self.solo_player)
+                if decided:
+                    self.solo_win = solo_win
+                    self.schneider = schneider
+                    self.schwarz = schwarz
+                    if self.logging:
+                        self.log_event(EVENT_OUTCOME_DECIDED, -1, -1, int(solo_points))
+                        if self.schneider:
+                            self.log_event(EVENT_SCHNEIDER)
+                        if self.schwarz:
+                            self.log_event(EVENT_SCHWARZ)
+                        self.log_event(EVENT_WINNER, -1, -1, int(self.solo_win))
+                    return
+
+        if self.logging:
+            self.log_event(EVENT_ALL_CARDS_PLAYED)
         if self.game_type == NULL:
             # Solo player in a Null game wins for not getting a single trick
             self.solo_win = True
-            if self.verbose():
-                print("Alleinspieler hat keinen einzigen Stich bekommen: Nullspiel gewonnen")
+            if self.logging:
+                self.log_event(EVENT_NULL_WON)
             return
 
         self.schneider = team_points <= 30
         self.schwarz = team_points == 0
-        if self.verbose():
-            print(f"Augen - Alleinspieler: {solo_points} Gegenpartei: {team_points}")
+        if self.logging:
+            self.log_event(EVENT_POINTS_COUNTED, -1, -1, int(solo_points))
             if self.schneider:
-                print("Schneider erreicht")
+                self.log_event(EVENT_SCHNEIDER)
             if self.schwarz:
-                print("Schwarz erreicht")
+                self.log_event(EVENT_SCHWARZ)
         if self.extra_tier == EXTRA_TIER_SCHNEIDER:
             self.solo_win = self.schneider
         else:
             self.solo_win = solo_points > 60
-        if self.verbose():
-            if self.solo_win:
-                print("Alleinspieler gewinnt")
-            else:
-                print("Gegenpartei gewinnt")
+        if self.logging:
+            self.log_event(EVENT_WINNER, -1, -1, int(self.solo_win))
         return
 
 
     def calculate_points(self):
         if self.game_type == NULL:
             game_points = np.int32(BIDDING_NULL[self.extra_tier])
-            if self.verbose():
-                print(f"Spielwert {get_game_name(NULL, self.extra_tier)}: {game_points} Punkte")
+            if self.logging:
+                self.log_event(EVENT_GAME_VALUE, -1, -1, int(game_points))
         else:
             tier = calculate_game_tier(self.game_type, self.solo_cards)
             extra_tier = self.extra_tier
@@ -295,14 +391,14 @@ class SkatGame:
                     extra_tier += 1
             game_points = np.int32(BIDDING_BASE_VALUES[self.game_type] * (tier + extra_tier))
 
-            if self.verbose():
-                print(f"Spielwert {get_game_name(self.game_type, self.extra_tier)}: Farbwert {BIDDING_BASE_VALUES[self.game_type]} Stufe {tier} extra {extra_tier} Punkte gesamt {game_points}")
+            if self.logging:
+                self.log_event(EVENT_GAME_VALUE, -1, int(tier), int(extra_tier))
 
         if (not self.solo_win) or game_points < self.highest_bid:
             game_points *= -2
 
-        if self.verbose():
-            print(f"Alleinspieler {self.get_player_text(self.solo_player)} bekommt {game_points} Punkte")
+        if self.logging:
+            self.log_event(EVENT_GAME_POINTS, self.solo_player, -1, int(game_points))
 
         self.points[self.solo_player] = game_points
 
@@ -4,6 +4,7 @@ import numba
 from tabulate import tabulate
 import numpy as np
 
+from LatencyRecorder import LatencyRecorder
 from SkatGame import SkatGame
 from skat import NUMBER_OF_CARDS, deal_new_cards, deal_new_cards_as_bitmaps, RESULT_SOLO_WIN, RESULT_TEAM_WIN, RESULT_PASSED
 from skat_text import VERBOSE_PUBLIC_INFO, VERBOSE_SILENT
@@ -24,15 +25,21 @@ class SkatRunner:
         self.number_of_rounds = 3
         self.equalize = False
         self.games_played = 0
+        self.latency = None
 
-    def run_liste(self, number_of_rounds=3, equalize=False, verbosity=1, seeger_fabian=True):
+    def run_liste(self, number_of_rounds=3, equalize=False, verbosity=1, seeger_fabian=True, measure_latency=False):
         """
         Args:
             number_of_rounds (int): Games to be played. With the equalize option, 6 times this will be the number of games
             equalize (bool): Plays every game 6 times, rotating the players around
             verbosity (int): How much information should be printed out
             seeger_fabian (bool): If Seeger Fabian modifiers should be applied to game result
+            measure_latency (bool): Record latencies of game phases and agent calls, printed with the results
         """
+        self.latency = None
+        if measure_latency:
+            self.latency = LatencyRecorder()
+            self.latency.register(self.players)
         self.number_of_rounds = number_of_rounds
         self.equalize = equalize
         self.verbosity = verbosity
@@ -51,12 +58,12 @@ class SkatRunner:
                 player_ids = np.arange(3)
                 for perm in itertools.permutations(player_ids):
                     inv_perm = np.argsort(np.array(perm))
-                    game = SkatGame(self.players[np.array(perm)].copy(), forehand, cards.copy(), VERBOSE_SILENT, behaviours)
+                    game = SkatGame(self.players[np.array(perm)].copy(), forehand, cards.copy(), VERBOSE_SILENT, behaviours, self.latency)
                     game_result, game_points = game.run()
                     game_points = game_points[inv_perm]
                     self.process_game(game_result, game_points)
             else:
-                game = SkatGame(self.players, forehand, None, VERBOSE_SILENT)
+                game = SkatGame(self.players, forehand, None, VERBOSE_SILENT, latency=self.latency)
                 game_result, game_points = game.run()
                 self.process_game(game_result, game_points)
 
@@ -68,6 +75,53 @@ class SkatRunner:
         if verbosity >= 1:
             self.print_results()
 
+    def run_liste_parallel(self, pool, number_of_rounds=3, equalize=False, verbosity=1, seeger_fabian=True, rounds_per_task=30, measure_latency=False):
+        """
+        Like run_liste, but the rounds are split into tasks that are played by the workers of a WorkerPool.
+        Every worker plays with its own copies of the players, so agents must not rely on state from earlier games.
+
+        Args:
+            pool (WorkerPool): Pool with warmed up workers
+            rounds_per_task (int): Rounds played per task, a multiple of 3 keeps forehand equally distributed
+            measure_latency (bool): Record latencies of game phases and agent calls in the workers, printed with the results
+        """
+        self.latency = None
+        if measure_latency:
+            self.latency = LatencyRecorder()
+            self.latency.register(self.players)
+        self.number_of_rounds = number_of_rounds
+        self.equalize = equalize
+        self.verbosity = verbosity
+        self.seeger_fabian = seeger_fabian
+        self.games_played = 0
+        self.passed_games = 0
+
+        if verbosity >= 1:
+            print(f"Play {number_of_rounds} rounds with {self.players[0].get_name()}, {self.players[1].get_name()} and {self.players[2].get_name()} on {pool.processes} processes. Equalize: {equalize}")
+
+        tasks = [(self.players, min(rounds_per_task, number_of_rounds - i), equalize, seeger_fabian, measure_latency) for i in range(0, number_of_rounds, rounds_per_task)]
+        for counters, latency in pool.imap_unordered(_run_liste_task, tasks):
+            self.add_counters(counters)
+            if latency is not None:
+                self.latency.merge(latency)
+
+        if verbosity >= 1:
+            self.print_results()
+
+    def get_counters(self):
+        return self.point_total, self.solo, self.solo_wins, self.passed_games, self.team, self.team_wins, self.games_played
+
+    def add_counters(self, counters):
+        """Adds the counters (see get_counters) of another runner, for example from a worker process"""
+        point_total, solo, solo_wins, passed_games, team, team_wins, games_played = counters
+        self.point_total += point_total
+        self.solo += solo
+        self.solo_wins += solo_wins
+        self.passed_games += passed_games
+        self.team += team
+        self.team_wins += team_wins
+        self.games_played += games_played
+
     def process_game(self, game_result, game_points):
         if game_result == RESULT_PASSED:
             self.passed_games += 1
@@ -103,9 +157,13 @@ class SkatRunner:
         print()
         print(tabulate(data, headers=headers))
         print()
+        if self.latency is not None:
+            self.latency.print_table()
+            print()
 
 
-
-
-
-
+def _run_liste_task(args):
+    players, number_of_rounds, equalize, seeger_fabian, measure_latency = args
+    runner = SkatRunner(*players)
+    runner.run_liste(number_of_rounds, equalize, 0, seeger_fabian, measure_latency)
+    return runner.get_counters(), runner.latency
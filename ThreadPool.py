@@ -0,0 +1,73 @@
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import perf_counter
+
+import numpy as np
+
+from WorkerPool import seed_numba
+from warmup import warmup
+
+
+class ThreadPool:
+    """
+    Thread pool for compiled kernels that release the GIL (nogil=True), like the bidding simulations of
+    bidding_simulation.simulate_biddings or rollout.rollouts.
+
+    All threads live in one process, so they share the compiled code and big lookup tables (tablebases, the tables of
+    skat.py) instead of every worker of a WorkerPool holding its own copy. Only the time spent in nogil kernels runs in
+    parallel, tasks that mostly run Python code (SkatGame with Python agents) are better off in a WorkerPool.
+
+    map, imap_unordered and starmap work like the ones of WorkerPool, so simulations can take either of them.
+    """
+
+    def __init__(self, threads=None, seed=None):
+        """
+        Args:
+            threads (int): Number of threads, os.cpu_count() if None
+            seed (int): Base seed for the numba random number generators of the threads. numba has one random state per
+                thread, every thread gets its own stream.
+        """
+        self.processes = threads or os.cpu_count()  # Number of threads, named like WorkerPool.processes
+        self.warmup_time = warmup()
+        self.seed = np.random.SeedSequence(seed).entropy
+        self._thread_ids = itertools.count()
+        start = perf_counter()
+        self.executor = ThreadPoolExecutor(self.processes, "skat", self._init_thread)
+        self.startup_time = perf_counter() - start
+
+    def _init_thread(self):
+        seed_numba(np.random.SeedSequence([self.seed, next(self._thread_ids)]).generate_state(1)[0])
+
+    def map(self, function, iterable, chunksize=1):
+        return list(self.executor.map(function, iterable))
+
+    def imap_unordered(self, function, iterable, chunksize=1):
+        """Submits all tasks right away, the returned iterator yields the results in the order the tasks finish"""
+        futures = [self.executor.submit(function, item) for item in iterable]
+        return (future.result() for future in as_completed(futures))
+
+    def starmap(self, function, iterable, chunksize=1):
+        return list(self.executor.map(lambda args: function(*args), iterable))
+
+    def submit(self, function, *args, **kwargs):
+        """
+        Returns:
+            concurrent.futures.Future: Use result() to wait for the return value
+        """
+        return self.executor.submit(function, *args, **kwargs)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def terminate(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
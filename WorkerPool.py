@@ -0,0 +1,94 @@
+import multiprocessing
+import multiprocessing.util
+import os
+from time import perf_counter
+
+import numpy as np
+from numba import njit
+
+import tracing
+from warmup import warmup
+
+
+class WorkerPool:
+    """
+    Process pool for simulations (SkatRunner, bidding simulations, env workers) whose workers start without JIT.
+
+    All kernels are compiled once in the parent process by warmup(), then the workers are forked and inherit the
+    compiled code, so a worker is ready within milliseconds. Workers are replaced after max_tasks_per_child tasks to
+    bound memory growth; replacements are forked from the parent again and don't compile anything either.
+
+    Needs the fork start method, so it isn't available on Windows.
+    """
+
+    def __init__(self, processes=None, max_tasks_per_child=100, env=False, seed=None, trace_dir=None, trace_sample_rate=1.0):
+        """
+        Args:
+            processes (int): Number of workers, os.cpu_count() if None
+            max_tasks_per_child (int): Tasks a worker handles before it is replaced by a fresh one, None keeps workers forever
+            env (bool): Also warm up SkatPlayingEnv and DealProducer (see warmup)
+            seed (int): Base seed for the random number generators of the workers. Every worker gets its own stream.
+            trace_dir (str): Enables tracing in the workers. Every worker dumps its spans into this directory when it exits,
+                close() merges them into trace_dir/trace.json. Worker files of earlier runs in trace_dir are deleted.
+            trace_sample_rate (float): Fraction of games/episodes/batches that are traced
+        """
+        self.processes = processes or os.cpu_count()
+        self.max_tasks_per_child = max_tasks_per_child
+        self.warmup_time = warmup(env)
+        self.seed = np.random.SeedSequence(seed).entropy
+        self.trace_dir = trace_dir
+        if trace_dir is not None:
+            tracing.remove_traces(trace_dir)
+        start = perf_counter()
+        self.pool = multiprocessing.get_context("fork").Pool(self.processes, _init_worker, (self.seed, trace_dir, trace_sample_rate), max_tasks_per_child)
+        self.startup_time = perf_counter() - start
+
+    def map(self, function, iterable, chunksize=1):
+        return self.pool.map(function, iterable, chunksize)
+
+    def imap_unordered(self, function, iterable, chunksize=1):
+        return self.pool.imap_unordered(function, iterable, chunksize)
+
+    def starmap(self, function, iterable, chunksize=1):
+        return self.pool.starmap(function, iterable, chunksize)
+
+    def apply_async(self, function, args=(), kwds=None):
+        return self.pool.apply_async(function, args, kwds or {})
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        if self.trace_dir is not None:
+            tracing.merge_traces(self.trace_dir, os.path.join(self.trace_dir, "trace.json"))
+
+    def terminate(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+
+def _init_worker(seed, trace_dir, trace_sample_rate):
+    """Forked workers inherit the random state of the parent, so every worker needs its own seed to not play the same deals"""
+    worker_seed = np.random.SeedSequence([seed, os.getpid()]).generate_state(1)[0]
+    np.random.seed(worker_seed)
+    seed_numba(worker_seed)
+    tracing.clear()  # Spans of the parent
+    if trace_dir is not None:
+        tracing.enable(trace_sample_rate, seed=int(worker_seed))
+        multiprocessing.util.Finalize(None, tracing.dump, args=(trace_dir,), exitpriority=10)
+    else:
+        tracing.disable()
+
+
+@njit(cache=True)
+def seed_numba(seed):
+    """numba has its own random state for compiled code (deal_new_cards_as_bitmaps etc.), which can only be seeded from compiled code"""
+    np.random.seed(seed)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from agents.bidding.BasicBiddingAI import BasicBiddingAI
+from agents.playing.ISMCTSPlayingAI import ISMCTSPlayingAI
+
+
+class ISMCTSAI:
+    def __init__(self, iterations=10000, time_budget=None, pool=None, tablebase_tricks=0):
+        self.bidding = BasicBiddingAI()
+        self.playing = ISMCTSPlayingAI(iterations, time_budget, pool=pool, tablebase_tricks=tablebase_tricks)
+        self.skat = 0  # Cards put into the Skat, known to the search when playing solo
+
+    def get_name(self):
+        return "ISMCTSAI"
+
+    def receive_hand_cards(self, hand_cards, table_position, behaviour=1):
+        self.skat = 0
+        return self.bidding.receive_hand_cards(hand_cards, table_position, 0.95)
+
+    def say(self, next_bid, history):
+        return self.bidding.say(next_bid, history)
+
+    def hear(self, bid, history):
+        return self.bidding.hear(bid, history)
+
+    def pickup_skat(self, bid, history):
+        return self.bidding.pickup_skat(bid, history)
+
+    def announce(self, hand_cards):
+        game_type, extra_tier, new_hand_cards = self.bidding.announce(hand_cards)
+        self.skat = np.uint32(hand_cards) & ~np.uint32(new_hand_cards)
+        return game_type, extra_tier, new_hand_cards
+
+    def start_playing(self, game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour=1):
+        return self.playing.start_playing(game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour,
+                                          self.skat)
+
+    def play_card(self, hand_cards, valid_actions, current_trick, trick_giver, history):
+        return self.playing.play_card(hand_cards, valid_actions, current_trick, trick_giver, history)
\ No newline at end of file
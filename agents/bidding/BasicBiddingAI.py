@@ -1,5 +1,6 @@
 from numba import njit, prange
 
+from counters import count, COUNTER_CALCULATE_BID, COUNTER_ANNOUNCEMENTS
 from intrinsic import ctz
 from skat import *
 from skat_text import get_bitmap_text, GAME_TYPE_NAMES, get_game_name
@@ -105,10 +106,10 @@ class BasicBiddingAI:
         if not self.picked_up_skat:
             return self.game_type, self.extra_tier, self.hand_cards
 
-        return calculate_announcement_with_skat(hand_cards, self.table_position, self.risk_taking, self.bid)
+        return calculate_announcement_with_skat(hand_cards, self.table_position, self.risk_taking, int(self.bid))
 
 
-@njit(parallel=False)
+@njit(parallel=False, nogil=True, cache=True)
 def calculate_announcement_with_skat(hand_cards_with_skat, table_position, risk_taking, bid):
     """
     Looks at all options for putting back 2 cards into the Skat, picks the best one, and announces the game for it
@@ -125,7 +126,7 @@ def calculate_announcement_with_skat(hand_cards_with_skat, table_position, risk_
         - extra_tier: None (0), Schneider announced (1), Schwarz announced (2), Ouvert (3)
         - hand: New hand without skat (np.uint32 bitmap)
     """
-    #
+    count(COUNTER_ANNOUNCEMENTS)
     options = generate_hands_without_skat(hand_cards_with_skat)
 
     points = np.empty(66, dtype=np.uint32)
@@ -155,7 +156,7 @@ RISK_GRAND_HAND = 10.5
 RISK_GRAND_SCHNEIDER = 13.75
 
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_extra_tier(risk_taking, viability, spitze_trumps, count_trumps, color_spitzen_sum, spitze):
     extra_tier = 0
     hand = risk_taking * viability >= RISK_COLOR_HAND
@@ -173,7 +174,7 @@ def calculate_extra_tier(risk_taking, viability, spitze_trumps, count_trumps, co
     return extra_tier
 
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_extra_tier_grand(count_jacks, jacks_dominance, risk_taking, viability, color_spitzen_sum):
     extra_tier = 0
     hand = risk_taking * viability >= RISK_GRAND_HAND
@@ -192,7 +193,7 @@ def calculate_extra_tier_grand(count_jacks, jacks_dominance, risk_taking, viabil
     return extra_tier
 
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_overbid_tier(game_type, tier, extra_tier, minimum_bid):
     if minimum_bid <= 18:
         return 0
@@ -207,14 +208,14 @@ def calculate_overbid_tier(game_type, tier, extra_tier, minimum_bid):
               (tier + extra_tier + overbid_tier) * BIDDING_BASE_VALUES[game_type], "minimum bid", minimum_bid)
     return overbid_tier
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_null_overbid_tier(extra_tier, minimum_bid):
     points = BIDDING_NULL[extra_tier]
     if minimum_bid > points:
         return 2 # Null ouvert
     return 0
 
-@njit
+@njit(nogil=True, cache=True)
 def get_null_overbid_punishment(extra_tier, overbid_tier):
     if overbid_tier == 0:
         return 0
@@ -222,13 +223,13 @@ def get_null_overbid_punishment(extra_tier, overbid_tier):
         return 25
     return 1000
 
-@njit
+@njit(nogil=True, cache=True)
 def get_overbid_punishment(extra_tier, overbid_tier):
     if overbid_tier + extra_tier > EXTRA_TIER_OUVERT:
         return 10_000
     return 25 * overbid_tier
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_null_color_gaps(hand_cards):
     null_color_gaps = np.zeros(4, dtype=np.float64)
     for i in range(4):
@@ -246,7 +247,7 @@ def calculate_null_color_gaps(hand_cards):
                 opponent_cards_under += 1
     return null_color_gaps
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_null_color_gaps_lut(hand_cards):
     null_color_gaps = np.zeros(4, dtype=np.float64)
     for i in range(4):
@@ -266,7 +267,7 @@ def calculate_null_color_gaps_lut(hand_cards):
     return null_color_gaps
 
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_null_color_gaps_ctz(hand_cards):
     null_color_gaps = np.zeros(4, dtype=np.float64)
     for i in range(4):
@@ -286,7 +287,14 @@ def calculate_null_color_gaps_ctz(hand_cards):
             opponent_cards_under = min(opponent_cards_under, 0) - 1
     return null_color_gaps
 
-@njit
+
+# Variants of the primitives used by calculate_bid: the fastest ones that agree with the reference implementations on all inputs.
+# Measured with benchmarks/primitives_benchmark.py, update when the results change.
+bid_spitze = get_spitze_cgpt
+bid_null_color_gaps = calculate_null_color_gaps_ctz
+
+
+@njit(nogil=True, cache=True)
 def calculate_bid(hand_cards, table_position=2, minimum_bid=0, skat_unknown=True, hand_with_skat=0, risk_taking=np.float32(1.0)):
     """
     Calculates a bid for the given hand of cards. Will pass a bad hand if allowed.
@@ -317,6 +325,7 @@ def calculate_bid(hand_cards, table_position=2, minimum_bid=0, skat_unknown=True
     Returns:
         (bid, game_type, extra_tier, confidence, use_skat
     """
+    count(COUNTER_CALCULATE_BID)
     verbose = False
 
     #
@@ -330,8 +339,8 @@ def calculate_bid(hand_cards, table_position=2, minimum_bid=0, skat_unknown=True
 
     bitmap_jacks = extract_jacks(hand_cards)
     bitmap_known_jacks = extract_jacks(hand_with_skat)
-    jacks_trump_spitze = get_spitze(bitmap_known_jacks, 4)
-    jacks_spitze = get_spitze(bitmap_jacks, 4, True)
+    jacks_trump_spitze = bid_spitze(bitmap_known_jacks, 4, False)
+    jacks_spitze = bid_spitze(bitmap_jacks, 4, True)
     count_jacks = count_cards(bitmap_jacks)
 
     color_bitmaps = np.empty(4, dtype=np.uint32)
@@ -344,8 +353,8 @@ def calculate_bid(hand_cards, table_position=2, minimum_bid=0, skat_unknown=True
     freebies = 2 * np.int32(skat_unknown)
     for i in range(4):
         color_bitmaps[i] = extract_color_without_jack(hand_cards, i)
-        color_spitzen[i] = get_spitze(color_bitmaps[i], 7, True)
-        color_trump_spitzen[i] = get_spitze(combine_jacks_and_color(bitmap_jacks, extract_color_without_jack(hand_with_skat, i)), 11)
+        color_spitzen[i] = bid_spitze(color_bitmaps[i], 7, True)
+        color_trump_spitzen[i] = bid_spitze(combine_jacks_and_color(bitmap_jacks, extract_color_without_jack(hand_with_skat, i)), 11, False)
         color_counts[i] = count_cards(color_bitmaps[i])
         color_trump_counts[i] = count_jacks + color_counts[i]
         if color_spitzen[i] == 1:
@@ -375,7 +384,7 @@ def calculate_bid(hand_cards, table_position=2, minimum_bid=0, skat_unknown=True
     grand_bad_colors = 4 - count_aces - empty_colors
 
 
-    null_color_gaps = calculate_null_color_gaps(hand_cards)
+    null_color_gaps = bid_null_color_gaps(hand_cards)
     null_gaps = null_color_gaps.sum()
 
     position_factor = np.float32(0)
@@ -0,0 +1,395 @@
+import math
+import os
+import sys
+from time import perf_counter
+
+import numpy as np
+from numba import njit
+
+import intrinsic
+from GameState import GameState, SOLO, TEAM
+from agents.playing.InferenceBroker import select_card
+from agents.playing.ISMCTSPlayingAI import new_tree, clear_tree, find_child, sample_hidden_cards, get_hidden_cards, replay_history, \
+    get_root_statistics, ALL_CARDS
+from counters import count, COUNTER_NODES
+from history import get_forehand, get_number_of_played_cards, get_played_card, get_number_of_bidding_events, get_bidding_event
+from skat import get_valid_actions, count_points
+
+# The observation encoding is shared with SkatPlayingEnv in reinforcement_learning, which isn't a package
+_RL_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "reinforcement_learning")
+if _RL_DIRECTORY not in sys.path:
+    sys.path.append(_RL_DIRECTORY)
+
+from observation import FEATURES, FEATURE_GAME_TYPE, FEATURE_EXTRA_TIER, FEATURE_SOLO_PLAYER, FEATURE_TRICKS, FEATURE_TRICKS_PLAYED, SIZE, \
+    set_feature_scalar, set_features_bidding, set_features_state
+
+# AlphaZero style search over information sets: like ISMCTSPlayingAI every iteration deals the unknown cards at random
+# and walks one tree, but children are chosen with PUCT using the policy of a neural network and leaves are evaluated
+# by its value instead of random playouts.
+#
+# Leaves are gathered in batches: after a leaf is queued, its path gets a virtual loss (a visit without reward), so the
+# next iterations of the batch spread over other moves. The network evaluates the batch through an InferenceBroker.
+# With the broker's thread started, the leaves of all searches running in other threads (other tables) are evaluated
+# in the same forward passes.
+#
+# The network gets the observation of observation.py (all features, TRICKS_LAYOUT_SHIFTED) from the view of the player
+# to move, like a model trained in SkatPlayingEnv, and returns (policy logits, value). Values are from the view of the
+# player to move, -1 lost to 1 won.
+
+# Node status, nodes are evaluated by the network once
+NODE_NEW = 0
+NODE_PENDING = 1  # Queued for evaluation
+NODE_EXPANDED = 2
+
+# Value of moves that haven't been visited yet, rewards are between 0 and 1
+FIRST_PLAY_URGENCY = 0.5
+
+
+def new_leaves(max_leaves):
+    """
+    Returns:
+        tuple: Buffers for a batch of leaves: observations, nodes, paths from the root, path lengths - 1 and players to move
+    """
+    return (np.zeros((max_leaves, SIZE), dtype=np.float32),
+            np.zeros(max_leaves, dtype=np.int64),
+            np.zeros((max_leaves, 32), dtype=np.int64),
+            np.zeros(max_leaves, dtype=np.int64),
+            np.zeros(max_leaves, dtype=np.int64))
+
+
+@njit(cache=True)
+def get_public_bids(history):
+    """
+    Returns:
+        np.array: int64 size 3, highest bid every player said or accepted, 0 if none
+    """
+    public_bids = np.zeros(3, dtype=np.int64)
+    for i in range(get_number_of_bidding_events(history)):
+        player, bid = get_bidding_event(history, i)
+        public_bids[player] = max(public_bids[player], bid)
+    return public_bids
+
+
+@njit(cache=True)
+def create_base_observations(game_type, extra_tier, solo_player, public_bids):
+    """
+    Features that don't change during the playing phase, from the view of every player
+
+    Returns:
+        np.array: float32 (3, SIZE), observation of each player with game and bidding features
+    """
+    base_obs = np.zeros((3, SIZE), dtype=np.float32)
+    relative_bids = np.zeros(3, dtype=np.int64)
+    for player in range(3):
+        obs = base_obs[player]
+        set_feature_scalar(obs, FEATURE_GAME_TYPE, game_type)
+        if extra_tier > 0:
+            set_feature_scalar(obs, FEATURE_EXTRA_TIER, extra_tier - 1)
+        set_feature_scalar(obs, FEATURE_SOLO_PLAYER, (solo_player - player) % 3)
+        for i in range(3):
+            relative_bids[i] = public_bids[(player + i) % 3]
+        set_features_bidding(obs, relative_bids, False)
+    return base_obs
+
+
+@njit(cache=True)
+def set_search_observation(obs, base_obs, state):
+    """
+    Fills obs with the observation of the player to move in state. Only public information and the own hand are used:
+    the other players may hold every card that isn't played yet, except for the suits they didn't follow.
+    """
+    player = state.player
+    obs[:] = base_obs[player]
+    tricks_start = FEATURES[FEATURE_TRICKS, 0]
+    played_cards = np.uint32(0)
+    void = np.zeros(3, dtype=np.uint32)
+    for t in range(min(state.trick_number + 1, 10)):
+        leader = state.leaders[t]
+        first_card = state.tricks[t, leader]
+        if first_card < 0:
+            break
+        follow_cards = get_valid_actions(state.game_type, first_card, ALL_CARDS)
+        for i in range(3):
+            card = state.tricks[t, i]
+            if card < 0:
+                continue
+            bit = np.uint32(1) << np.uint32(card)
+            played_cards |= bit
+            if i != leader and not follow_cards & bit:
+                void[i] |= follow_cards
+            # TRICKS_LAYOUT_SHIFTED: the current trick is in slot 0, the last completed one in slot 1 and so on
+            obs[tricks_start + ((state.trick_number - t) * 3 + (i - player) % 3) * 32 + card] = 1
+    obs[FEATURES[FEATURE_TRICKS_PLAYED, 0]] = state.trick_number / 10
+    possible_cards = np.empty(3, dtype=np.uint32)
+    possible_cards[0] = state.hands[player]
+    for i in (1, 2):
+        possible_cards[i] = ~(state.hands[player] | played_cards | void[(player + i) % 3]) & ALL_CARDS
+    set_features_state(obs, state.game_type, possible_cards, (state.leader - player) % 3, state.get_legal_moves(), state.points[SOLO],
+                       state.points[TEAM], state.tricks_won[TEAM])
+
+
+@njit(cache=True)
+def select_leaves(tree, status, logits, root, game_type, extra_tier, solo_player, position, hand_cards, ouvert_hand, skat, history, base_obs,
+                  leaves, max_leaves, exploration):
+    """
+    Runs up to max_leaves iterations until they reach a node that isn't evaluated yet, which is queued in leaves
+    with a virtual loss on its path. Iterations that end the game are backpropagated right away.
+
+    Args:
+        tree: ISMCTSPlayingAI.new_tree, availability is unused
+        status: np.int8 array, NODE_ constant of every node
+        logits: np.float32 array (capacity, 32), policy logits of every expanded node
+        root (int): Node of the current position
+        base_obs: create_base_observations
+        leaves: new_leaves
+        max_leaves (int): Size of the leaves buffers
+        exploration (float): PUCT exploration constant
+        See ISMCTSPlayingAI.search for the other arguments.
+
+    Returns:
+        tuple: (leaves queued, iterations that ended the game)
+    """
+    moves, players, parents, first_child, next_sibling, visits, rewards, availability, size = tree
+    leaf_obs, leaf_nodes, leaf_paths, leaf_depths, leaf_players = leaves
+    capacity = moves.shape[0]
+    root_state = GameState(np.zeros(3, dtype=np.uint32), skat, game_type, extra_tier, solo_player, get_forehand(history))
+    replay_history(root_state, history)
+    known_cards, unknown, counts, forbidden = get_hidden_cards(game_type, solo_player, position, hand_cards, ouvert_hand, skat, history)
+    state = root_state.copy()
+    path = np.empty(32, dtype=np.int64)
+    children = np.empty(32, dtype=np.int64)
+    queued = 0
+    completed = 0
+    for _ in range(max_leaves):
+        hidden = sample_hidden_cards(unknown, counts, forbidden)
+        state.load(root_state)
+        state.hands[position] = hand_cards
+        state.hands[(position + 1) % 3] = known_cards[(position + 1) % 3] | hidden[0]
+        state.hands[(position + 2) % 3] = known_cards[(position + 2) % 3] | hidden[1]
+        state.points[SOLO] += count_points(hidden[2])
+
+        node = root
+        depth = 0
+        path[0] = node
+        while True:
+            decided, solo_win, schneider, schwarz = state.get_decided_outcome()
+            if decided:
+                reward = 1.0 if solo_win else 0.0
+                for i in range(depth + 1):
+                    visits[path[i]] += 1.0
+                    rewards[path[i]] += reward if players[path[i]] == solo_player else 1.0 - reward
+                completed += 1
+                break
+            if status[node] == NODE_PENDING:
+                # Already queued by an iteration of this batch
+                break
+            if status[node] == NODE_NEW:
+                status[node] = NODE_PENDING
+                set_search_observation(leaf_obs[queued], base_obs, state)
+                leaf_nodes[queued] = node
+                leaf_paths[queued, :depth + 1] = path[:depth + 1]
+                leaf_depths[queued] = depth
+                leaf_players[queued] = state.player
+                queued += 1
+                for i in range(depth + 1):
+                    visits[path[i]] += 1.0  # Virtual loss
+                break
+
+            # PUCT over the legal moves of this deal, with the policy normalized over them
+            legal = state.get_legal_moves()
+            children[:] = -1
+            child = first_child[node]
+            while child >= 0:
+                children[moves[child]] = child
+                child = next_sibling[child]
+            max_logit = -np.inf
+            cards = legal
+            while cards:
+                card = np.int64(intrinsic.ctz(cards))
+                cards &= cards - np.uint32(1)
+                max_logit = max(max_logit, logits[node, card])
+            total = 0.0
+            cards = legal
+            while cards:
+                card = np.int64(intrinsic.ctz(cards))
+                cards &= cards - np.uint32(1)
+                total += math.exp(logits[node, card] - max_logit)
+            sqrt_visits = math.sqrt(max(visits[node], 1.0))
+            best_card = -1
+            best_score = -np.inf
+            cards = legal
+            while cards:
+                card = np.int64(intrinsic.ctz(cards))
+                cards &= cards - np.uint32(1)
+                prior = math.exp(logits[node, card] - max_logit) / total
+                child = children[card]
+                child_visits = visits[child] if child >= 0 else 0.0
+                value = rewards[child] / child_visits if child_visits > 0 else FIRST_PLAY_URGENCY
+                score = value + exploration * prior * sqrt_visits / (1.0 + child_visits)
+                if score > best_score:
+                    best_card = card
+                    best_score = score
+            child = children[best_card]
+            if child < 0:
+                if size[0] >= capacity:
+                    break
+                child = size[0]
+                size[0] += 1
+                count(COUNTER_NODES)
+                moves[child] = best_card
+                players[child] = state.player
+                parents[child] = node
+                first_child[child] = -1
+                next_sibling[child] = first_child[node]
+                first_child[node] = child
+                visits[child] = 0.0
+                rewards[child] = 0.0
+                status[child] = NODE_NEW
+            state.make_move(best_card)
+            node = child
+            depth += 1
+            path[depth] = node
+    return queued, completed
+
+
+@njit(cache=True)
+def expand_leaves(tree, status, logits, leaves, n, leaf_logits, leaf_values, solo_player):
+    """Stores the policy of the first n queued leaves and backpropagates their values, which replace the virtual losses"""
+    moves, players, parents, first_child, next_sibling, visits, rewards, availability, size = tree
+    leaf_obs, leaf_nodes, leaf_paths, leaf_depths, leaf_players = leaves
+    for i in range(n):
+        node = leaf_nodes[i]
+        status[node] = NODE_EXPANDED
+        logits[node] = leaf_logits[i]
+        reward = (min(max(leaf_values[i], -1.0), 1.0) + 1.0) / 2.0
+        if leaf_players[i] != solo_player:
+            reward = 1.0 - reward
+        for d in range(leaf_depths[i] + 1):
+            path_node = leaf_paths[i, d]
+            rewards[path_node] += reward if players[path_node] == solo_player else 1.0 - reward
+
+
+class AlphaZeroPlayingAI:
+    """
+    Plays the card with the most visits of an AlphaZero style search, with leaves evaluated by a policy/value network
+    through an InferenceBroker. Start the broker's thread (broker.start()) and run tables in several threads to
+    evaluate the leaves of all their searches together. The subtree of the position reached is reused for the next card.
+    """
+
+    def __init__(self, broker, iterations=800, time_budget=None, leaves_per_batch=16, exploration=1.5, capacity=200_000, reuse_tree=True):
+        """
+        Args:
+            broker (InferenceBroker): Evaluates the leaves, its model returns (policy_logits, value)
+            iterations (int): Iterations per card, the minimum if time_budget is given
+            time_budget (float): Seconds per card, None to search exactly iterations
+            leaves_per_batch (int): Leaves gathered per network call of this search
+            exploration (float): PUCT exploration constant
+            capacity (int): Maximum number of nodes, the tree is cleared when it is full
+            reuse_tree (bool): Keep the subtree of the position reached between cards
+        """
+        self.broker = broker
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.leaves_per_batch = leaves_per_batch
+        self.tree = new_tree(capacity)
+        self.status = np.zeros(capacity, dtype=np.int8)
+        self.logits = np.zeros((capacity, 32), dtype=np.float32)
+        self.leaves = new_leaves(leaves_per_batch)
+        self.base_obs = None
+        self.root = 0
+        self.root_cards_played = 0
+        self.game_type = 0
+        self.extra_tier = 0
+        self.solo_player = 0
+        self.table_position = 0
+        self.ouvert_hand = 0
+        self.skat = 0
+        self.last_iterations = 0
+        self.root_statistics = None  # (visits, rewards) of the cards at the last search, see ISMCTSPlayingAI.get_root_statistics
+
+    def start_playing(self, game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour=1, skat=0):
+        """
+        Called at the start of the card playing phase to pass initial gamestate
+        Args:
+            game_type (int): Colors (0-3), Grand (4), Null (5)
+            extra_tier (int): Normal - Ouvert (0-4) (See EXTRA_TIER_ constants for more details)
+            hand_cards (int): bitmap of length 32
+            position (int): 0-2 table position
+            solo_player (int): 0-2 table position
+            ouvert_hand (int): bitmap of length 32. Hand of the solo player, only given when game is Ouvert, otherwise 0
+            bidding_history: np.uint8 array, see history. The bids said and accepted are used, None for no bids
+            behaviour (float): 1 is normal
+            skat (int): bitmap of length 32. Cards the solo player put into the Skat, 0 if unknown (Hand game or not solo)
+        """
+        self.game_type = game_type
+        self.extra_tier = extra_tier
+        self.solo_player = solo_player
+        self.table_position = position
+        self.ouvert_hand = ouvert_hand
+        self.skat = skat if position == solo_player else 0
+        public_bids = get_public_bids(bidding_history) if bidding_history is not None else np.zeros(3, dtype=np.int64)
+        self.base_obs = create_base_observations(game_type, extra_tier, solo_player, public_bids)
+        self.clear_tree()
+        self.root_cards_played = 0
+
+    def clear_tree(self):
+        clear_tree(self.tree)
+        self.status[0] = NODE_NEW
+        self.root = 0
+
+    def update_root(self, history):
+        """Moves the root to the current position, the tree is cleared if it doesn't contain it or is full"""
+        n = get_number_of_played_cards(history)
+        node = self.root if self.reuse_tree else -1
+        if self.tree[-1][0] >= self.status.shape[0]:
+            node = -1
+        for i in range(self.root_cards_played, n):
+            if node < 0:
+                break
+            node = find_child(self.tree, node, get_played_card(history, i)[1])
+        if node < 0:
+            self.clear_tree()
+            node = 0
+        self.root = node
+        self.root_cards_played = n
+
+    def play_card(self, hand_cards, valid_actions, current_trick, trick_giver, history):
+        """
+        Args:
+            hand_cards (int): bitmap of length 32
+            valid_actions (int): Hand cards that are legal to play (bitmap of length 32)
+            current_trick: np array of length 3. Indices equal table positions. Not yet played cards are -1
+            trick_giver: player who plays the first card this trick (0-2, table position)
+            history: np.uint8 array, read-only. Bidding and played cards so far, read with the functions in history
+
+        Returns:
+            int: Card to play (Has to be one of valid actions)
+        """
+        valid_actions = np.uint32(valid_actions)
+        if valid_actions & (valid_actions - np.uint32(1)) == 0:
+            return intrinsic.ctz(valid_actions)
+        self.update_root(history)
+        start = perf_counter()
+        done = 0
+        while done < self.iterations or (self.time_budget is not None and perf_counter() - start < self.time_budget):
+            queued, completed = select_leaves(self.tree, self.status, self.logits, self.root, self.game_type, self.extra_tier, self.solo_player,
+                                              self.table_position, np.uint32(hand_cards), np.uint32(self.ouvert_hand), np.uint32(self.skat),
+                                              history, self.base_obs, self.leaves, min(self.leaves_per_batch, max(self.iterations - done, 1)),
+                                              self.exploration)
+            if queued > 0:
+                leaf_logits, leaf_values = self.broker.evaluate_leaves(self.leaves[0][:queued])
+                expand_leaves(self.tree, self.status, self.logits, self.leaves, queued, leaf_logits, leaf_values, self.solo_player)
+            elif completed == 0:
+                # Every iteration hit a pending node or the tree is full
+                break
+            done += queued + completed
+        self.last_iterations = done
+        self.root_statistics = get_root_statistics(self.tree, self.root, valid_actions)
+        if self.root_statistics[0].max() == 0:
+            # No child visited yet (tiny budgets), play the card with the highest prior or the lowest valid card
+            if self.status[self.root] == NODE_EXPANDED:
+                return int(select_card(self.logits[self.root], valid_actions))
+            return int(intrinsic.ctz(valid_actions))
+        return int(np.argmax(self.root_statistics[0]))
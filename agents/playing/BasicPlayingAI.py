@@ -46,7 +46,7 @@ class BasiPlayingAI:
             valid_actions (int): Hand cards that are legal to play (bitmap of length 32)
             current_trick: np array of length 3. Indices equal table positions. Not yet played cards are -1
             trick_giver: player who plays the first card this trick (0-2, table position)
-            history:
+            history: np.uint8 array, read-only. Bidding and played cards so far, read with the functions in history
 
         Returns:
             int: Card to play (Has to be one of valid actions)
@@ -123,7 +123,7 @@ class BasiPlayingAI:
         return lowest
 
 
-@njit
+@njit(cache=True)
 def get_highest_points_action(actions):
     """
 
@@ -147,7 +147,7 @@ def get_highest_points_action(actions):
     #print("get_highest_points_action ", get_list_text(actions), get_card_name(best_card))
     return best_card
 
-@njit
+@njit(cache=True)
 def get_lowest_action(actions):
     lowest_card = -1
     lowest_rank = R_B + 1
@@ -160,7 +160,7 @@ def get_lowest_action(actions):
                 return action
     return lowest_card
 
-@njit
+@njit(cache=True)
 def get_highest_trump(trump_cards):
     """
     Args:
@@ -174,13 +174,13 @@ def get_highest_trump(trump_cards):
     trump_cards.sort()
     return trump_cards[-1]
 
-@njit
+@njit(cache=True)
 def play_card_null_game(actions, i_am_giver, follow_suit):
     if i_am_giver or follow_suit:
         return get_lowest_null_card(actions)
     return get_highest_null_card(actions)
 
-@njit
+@njit(cache=True)
 def get_lowest_null_card(actions):
     for rank in RANKS_NULL_POSITION:
             for color in range(4):
@@ -189,7 +189,7 @@ def get_lowest_null_card(actions):
                     return card_id
     return 32 # Empty hand
 
-@njit
+@njit(cache=True)
 def get_highest_null_card(actions):
     for r in range(RANKS_NULL_POSITION.shape[0]-1, -1, -1):
         rank = RANKS_NULL_POSITION[r]
@@ -199,7 +199,7 @@ def get_highest_null_card(actions):
                 return card_id
     return 32 # Empty hand
 
-@njit
+@njit(cache=True)
 def get_lowest_null_card_for_color(hand_cards, color):
     for rank in RANKS_NULL_POSITION:
         card_id = get_card_id(color, rank)
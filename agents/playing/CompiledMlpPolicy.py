@@ -0,0 +1,146 @@
+import numpy as np
+from numba import njit
+
+# Activation function ids
+ACTIVATION_NONE = 0
+ACTIVATION_TANH = 1
+ACTIVATION_RELU = 2
+
+ACTIVATIONS = {"Tanh": ACTIVATION_TANH, "ReLU": ACTIVATION_RELU}
+
+
+class CompiledMlpPolicy:
+    """
+    Torch-free MLP policy. Holds the weights of a trained policy network as plain NumPy arrays and evaluates it
+    with a compiled forward pass, so it can run inside njit game kernels and process pools without importing torch.
+
+    The arrays are meant to be passed to mlp_select_card / mlp_forward directly in compiled code (see kernel_args).
+    """
+
+    def __init__(self, weights, biases, shapes, activation):
+        """
+        Args:
+            weights: np.float32 array, all weight matrices (out, in) flattened and concatenated
+            biases: np.float32 array, all bias vectors concatenated
+            shapes: np.int64 array (layers, 2) with (out, in) of every layer
+            activation (int): ACTIVATION_ constant, applied after every layer except the last one
+        """
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self.biases = np.ascontiguousarray(biases, dtype=np.float32)
+        self.shapes = np.ascontiguousarray(shapes, dtype=np.int64)
+        self.activation = int(activation)
+
+    @property
+    def kernel_args(self):
+        """Arguments for mlp_forward and mlp_select_card"""
+        return self.weights, self.biases, self.shapes, self.activation
+
+    def save(self, path):
+        np.savez(path, weights=self.weights, biases=self.biases, shapes=self.shapes, activation=self.activation)
+
+    @staticmethod
+    def load(path):
+        data = np.load(path)
+        return CompiledMlpPolicy(data["weights"], data["biases"], data["shapes"], int(data["activation"]))
+
+    def forward(self, obs):
+        """Action logits for a single np.float32 observation"""
+        return mlp_forward(np.asarray(obs, dtype=np.float32), *self.kernel_args)
+
+    def select_card(self, obs, valid_actions):
+        """Card id with the highest logit among valid_actions (bitmap of length 32)"""
+        return mlp_select_card(np.asarray(obs, dtype=np.float32), np.uint32(valid_actions), *self.kernel_args)
+
+
+def export_policy(model):
+    """
+    Converts the actor of a trained SB3 MlpPolicy (PPO, MaskablePPO, ...) or a torch.nn.Sequential of Linear layers and
+    Tanh/ReLU activations into a CompiledMlpPolicy. Needs torch, but only for the export.
+
+    Args:
+        model: SB3 model or torch.nn.Sequential
+
+    Returns:
+        CompiledMlpPolicy
+    """
+    policy = getattr(model, "policy", None)
+    if policy is not None:
+        assert type(policy.pi_features_extractor).__name__ == "FlattenExtractor", "Only flat observations are supported"
+        modules = list(policy.mlp_extractor.policy_net) + [policy.action_net]
+    else:
+        modules = list(model)
+
+    layers = []
+    activation = ACTIVATION_NONE
+    for module in modules:
+        name = type(module).__name__
+        if name == "Linear":
+            layers.append((module.weight.detach().cpu().numpy(), module.bias.detach().cpu().numpy()))
+        elif name in ACTIVATIONS:
+            assert activation in (ACTIVATION_NONE, ACTIVATIONS[name]), "Only one activation function type is supported"
+            activation = ACTIVATIONS[name]
+        else:
+            raise ValueError(f"Unsupported module in policy network: {name}")
+
+    weights = np.concatenate([w.ravel() for w, _ in layers])
+    biases = np.concatenate([b for _, b in layers])
+    shapes = np.array([w.shape for w, _ in layers], dtype=np.int64)
+    return CompiledMlpPolicy(weights, biases, shapes, activation)
+
+
+@njit(inline='always', cache=True)
+def _activate(x, activation):
+    if activation == ACTIVATION_TANH:
+        return np.tanh(x)
+    if activation == ACTIVATION_RELU:
+        return max(x, np.float32(0))
+    return x
+
+
+@njit(cache=True)
+def mlp_forward(obs, weights, biases, shapes, activation):
+    """
+    Args:
+        obs: np.float32 observation
+        weights, biases, shapes, activation: see CompiledMlpPolicy
+
+    Returns:
+        np.float32 array: Output of the last layer (action logits)
+    """
+    x = obs
+    w_offset = 0
+    b_offset = 0
+    layers = shapes.shape[0]
+    for layer in range(layers):
+        rows = shapes[layer, 0]
+        cols = shapes[layer, 1]
+        y = np.empty(rows, dtype=np.float32)
+        for i in range(rows):
+            row = w_offset + i * cols
+            value = biases[b_offset + i]
+            for j in range(cols):
+                value += weights[row + j] * x[j]
+            y[i] = _activate(value, activation) if layer < layers - 1 else value
+        x = y
+        w_offset += rows * cols
+        b_offset += rows
+    return x
+
+
+@njit(cache=True)
+def mlp_select_card(obs, valid_actions, weights, biases, shapes, activation):
+    """
+    Args:
+        obs: np.float32 observation
+        valid_actions: np.uint32 bitmap of length 32
+        weights, biases, shapes, activation: see CompiledMlpPolicy
+
+    Returns:
+        int: Card id with the highest logit among the valid actions
+    """
+    logits = mlp_forward(obs, weights, biases, shapes, activation)
+    best = -1
+    for card_id in range(32):
+        if (valid_actions >> card_id) & 1 and (best < 0 or logits[card_id] > logits[best]):
+            best = card_id
+    return best
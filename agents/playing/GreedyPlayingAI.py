@@ -46,7 +46,7 @@ class GreedyPlayingAI:
             valid_actions (int): Hand cards that are legal to play (bitmap of length 32)
             current_trick: np array of length 3. Indices equal table positions. Not yet played cards are -1
             trick_giver: player who plays the first card this trick (0-2, table position)
-            history:
+            history: np.uint8 array, read-only. Bidding and played cards so far, read with the functions in history
 
         Returns:
             int: Card to play (Has to be one of valid actions)
@@ -123,7 +123,7 @@ class GreedyPlayingAI:
         return lowest
 
 
-@njit
+@njit(cache=True)
 def get_highest_points_action(actions):
     """
 
@@ -147,7 +147,7 @@ def get_highest_points_action(actions):
     #print("get_highest_points_action ", get_list_text(actions), get_card_name(best_card))
     return best_card
 
-@njit
+@njit(cache=True)
 def get_lowest_action(actions):
     lowest_card = -1
     lowest_rank = R_B + 1
@@ -160,7 +160,7 @@ def get_lowest_action(actions):
                 return action
     return lowest_card
 
-@njit
+@njit(cache=True)
 def get_highest_trump(trump_cards):
     """
     Args:
@@ -174,13 +174,13 @@ def get_highest_trump(trump_cards):
     trump_cards.sort()
     return trump_cards[-1]
 
-@njit
+@njit(cache=True)
 def play_card_null_game(actions, i_am_giver, follow_suit):
     if i_am_giver or follow_suit:
         return get_lowest_null_card(actions)
     return get_highest_null_card(actions)
 
-@njit
+@njit(cache=True)
 def get_lowest_null_card(actions):
     for rank in RANKS_NULL_POSITION:
             for color in range(4):
@@ -189,7 +189,7 @@ def get_lowest_null_card(actions):
                     return card_id
     return 32 # Empty hand
 
-@njit
+@njit(cache=True)
 def get_highest_null_card(actions):
     for r in range(RANKS_NULL_POSITION.shape[0]-1, -1, -1):
         rank = RANKS_NULL_POSITION[r]
@@ -199,10 +199,80 @@ def get_highest_null_card(actions):
                 return card_id
     return 32 # Empty hand
 
-@njit
+@njit(cache=True)
 def get_lowest_null_card_for_color(hand_cards, color):
     for rank in RANKS_NULL_POSITION:
         card_id = get_card_id(color, rank)
         if is_card_present(hand_cards, card_id):
             return card_id
-    return 32 # Empty hand
\ No newline at end of file
+    return 32 # Empty hand
+
+@njit(nogil=True, cache=True)
+def get_greedy_card(game_type, hand_cards, valid_actions, current_trick, trick_giver, position, solo_player):
+    """
+    Compiled equivalent of GreedyPlayingAI.play_card, for rollouts
+
+    Args:
+        game_type (int): Colors (0-3), Grand (4), Null (5)
+        hand_cards (int): bitmap of length 32
+        valid_actions (int): Hand cards that are legal to play (bitmap of length 32)
+        current_trick: np array of length 3. Indices equal table positions. Not yet played cards are -1
+        trick_giver: player who plays the first card this trick (0-2, table position)
+        position (int): Player to play the card
+        solo_player (int): 0-2 table position
+
+    Returns:
+        int: Card to play
+    """
+    trick_position = (3 + position - trick_giver) % 3
+    i_am_giver = trick_position == 0
+    first_card = np.int64(current_trick[trick_giver])
+    follow_suit = False if i_am_giver else must_follow_suit(game_type, hand_cards, first_card)
+
+    if game_type == NULL:
+        return np.int64(play_card_null_game(valid_actions, i_am_giver, follow_suit))
+
+    actions = get_card_list(valid_actions)
+    trump_cards_available = get_card_list(get_trump_cards_in_hand(game_type, valid_actions))
+    has_trump = trump_cards_available.shape[0] > 0
+    highest_points = np.int64(get_highest_points_action(actions))
+    lowest = np.int64(get_lowest_action(actions))
+    highest_trump = np.int64(get_highest_trump(trump_cards_available)) if has_trump else np.int64(-1)
+
+    if i_am_giver:
+        if position == solo_player and has_trump:
+            return highest_trump
+        return highest_points
+
+    first_card_is_trump = is_card_present(get_trump_cards(game_type), first_card)
+
+    if trick_position == 1:
+        if first_card_is_trump:
+            if has_trump and get_highest_trump(np.array([first_card, highest_trump])) == highest_trump:
+                return highest_trump
+            return lowest
+        if follow_suit:
+            if highest_points > first_card:
+                return highest_points
+            return lowest
+        if has_trump:
+            return highest_trump
+        return lowest
+
+    second_card = np.int64(current_trick[(trick_giver + 1) % 3])
+    second_card_is_trump = is_card_present(get_trump_cards(game_type), second_card)
+
+    if first_card_is_trump or second_card_is_trump:
+        if not has_trump:
+            return lowest
+        if get_highest_trump(np.array([first_card, second_card, highest_trump])) == highest_trump:
+            return highest_trump
+        return lowest
+
+    if has_trump:
+        return highest_trump
+
+    if follow_suit and highest_points > first_card and highest_points > second_card:
+        return highest_points
+
+    return lowest
@@ -0,0 +1,533 @@
+import math
+import threading
+from time import perf_counter
+
+import numpy as np
+from numba import njit
+
+import intrinsic
+from GameState import GameState, SOLO, TEAM
+from counters import count, COUNTER_ROLLOUTS, COUNTER_NODES
+from WorkerPool import seed_numba
+from history import get_forehand, get_number_of_played_cards, get_played_card
+from skat import get_valid_actions, count_points, NULL, EXTRA_TIER_SCHNEIDER, EXTRA_TIER_SCHWARZ
+from tablebase import get_tablebase, probe
+
+# Information Set Monte Carlo Tree Search (single observer): one tree over the moves seen from the agent's information
+# set. Every iteration deals the unknown cards at random (respecting the cards played and the colors players showed
+# they don't have), walks the tree with the moves that are legal in that deal, adds one node and plays the rest out
+# randomly. Rewards are stored from the view of the player who made the move of a node.
+#
+# The tree is a set of preallocated arrays, nodes are linked to their first child and next sibling. It is kept
+# between play_card calls and re-rooted at the node of the cards played since the last call.
+#
+# Root parallel mode: every worker of a WorkerPool builds its own tree from the same information set with its own
+# seed, the visits and rewards of the root children are summed up to choose the card. Worker trees aren't reused.
+
+ALL_CARDS = np.uint32(0xFFFFFFFF)
+
+# Share of the reward given for the card points of the solo player, the rest is for winning
+POINTS_WEIGHT = 0.1
+
+# Passed to search without a tablebase, read-only like the memory-mapped tables so both compile to the same types
+NO_TABLEBASE = np.zeros((3, 1), dtype=np.uint8)
+NO_TABLEBASE.setflags(write=False)
+
+
+def new_tree(capacity):
+    """
+    Returns:
+        tuple: Node arrays (moves, players, parents, first_child, next_sibling, visits, rewards, availability) and
+               size, an int64 array holding the number of nodes
+    """
+    return (np.full(capacity, -1, dtype=np.int8),
+            np.full(capacity, -1, dtype=np.int8),
+            np.full(capacity, -1, dtype=np.int32),
+            np.full(capacity, -1, dtype=np.int32),
+            np.full(capacity, -1, dtype=np.int32),
+            np.zeros(capacity, dtype=np.float64),
+            np.zeros(capacity, dtype=np.float64),
+            np.zeros(capacity, dtype=np.float64),
+            np.ones(1, dtype=np.int64))
+
+
+@njit(cache=True)
+def clear_tree(tree):
+    """Leaves only an empty root node (index 0)"""
+    moves, players, parents, first_child, next_sibling, visits, rewards, availability, size = tree
+    moves[0] = -1
+    players[0] = -1
+    parents[0] = -1
+    first_child[0] = -1
+    next_sibling[0] = -1
+    visits[0] = 0.0
+    rewards[0] = 0.0
+    availability[0] = 0.0
+    size[0] = 1
+
+
+@njit(cache=True)
+def find_child(tree, node, card):
+    """
+    Returns:
+        int: Child of node reached by playing card, -1 if it isn't in the tree
+    """
+    moves, players, parents, first_child, next_sibling, visits, rewards, availability, size = tree
+    child = first_child[node]
+    while child >= 0:
+        if moves[child] == card:
+            return child
+        child = next_sibling[child]
+    return -1
+
+
+@njit(cache=True)
+def get_random_card(cards):
+    """
+    Returns:
+        int: One of the cards of a non empty bitmap, uniformly at random
+    """
+    k = np.random.randint(intrinsic.popcount(cards))
+    for _ in range(k):
+        cards &= cards - np.uint32(1)
+    return np.int64(intrinsic.ctz(cards))
+
+
+@njit(cache=True)
+def sample_hidden_cards(unknown, counts, forbidden):
+    """
+    Deals the unknown cards to 3 receivers (the other 2 players and the Skat). Every card goes to a receiver with
+    probability proportional to its free places, which is a uniform deal without void constraints. Deals that get
+    stuck on the constraints are retried, after that the constraints are dropped.
+
+    Args:
+        unknown (int): bitmap of the cards to deal
+        counts: np.int64 array, number of cards for each receiver
+        forbidden: np.uint32 array, cards each receiver can't have
+
+    Returns:
+        np.array: uint32 size 3, cards of each receiver
+    """
+    cards = np.empty(32, dtype=np.int64)
+    n = 0
+    remaining = unknown
+    while remaining:
+        cards[n] = intrinsic.ctz(remaining)
+        remaining &= remaining - np.uint32(1)
+        n += 1
+    hands = np.zeros(3, dtype=np.uint32)
+    left = np.empty(3, dtype=np.int64)
+    for attempt in range(16):
+        constrained = attempt < 15
+        np.random.shuffle(cards[:n])
+        hands[:] = 0
+        left[:] = counts
+        dealt = True
+        for i in range(n):
+            card = cards[i]
+            bit = np.uint32(1) << np.uint32(card)
+            total = 0
+            for r in range(3):
+                if left[r] > 0 and not (constrained and forbidden[r] & bit):
+                    total += left[r]
+            if total == 0:
+                dealt = False
+                break
+            x = np.random.randint(total)
+            for r in range(3):
+                if left[r] > 0 and not (constrained and forbidden[r] & bit):
+                    if x < left[r]:
+                        hands[r] |= bit
+                        left[r] -= 1
+                        break
+                    x -= left[r]
+        if dealt:
+            break
+    return hands
+
+
+@njit(cache=True)
+def replay_history(state, history):
+    """
+    Plays the cards of the history on a new state with empty hands, which only records the cards, trick winners and
+    points. The hands of the other players and the Skat are filled in per deal.
+    """
+    for i in range(get_number_of_played_cards(history)):
+        state.make_move(get_played_card(history, i)[1])
+
+
+@njit(cache=True)
+def get_hidden_cards(game_type, solo_player, position, hand_cards, ouvert_hand, skat, history):
+    """
+    What the player at position knows about the cards of the others: the Ouvert hand and the Skat the solo player put
+    away are known, the rest is dealt to the next player, the player after and the Skat. Players who didn't follow suit
+    can't have cards of that suit.
+
+    Returns:
+        tuple: (known_cards, unknown, counts, forbidden), known_cards np.uint32 array size 3 by player, unknown bitmap
+               of the cards to deal, counts np.int64 array size 3 and forbidden np.uint32 array size 3 by receiver
+    """
+    played_cards = np.uint32(0)
+    cards_played_by = np.zeros(3, dtype=np.int64)
+    void = np.zeros(3, dtype=np.uint32)
+    first_card = 0
+    for i in range(get_number_of_played_cards(history)):
+        player, card = get_played_card(history, i)
+        bit = np.uint32(1) << np.uint32(card)
+        played_cards |= bit
+        cards_played_by[player] += 1
+        if i % 3 == 0:
+            first_card = card
+            continue
+        follow_cards = get_valid_actions(game_type, first_card, ALL_CARDS)
+        if not follow_cards & bit:
+            void[player] |= follow_cards
+    known_cards = np.zeros(3, dtype=np.uint32)
+    if solo_player != position:
+        known_cards[solo_player] = np.uint32(ouvert_hand) & ~played_cards
+    unknown = np.uint32(~(hand_cards | played_cards | known_cards[solo_player] | skat) & ALL_CARDS)
+    counts = np.full(3, 2, dtype=np.int64)
+    if skat:
+        counts[2] = 0
+    forbidden = np.zeros(3, dtype=np.uint32)
+    for r in range(2):
+        player = (position + 1 + r) % 3
+        counts[r] = 10 - cards_played_by[player] - intrinsic.popcount(known_cards[player])
+        forbidden[r] = void[player]
+    return known_cards, unknown, counts, forbidden
+
+
+@njit(cache=True)
+def get_reward(state, solo_win):
+    """Reward of the solo player, between 0 and 1"""
+    if state.game_type == NULL:
+        return 1.0 if solo_win else 0.0
+    return (1.0 - POINTS_WEIGHT) * (1.0 if solo_win else 0.0) + POINTS_WEIGHT * min(state.points[SOLO], 120) / 120.0
+
+
+@njit(nogil=True, cache=True)
+def search(tree, root, game_type, extra_tier, solo_player, position, hand_cards, ouvert_hand, skat, history, iterations, exploration, table,
+           table_tricks):
+    """
+    Runs iterations of ISMCTS from the root node.
+
+    Args:
+        tree: new_tree
+        root (int): Node of the current position
+        game_type (int): Colors (0-3), Grand (4), Null (5)
+        extra_tier (int): EXTRA_TIER_ constant
+        solo_player (int): 0-2
+        position (int): Player to move, who searches
+        hand_cards (int): bitmap
+        ouvert_hand (int): bitmap, hand of the solo player at the start of an Ouvert game, otherwise 0
+        skat (int): bitmap, the Skat if position is the solo player and put it away, otherwise 0
+        history: np.uint8 array, see history
+        iterations (int)
+        exploration (float): UCB exploration constant
+        table: tablebase for table_tricks tricks of the game type, NO_TABLEBASE if table_tricks is 0
+        table_tricks (int): The last table_tricks tricks of the playouts are looked up in table instead of played, 0 for none
+    """
+    use_table = table_tricks > 0 and extra_tier < EXTRA_TIER_SCHWARZ  # The table knows points, not if the team gets a trick
+    moves, players, parents, first_child, next_sibling, visits, rewards, availability, size = tree
+    capacity = moves.shape[0]
+    # Creating the state here instead of passing it in keeps search cacheable
+    root_state = GameState(np.zeros(3, dtype=np.uint32), skat, game_type, extra_tier, solo_player, get_forehand(history))
+    replay_history(root_state, history)
+    known_cards, unknown, counts, forbidden = get_hidden_cards(game_type, solo_player, position, hand_cards, ouvert_hand, skat, history)
+    state = root_state.copy()
+    path = np.empty(32, dtype=np.int64)
+    for _ in range(iterations):
+        count(COUNTER_ROLLOUTS)
+        hidden = sample_hidden_cards(unknown, counts, forbidden)
+        state.load(root_state)
+        state.hands[position] = hand_cards
+        state.hands[(position + 1) % 3] = known_cards[(position + 1) % 3] | hidden[0]
+        state.hands[(position + 2) % 3] = known_cards[(position + 2) % 3] | hidden[1]
+        state.points[SOLO] += count_points(hidden[2])
+
+        # Selection and expansion
+        node = root
+        depth = 0
+        path[depth] = node
+        decided, solo_win, schneider, schwarz = state.get_decided_outcome()
+        while not decided:
+            if use_table and state.cards_in_trick == 0 and state.trick_number == 10 - table_tricks:
+                # The tablebase knows the result of the rest, the node becomes a leaf
+                solo_win = finish_with_tablebase(state, table, table_tricks)
+                decided = True
+                break
+            legal = state.get_legal_moves()
+            untried = legal
+            best = -1
+            best_score = -1.0
+            child = first_child[node]
+            while child >= 0:
+                bit = np.uint32(1) << np.uint32(moves[child])
+                if legal & bit:
+                    untried &= ~bit
+                    availability[child] += 1.0
+                    score = rewards[child] / visits[child] + exploration * math.sqrt(math.log(availability[child]) / visits[child])
+                    if score > best_score:
+                        best = child
+                        best_score = score
+                child = next_sibling[child]
+            if untried:
+                card = get_random_card(untried)
+                if size[0] < capacity:
+                    child = size[0]
+                    size[0] += 1
+                    count(COUNTER_NODES)
+                    moves[child] = card
+                    players[child] = state.player
+                    parents[child] = node
+                    first_child[child] = -1
+                    next_sibling[child] = first_child[node]
+                    first_child[node] = child
+                    visits[child] = 0.0
+                    rewards[child] = 0.0
+                    availability[child] = 1.0
+                    depth += 1
+                    path[depth] = child
+                state.make_move(card)
+                decided, solo_win, schneider, schwarz = state.get_decided_outcome()
+                break
+            state.make_move(moves[best])
+            node = best
+            depth += 1
+            path[depth] = node
+            decided, solo_win, schneider, schwarz = state.get_decided_outcome()
+
+        # Random playout, the last tricks from the tablebase
+        while not decided:
+            if use_table and state.cards_in_trick == 0 and state.trick_number == 10 - table_tricks:
+                solo_win = finish_with_tablebase(state, table, table_tricks)
+                decided = True
+                break
+            state.make_move(get_random_card(state.get_legal_moves()))
+            decided, solo_win, schneider, schwarz = state.get_decided_outcome()
+
+        # Backpropagation
+        reward = get_reward(state, solo_win)
+        for i in range(depth + 1):
+            node = path[i]
+            visits[node] += 1.0
+            rewards[node] += reward if players[node] == solo_player else 1.0 - reward
+
+
+@njit(cache=True)
+def finish_with_tablebase(state, table, n):
+    """
+    Adds the points of the last n tricks with optimal play of both sides to state (not the cards or tricks).
+
+    Returns:
+        bool: solo_win, decided like in SkatGame.playing
+    """
+    remaining = probe(table, n, state.hands, state.leader, state.solo_player)
+    if state.game_type == NULL:
+        return remaining == 0
+    state.points[TEAM] += count_points(state.hands[0] | state.hands[1] | state.hands[2]) - remaining
+    state.points[SOLO] += remaining
+    if state.extra_tier == EXTRA_TIER_SCHNEIDER:
+        return state.points[TEAM] <= 30
+    return state.points[SOLO] > 60
+
+
+@njit(cache=True)
+def get_root_statistics(tree, root, valid_actions):
+    """
+    Returns:
+        tuple: (visits, rewards) np.float64 arrays of size 32, summed reward and visit count of every valid card
+    """
+    moves, players, parents, first_child, next_sibling, visits, rewards, availability, size = tree
+    card_visits = np.zeros(32, dtype=np.float64)
+    card_rewards = np.zeros(32, dtype=np.float64)
+    child = first_child[root]
+    while child >= 0:
+        card = moves[child]
+        if valid_actions & (np.uint32(1) << np.uint32(card)):
+            card_visits[card] = visits[child]
+            card_rewards[card] = rewards[child]
+        child = next_sibling[child]
+    return card_visits, card_rewards
+
+
+def get_most_visited_card(root_statistics, valid_actions):
+    """
+    Card with the most visits. Without any visits (the outcome was already decided at the root, so the search didn't
+    expand it) every card is as good as any other and the lowest valid card is played.
+
+    Returns:
+        int: Card of valid_actions
+    """
+    if root_statistics[0].max() == 0:
+        return int(intrinsic.ctz(np.uint32(valid_actions)))
+    return int(np.argmax(root_statistics[0]))
+
+
+def run_search(tree, root, game_type, extra_tier, solo_player, position, hand_cards, ouvert_hand, skat, history, iterations, time_budget,
+               batch_size, exploration, tablebase_tricks=0):
+    """
+    Searches for iterations, then in batches of batch_size until time_budget (seconds, None for no time budget) is used up.
+    The tablebase of tablebase_tricks tricks is used if it has been built (see tablebase.build_tablebase).
+    See search for the other arguments.
+
+    Returns:
+        int: Iterations done
+    """
+    table = get_tablebase(game_type, tablebase_tricks) if tablebase_tricks > 0 else None
+    if table is None:
+        table = NO_TABLEBASE
+        tablebase_tricks = 0
+    start = perf_counter()
+    done = 0
+    while done < iterations or (time_budget is not None and perf_counter() - start < time_budget):
+        batch = batch_size if time_budget is not None else iterations
+        search(tree, root, game_type, extra_tier, solo_player, position, np.uint32(hand_cards), np.uint32(ouvert_hand), np.uint32(skat), history,
+               batch, exploration, table, tablebase_tricks)
+        done += batch
+    return done
+
+
+# Tree of a pool worker (or thread of a ThreadPool), allocated by the first root parallel search in the worker
+_worker = threading.local()
+
+
+def _root_parallel_task(seed, capacity, game_type, extra_tier, solo_player, position, hand_cards, ouvert_hand, skat, history,
+                        valid_actions, iterations, time_budget, batch_size, exploration, tablebase_tricks):
+    """
+    Searches a new tree in a pool worker.
+
+    Returns:
+        tuple: (visits, rewards, iterations done), see get_root_statistics
+    """
+    tree = getattr(_worker, "tree", None)
+    if tree is None or tree[0].shape[0] != capacity:
+        tree = _worker.tree = new_tree(capacity)
+    clear_tree(tree)
+    seed_numba(seed)
+    done = run_search(tree, 0, game_type, extra_tier, solo_player, position, hand_cards, ouvert_hand, skat, history, iterations,
+                      time_budget, batch_size, exploration, tablebase_tricks)
+    return get_root_statistics(tree, 0, np.uint32(valid_actions)) + (done,)
+
+
+class ISMCTSPlayingAI:
+    """
+    Plays the card with the most visits of an Information Set Monte Carlo Tree Search. The search runs for a number
+    of iterations or, if time_budget is given, until the time is up. The subtree of the position reached is reused
+    for the next card. With a WorkerPool, every worker searches its own tree (root parallel) with this budget.
+    """
+
+    def __init__(self, iterations=10000, time_budget=None, exploration=0.7, capacity=500_000, reuse_tree=True, batch_size=1000, pool=None,
+                 seed=None, tablebase_tricks=0):
+        """
+        Args:
+            iterations (int): Iterations per card, the minimum if time_budget is given
+            time_budget (float): Seconds per card, None to search exactly iterations
+            exploration (float): UCB exploration constant
+            capacity (int): Maximum number of nodes, the tree is cleared when it is full
+            reuse_tree (bool): Keep the subtree of the position reached between cards
+            batch_size (int): Iterations between checks of the time budget
+            pool (WorkerPool): Search root parallel on all workers of the pool (or threads of a ThreadPool), None searches in this
+                process
+            seed (int): Seed for the seeds of the workers
+            tablebase_tricks (int): Look up the last tablebase_tricks tricks of the playouts in the tablebase of the game type,
+                if it has been built (tablebase.build_tablebase). 0 plays them out at random.
+        """
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.reuse_tree = reuse_tree
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.pool = pool
+        self.tablebase_tricks = tablebase_tricks
+        self.seeds = np.random.SeedSequence(seed)
+        self.tree = new_tree(capacity) if pool is None else None
+        self.root = 0
+        self.root_cards_played = 0
+        self.game_type = 0
+        self.extra_tier = 0
+        self.solo_player = 0
+        self.table_position = 0
+        self.ouvert_hand = 0
+        self.skat = 0
+        self.last_iterations = 0
+        self.root_statistics = None  # (visits, rewards) of the cards at the last search, see get_root_statistics
+
+    def start_playing(self, game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour=1, skat=0):
+        """
+        Called at the start of the card playing phase to pass initial gamestate
+        Args:
+            game_type (int): Colors (0-3), Grand (4), Null (5)
+            extra_tier (int): Normal - Ouvert (0-4) (See EXTRA_TIER_ constants for more details)
+            hand_cards (int): bitmap of length 32
+            position (int): 0-2 table position
+            solo_player (int): 0-2 table position
+            ouvert_hand (int): bitmap of length 32. Hand of the solo player, only given when game is Ouvert, otherwise 0
+            bidding_history
+            behaviour (float): 1 is normal
+            skat (int): bitmap of length 32. Cards the solo player put into the Skat, 0 if unknown (Hand game or not solo)
+        """
+        self.game_type = game_type
+        self.extra_tier = extra_tier
+        self.solo_player = solo_player
+        self.table_position = position
+        self.ouvert_hand = ouvert_hand
+        self.skat = skat if position == solo_player else 0
+        if self.tree is not None:
+            clear_tree(self.tree)
+        self.root = 0
+        self.root_cards_played = 0
+
+    def update_root(self, history):
+        """Moves the root to the current position, the tree is cleared if it doesn't contain it or is full"""
+        n = get_number_of_played_cards(history)
+        node = self.root if self.reuse_tree else -1
+        size = self.tree[-1]
+        if size[0] >= self.tree[0].shape[0]:
+            node = -1
+        for i in range(self.root_cards_played, n):
+            if node < 0:
+                break
+            node = find_child(self.tree, node, get_played_card(history, i)[1])
+        if node < 0:
+            clear_tree(self.tree)
+            node = 0
+        self.root = node
+        self.root_cards_played = n
+
+    def play_card(self, hand_cards, valid_actions, current_trick, trick_giver, history):
+        """
+        Args:
+            hand_cards (int): bitmap of length 32
+            valid_actions (int): Hand cards that are legal to play (bitmap of length 32)
+            current_trick: np array of length 3. Indices equal table positions. Not yet played cards are -1
+            trick_giver: player who plays the first card this trick (0-2, table position)
+            history: np.uint8 array, read-only. Bidding and played cards so far, read with the functions in history
+
+        Returns:
+            int: Card to play (Has to be one of valid actions)
+        """
+        valid_actions = np.uint32(valid_actions)
+        if valid_actions & (valid_actions - np.uint32(1)) == 0:
+            return intrinsic.ctz(valid_actions)
+        if self.pool is not None:
+            return self.play_card_root_parallel(hand_cards, valid_actions, history)
+        self.update_root(history)
+        self.last_iterations = run_search(self.tree, self.root, self.game_type, self.extra_tier, self.solo_player, self.table_position, hand_cards,
+                                          self.ouvert_hand, self.skat, history, self.iterations, self.time_budget, self.batch_size, self.exploration,
+                                          self.tablebase_tricks)
+        self.root_statistics = get_root_statistics(self.tree, self.root, valid_actions)
+        return get_most_visited_card(self.root_statistics, valid_actions)
+
+    def play_card_root_parallel(self, hand_cards, valid_actions, history):
+        """Searches on all workers of the pool and plays the card with the most visits over all trees"""
+        history = np.array(history)
+        tasks = [(int(seed), self.capacity, self.game_type, self.extra_tier, self.solo_player, self.table_position, int(hand_cards),
+                  int(self.ouvert_hand), int(self.skat), history, int(valid_actions), self.iterations, self.time_budget, self.batch_size,
+                  self.exploration, self.tablebase_tricks)
+                 for seed in self.seeds.spawn(1)[0].generate_state(self.pool.processes)]
+        results = self.pool.starmap(_root_parallel_task, tasks)
+        self.root_statistics = (sum(result[0] for result in results), sum(result[1] for result in results))
+        self.last_iterations = sum(result[2] for result in results)
+        return get_most_visited_card(self.root_statistics, valid_actions)
@@ -0,0 +1,248 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+
+import tracing
+
+
+class InferenceBroker:
+    """
+    Collects observations from many concurrently running games (one thread per game/table) and evaluates them
+    in a single forward pass of the policy network.
+
+    A batch is evaluated as soon as max_batch observations are pending or the oldest one has waited max_wait seconds.
+    Batched engines that already hold many observations can call evaluate directly.
+
+    Search agents submit whole batches of leaf observations (submit_leaves) and get the policy logits and values back.
+    Leaves and card decisions of all threads share the same forward passes.
+
+    Actions are card ids (0-31), like in SkatPlayingEnv.
+    """
+
+    def __init__(self, model, max_batch=256, max_wait=0.002, device="cpu"):
+        """
+        Args:
+            model: SB3 model (PPO, MaskablePPO, ...), SB3 policy or torch.nn.Module returning (policy_logits, value)
+            max_batch (int): Maximum number of observations per forward pass
+            max_wait (float): Maximum seconds an observation waits for the batch to fill up
+            device (str): torch device, inference runs on 'cpu' by default
+        """
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.device = torch.device(device)
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()  # Keeps submits and stop from interleaving, so no request is queued after stop
+        self.thread = None
+        self.running = False
+        self.batches = 0
+        self.observations = 0
+
+    def start(self):
+        """Start the background thread that evaluates submitted observations. Does nothing if it is already running."""
+        with self.lock:
+            if self.running:
+                return self
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="InferenceBroker", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background thread. Requests that are still queued are evaluated before it returns."""
+        with self.lock:
+            self.running = False
+            self.requests.put(None)  # Wake up the thread
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        batch = []
+        while True:
+            try:
+                request = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                batch.append(request)
+        for i in range(0, len(batch), self.max_batch):
+            self._evaluate_requests(batch[i:i + self.max_batch])
+
+    def _put(self, request):
+        with self.lock:
+            if not self.running:
+                raise RuntimeError("InferenceBroker is not running, call start() first")
+            self.requests.put(request)
+
+    def submit(self, obs, valid_actions):
+        """
+        Queue an observation for the next batch. Raises RuntimeError if the broker isn't running.
+
+        Args:
+            obs: np.float32 observation
+            valid_actions (int): bitmap of length 32
+
+        Returns:
+            concurrent.futures.Future: resolves to the card id to play
+        """
+        future = Future()
+        self._put((obs, valid_actions, future))
+        return future
+
+    def play(self, obs, valid_actions):
+        """Blocking version of submit, returns the card id to play"""
+        if not self.running:
+            return int(self.evaluate(np.asarray(obs)[None], np.array([valid_actions], dtype=np.uint32))[0])
+        return self.submit(obs, valid_actions).result()
+
+    def submit_leaves(self, obs_batch):
+        """
+        Queue the observations of search leaves for the next batch. Raises RuntimeError if the broker isn't running.
+
+        Args:
+            obs_batch: np.float32 array (n, observation size)
+
+        Returns:
+            concurrent.futures.Future: resolves to (logits, values), see evaluate_policy_value
+        """
+        future = Future()
+        self._put((obs_batch, None, future))
+        return future
+
+    def evaluate_leaves(self, obs_batch):
+        """Blocking version of submit_leaves"""
+        if not self.running:
+            return self.evaluate_policy_value(obs_batch)
+        return self.submit_leaves(obs_batch).result()
+
+    def evaluate_policy_value(self, obs_batch):
+        """
+        Single forward pass for a batch of observations.
+
+        Args:
+            obs_batch: np.float32 array (n, observation size)
+
+        Returns:
+            tuple: (logits, values), np.float32 arrays (n, 32) and (n). Values are from the view of the player to move.
+        """
+        with torch.inference_mode():
+            obs_tensor = torch.as_tensor(obs_batch, dtype=torch.float32, device=self.device)
+            logits, values = get_policy_value(self.model, obs_tensor)
+            return logits.float().cpu().numpy(), values.float().reshape(-1).cpu().numpy()
+
+    def evaluate(self, obs_batch, valid_actions):
+        """
+        Single forward pass for a batch of observations.
+
+        Args:
+            obs_batch: np.float32 array (n, observation size)
+            valid_actions: np.uint32 array (n) of valid action bitmaps
+
+        Returns:
+            np.array (n): Card id with the highest probability among the valid actions for each observation
+        """
+        with torch.inference_mode():
+            obs_tensor = torch.as_tensor(obs_batch, dtype=torch.float32, device=self.device)
+            logits = get_action_logits(self.model, obs_tensor)
+            valid = torch.as_tensor(np.asarray(valid_actions, dtype=np.int64), device=self.device)
+            mask = ((valid[:, None] >> torch.arange(32, device=self.device)) & 1).bool()
+            logits = logits.masked_fill(~mask, float("-inf"))
+            return logits.argmax(dim=1).cpu().numpy()
+
+    def _run(self):
+        while self.running:
+            request = self.requests.get()
+            if request is None:
+                continue
+            batch = [request]
+            size = len(request[0]) if request[1] is None else 1
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None:
+                    break
+                batch.append(request)
+                size += len(request[0]) if request[1] is None else 1
+            self._evaluate_requests(batch)
+
+    def _evaluate_requests(self, batch):
+        trace = tracing.start_sample()
+        if trace:
+            start = tracing.now()
+        obs_batch = np.concatenate([np.atleast_2d(request[0]) for request in batch])
+        try:
+            if all(request[1] is not None for request in batch):
+                valid_actions = np.array([request[1] for request in batch], dtype=np.uint32)
+                cards = self.evaluate(obs_batch, valid_actions)
+                logits = values = None
+            else:
+                logits, values = self.evaluate_policy_value(obs_batch)
+        except Exception as e:
+            for request in batch:
+                request[2].set_exception(e)
+            return
+        if trace:
+            tracing.add_span("inference batch", "inference", start, {"batch_size": len(obs_batch)})
+        i = 0
+        for obs, valid_actions, future in batch:
+            if valid_actions is None:
+                n = len(obs)
+                future.set_result((logits[i:i + n], values[i:i + n]))
+            elif logits is None:
+                future.set_result(int(cards[i]))
+                n = 1
+            else:
+                future.set_result(int(select_card(logits[i], valid_actions)))
+                n = 1
+            i += n
+        self.batches += 1
+        self.observations += len(obs_batch)
+
+
+def select_card(logits, valid_actions):
+    """Card id with the highest logit among valid_actions (bitmap of length 32)"""
+    mask = ((np.uint32(valid_actions) >> np.arange(32, dtype=np.uint32)) & 1).astype(np.bool_)
+    return np.argmax(np.where(mask, logits, -np.inf))
+
+
+def get_policy_value(model, obs_tensor):
+    """
+    Args:
+        model: SB3 model (PPO, MaskablePPO, ...), SB3 policy or torch.nn.Module returning (policy_logits, value)
+        obs_tensor: torch tensor (n, observation size)
+
+    Returns:
+        tuple: torch tensors (n, 32) action logits and (n) values
+    """
+    policy = model if hasattr(model, "mlp_extractor") else getattr(model, "policy", None)
+    if policy is None:
+        logits, values = model(obs_tensor)
+        return logits, values.reshape(-1)
+    latent_pi = policy.mlp_extractor.forward_actor(policy.extract_features(obs_tensor, policy.pi_features_extractor))
+    latent_vf = policy.mlp_extractor.forward_critic(policy.extract_features(obs_tensor, policy.vf_features_extractor))
+    return policy.action_net(latent_pi), policy.value_net(latent_vf).reshape(-1)
+
+
+def get_action_logits(model, obs_tensor):
+    """
+    Args:
+        model: SB3 model (PPO, MaskablePPO, ...), SB3 policy or torch.nn.Module returning (policy_logits, value)
+        obs_tensor: torch tensor (n, observation size)
+
+    Returns:
+        torch tensor (n, 32): Action logits
+    """
+    policy = model if hasattr(model, "mlp_extractor") else getattr(model, "policy", None)
+    if policy is None:
+        logits, _ = model(obs_tensor)
+        return logits
+    features = policy.extract_features(obs_tensor, policy.pi_features_extractor)
+    latent_pi = policy.mlp_extractor.forward_actor(features)
+    return policy.action_net(latent_pi)
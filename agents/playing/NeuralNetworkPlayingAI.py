@@ -1,103 +1,32 @@
-from skat import get_card_list
-import torch
-
-class NeuralNetworkPlayingAI:
-    """
-    PlayingAgent implementation that uses a trained PPO model.
-    Only handles model calls; observation/action translation is done externally.
-    """
-
-    def __init__(self, model_path=None, device=None):
-        """
-        Args:
-            model_path (str): Path to trained PyTorch PPO model weights
-            device (str or torch.device): 'cpu' or 'cuda'; auto-detect if None
-        """
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        self.model = None
-        if model_path is not None:
-            self.load_model(model_path)
-        self.last_obs = None
-        self.last_action_mask = None
-
-    def load_model(self, model_path):
-        """Load a trained PyTorch model"""
-        # Model class should match the one used during training
-        # For example, you could have a torch.nn.Module policy
-        self.model = torch.load(model_path, map_location=self.device)
-        self.model.eval()
-
-    def start_playing(self, game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour=1):
-        """
-        Called at the start of a game to set initial state.
-        You can store info here if needed for observation creation.
-        """
-        # Store initial game info for later observation construction
-        self.game_type = game_type
-        self.extra_tier = extra_tier
-        self.hand_cards = hand_cards
-        self.position = position
-        self.solo_player = solo_player
-        self.ouvert_hand = ouvert_hand
-        self.bidding_history = bidding_history
-        self.behaviour = behaviour
+import numpy as np
 
-    def play_card(self, hand_cards, valid_actions, current_trick, trick_giver, history):
-        """
-        Ask the model for the next card to play.
-        Assumes external code converts the game state to the correct input tensor.
-        """
-        # Prepare observation (user will implement)
-        obs = self._create_observation(hand_cards, valid_actions, current_trick, trick_giver, history)
-        self.last_obs = obs
-        self.last_action_mask = valid_actions
-
-        # Convert observation to torch tensor
-        obs_tensor = torch.tensor(obs, dtype=torch.float32, device=self.device).unsqueeze(0)
-
-        with torch.no_grad():
-            # Forward pass through the model
-            logits, _ = self.model(obs_tensor)  # Assume model returns (policy_logits, value)
-            # Mask invalid actions
-            logits_masked = logits.clone()
-            logits_masked[0, torch.tensor([i for i, valid in enumerate(get_card_list(valid_actions)) if not valid])] = -1e9
-
-            # Select action with highest probability
-            probs = torch.softmax(logits_masked, dim=-1)
-            action_index = torch.argmax(probs, dim=-1).item()
-
-        # Convert action index back to card
-        card = self._map_action_index_to_card(action_index, valid_actions)
-        return card
-
-    def _create_observation(self, hand_cards, valid_actions, current_trick, trick_giver, history):
-        """
-        Placeholder: user implements this
-        Should return np.array of size 1183 matching training input
-        """
-        raise NotImplementedError("Observation creation logic must be implemented by user")
-
-    def _map_action_index_to_card(self, action_index, valid_actions):
-        """
-        Placeholder: map model output index to actual card in valid_actions
-        """
-        raise NotImplementedError("Action mapping logic must be implemented by user")
+from agents.playing.CompiledMlpPolicy import CompiledMlpPolicy
+from skat import get_card_list
 
 
 class NeuralNetworkPlayingAI:
     """
-    PlayingAgent implementation that uses a trained SB3 PPO model.
-    Observation creation and mapping from model output to card is handled externally.
+    PlayingAgent implementation that uses a trained model, either a SB3 PPO model (.zip), a PyTorch model
+    returning (policy_logits, value) or an exported CompiledMlpPolicy (.npz), which doesn't need torch.
+    Actions are card ids, like in SkatPlayingEnv.
+
+    Model calls go through an InferenceBroker. Agents of many concurrently running games can share one started broker,
+    so their observations are evaluated together in a single forward pass.
+    Observation creation is handled externally.
     """
 
-    def __init__(self, model_path=None, device=None):
+    def __init__(self, model_path=None, device="cpu", broker=None, quantized=False):
         """
         Args:
-            model_path (str): path to SB3 trained PPO model (.zip)
-            device (str): 'cpu' or 'cuda', None will auto-detect
+            model_path (str): Path to a SB3 model (.zip), an exported CompiledMlpPolicy (.npz) or a PyTorch model
+            device (str): 'cpu' or 'cuda'
+            broker (InferenceBroker): Shared broker, if None a broker without background thread is created for the loaded model
+            quantized (bool): Use dynamic int8 quantization of the linear layers for CPU inference (see agents.playing.quantization)
         """
         self.device = device
-        self.model = None
+        self.quantized = quantized
+        self.broker = broker
+        self.compiled_policy = None
         if model_path is not None:
             self.load_model(model_path)
 
@@ -110,10 +39,29 @@ class NeuralNetworkPlayingAI:
         self.ouvert_hand = None
         self.bidding_history = None
         self.behaviour = None
+        self.last_obs = None
+        self.last_action_mask = None
 
     def load_model(self, model_path):
-        """Load a trained SB3 PPO model"""
-        self.model = PPO.load(model_path, device=self.device)
+        """Load a trained SB3 PPO model (.zip), CompiledMlpPolicy (.npz) or PyTorch model"""
+        if str(model_path).endswith(".npz"):
+            self.compiled_policy = CompiledMlpPolicy.load(model_path)
+            return
+
+        import torch
+        from agents.playing.InferenceBroker import InferenceBroker
+        if str(model_path).endswith(".zip"):
+            from stable_baselines3 import PPO
+            model = PPO.load(model_path, device=self.device)
+            model.policy.eval()
+        else:
+            model = torch.load(model_path, map_location=self.device, weights_only=False)
+            model.eval()
+        if self.quantized:
+            from agents.playing.quantization import quantize_policy
+            model = quantize_policy(model)
+            self.device = "cpu"
+        self.broker = InferenceBroker(model, device=self.device)
 
     def start_playing(self, game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour=1):
         """
@@ -130,34 +78,21 @@ class NeuralNetworkPlayingAI:
 
     def play_card(self, hand_cards, valid_actions, current_trick, trick_giver, history):
         """
-        Returns card selected by PPO model
+        Returns the valid card with the highest probability according to the model
         """
-        if self.model is None:
+        if self.broker is None and self.compiled_policy is None:
             # fallback to first valid card if model not loaded
             return get_card_list(valid_actions)[0]
 
-        # 1. Construct observation (user implements)
-        obs = self._create_observation(hand_cards, valid_actions, current_trick, trick_giver, history)
-
-        # SB3 PPO expects either 1D array or dict; convert as needed
-        obs_input = np.array(obs, dtype=np.float32)
-
-        # 2. Use SB3 PPO predict
-        # deterministic=True for greedy evaluation, False for stochastic exploration
-        action_index, _ = self.model.predict(obs_input, deterministic=True)
-
-        # 3. Map action index to actual card in valid_actions
-        card = self._map_action_index_to_card(action_index, valid_actions)
-        return card
+        obs = np.asarray(self._create_observation(hand_cards, valid_actions, current_trick, trick_giver, history), dtype=np.float32)
+        self.last_obs = obs
+        self.last_action_mask = valid_actions
+        if self.compiled_policy is not None:
+            return self.compiled_policy.select_card(obs, valid_actions)
+        return self.broker.play(obs, valid_actions)
 
     def _create_observation(self, hand_cards, valid_actions, current_trick, trick_giver, history):
         """
-        Placeholder: user converts game state to fixed-size input array (size 1183)
+        Placeholder: user converts game state to fixed-size input array (observation.SIZE)
         """
         raise NotImplementedError("Observation construction must be implemented by user")
-
-    def _map_action_index_to_card(self, action_index, valid_actions):
-        """
-        Placeholder: map model output index to a card in valid_actions
-        """
-        raise NotImplementedError("Action mapping must be implemented by user")
\ No newline at end of file
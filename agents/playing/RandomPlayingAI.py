@@ -31,7 +31,7 @@ class RandomPlayingAI:
             valid_actions (int): Hand cards that are legal to play (bitmap of length 32)
             current_trick: np array of length 3. Indices equal table positions. Not yet played cards are -1
             trick_giver: player who plays the first card this trick (0-2, table position)
-            history:
+            history: np.uint8 array, read-only. Bidding and played cards so far, read with the functions in history
 
         Returns:
             int: Card to play (Has to be one of valid actions)
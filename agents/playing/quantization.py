@@ -0,0 +1,118 @@
+import copy
+import sys
+from time import perf_counter
+
+import numpy as np
+import torch
+from tabulate import tabulate
+
+from agents.playing.InferenceBroker import InferenceBroker
+
+# Minimum action agreement with the float model before a quantized model should be deployed
+MIN_AGREEMENT = 0.99
+
+
+def quantize_policy(model):
+    """
+    Dynamic int8 quantization of all Linear layers of the policy network, for CPU-only inference.
+    Weights are quantized ahead of time, activations on the fly per batch.
+
+    Args:
+        model: SB3 model (PPO, MaskablePPO, ...) or torch.nn.Module returning (policy_logits, value)
+
+    Returns:
+        torch.nn.Module: Quantized copy of the policy, usable with InferenceBroker. The original model stays untouched.
+    """
+    policy = getattr(model, "policy", model)
+    policy = copy.deepcopy(policy).to("cpu").eval()
+    return torch.ao.quantization.quantize_dynamic(policy, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def record_observations(env, number_of_observations, seed=0):
+    """
+    Records observations and valid actions by playing random valid cards in a SkatPlayingEnv
+
+    Returns:
+        tuple: (observations np.float32 (n, size), valid_actions np.uint32 (n))
+    """
+    rng = np.random.default_rng(seed)
+    observations = []
+    valid_actions = []
+    obs, _ = env.reset(seed=seed)
+    while len(observations) < number_of_observations:
+        mask = env.action_masks()
+        observations.append(obs)
+        valid_actions.append(np.sum(mask.astype(np.uint64) << np.arange(32, dtype=np.uint64)))
+        obs, _, terminated, _, _ = env.step(rng.choice(np.flatnonzero(mask)))
+        if terminated:
+            obs, _ = env.reset()
+    return np.array(observations, dtype=np.float32), np.array(valid_actions, dtype=np.uint32)
+
+
+def measure(broker, observations, valid_actions, batch_size, repetitions=3):
+    """
+    Returns:
+        tuple: (chosen cards, mean latency per forward pass in ms, throughput in observations/s)
+    """
+    broker.evaluate(observations[:batch_size], valid_actions[:batch_size])  # warm up
+    n = observations.shape[0]
+    best_time = np.inf
+    cards = None
+    for _ in range(repetitions):
+        start = perf_counter()
+        results = [broker.evaluate(observations[i:i + batch_size], valid_actions[i:i + batch_size]) for i in range(0, n, batch_size)]
+        best_time = min(best_time, perf_counter() - start)
+        cards = np.concatenate(results)
+    passes = (n + batch_size - 1) // batch_size
+    return cards, 1000 * best_time / passes, n / best_time
+
+
+def compare_quantized(model, observations, valid_actions, batch_sizes=(1, 64, 256)):
+    """
+    Compares the quantized policy against the float model on recorded observations.
+
+    Returns:
+        dict: action agreement and per batch size latency/throughput of both models
+    """
+    float_broker = InferenceBroker(model, device="cpu")
+    quantized_broker = InferenceBroker(quantize_policy(model), device="cpu")
+    report = {"observations": int(observations.shape[0]), "batches": []}
+    agreement = None
+    for batch_size in batch_sizes:
+        float_cards, float_latency, float_throughput = measure(float_broker, observations, valid_actions, batch_size)
+        quantized_cards, quantized_latency, quantized_throughput = measure(quantized_broker, observations, valid_actions, batch_size)
+        if agreement is None:
+            agreement = float(np.mean(float_cards == quantized_cards))
+        report["batches"].append({
+            "batch_size": batch_size,
+            "float_latency_ms": float_latency,
+            "quantized_latency_ms": quantized_latency,
+            "float_throughput": float_throughput,
+            "quantized_throughput": quantized_throughput,
+        })
+    report["agreement"] = agreement
+    report["safe"] = agreement >= MIN_AGREEMENT
+    return report
+
+
+def print_report(report):
+    print(f"Action agreement on {report['observations']} observations: {round(100 * report['agreement'], 2)}% "
+          f"({'safe to deploy' if report['safe'] else f'below {100 * MIN_AGREEMENT}%, not safe to deploy'})")
+    data = [[b["batch_size"], round(b["float_latency_ms"], 3), round(b["quantized_latency_ms"], 3), int(b["float_throughput"]), int(b["quantized_throughput"]),
+             f"{round(b['float_latency_ms'] / b['quantized_latency_ms'], 2)}x"] for b in report["batches"]]
+    print(tabulate(data, headers=["Batch size", "Latency float (ms)", "Latency int8 (ms)", "Obs/s float", "Obs/s int8", "Speedup"]))
+
+
+def main():
+    """Usage (with reinforcement_learning on the PYTHONPATH): python -m agents.playing.quantization model.zip [number_of_observations]"""
+    from stable_baselines3 import PPO
+    from SkatPlayingEnv import SkatPlayingEnv
+
+    model = PPO.load(sys.argv[1], device="cpu")
+    number_of_observations = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    observations, valid_actions = record_observations(SkatPlayingEnv(), number_of_observations)
+    print_report(compare_quantized(model, observations, valid_actions))
+
+
+if __name__ == "__main__":
+    main()
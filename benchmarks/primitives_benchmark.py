@@ -0,0 +1,186 @@
+import json
+import sys
+from time import perf_counter
+
+import numpy as np
+from numba import njit
+from tabulate import tabulate
+
+from agents.bidding.BasicBiddingAI import calculate_null_color_gaps, calculate_null_color_gaps_lut, calculate_null_color_gaps_ctz, bid_spitze, \
+    bid_null_color_gaps
+from skat import get_spitze, get_spitze32, get_spitze64, get_spitze_neu, get_spitze_cgpt, extract_jacks, extract_color_without_jack, \
+    combine_jacks_and_color, add_skat_to_hand, deal_new_cards_from_deck, NUMBER_OF_CARDS
+
+SPITZE_VARIANTS = {
+    "get_spitze": get_spitze,
+    "get_spitze32": get_spitze32,
+    "get_spitze64": get_spitze64,
+    "get_spitze_neu": get_spitze_neu,
+    "get_spitze_cgpt": get_spitze_cgpt,
+}
+
+NULL_COLOR_GAPS_VARIANTS = {
+    "calculate_null_color_gaps": calculate_null_color_gaps,
+    "calculate_null_color_gaps_lut": calculate_null_color_gaps_lut,
+    "calculate_null_color_gaps_ctz": calculate_null_color_gaps_ctz,
+}
+
+
+def deal_hands(number_of_deals, seed=0):
+    """
+    Returns:
+        tuple: (hands np.uint32 (3n), hands with Skat np.uint32 (3n)), the hands of 3 players for every deal
+    """
+    rng = np.random.default_rng(seed)
+    decks = rng.permuted(np.tile(np.arange(NUMBER_OF_CARDS), (number_of_deals, 1)), axis=1)
+    hands = np.empty(3 * number_of_deals, dtype=np.uint32)
+    hands_with_skat = np.empty(3 * number_of_deals, dtype=np.uint32)
+    for j in range(number_of_deals):
+        cards = deal_new_cards_from_deck(decks[j])
+        for i in range(3):
+            hands[3 * j + i] = cards[i]
+            hands_with_skat[3 * j + i] = add_skat_to_hand(cards[i], cards[3])
+    return hands, hands_with_skat
+
+
+def get_spitze_inputs(hands_with_skat):
+    """
+    The calls calculate_bid makes for every hand: Jacks with and without on_only, every color on its own with on_only
+    and every color as trump (Jacks and color) without on_only.
+
+    Returns:
+        tuple: (bitmaps np.uint32, sizes np.int64, on_only np.bool_)
+    """
+    bitmaps, sizes, on_only = [], [], []
+    for hand in hands_with_skat:
+        jacks = extract_jacks(hand)
+        bitmaps += [jacks, jacks]
+        sizes += [4, 4]
+        on_only += [False, True]
+        for color in range(4):
+            color_bits = extract_color_without_jack(hand, color)
+            bitmaps += [color_bits, combine_jacks_and_color(jacks, color_bits)]
+            sizes += [7, 11]
+            on_only += [True, False]
+    return np.array(bitmaps, dtype=np.uint32), np.array(sizes, dtype=np.int64), np.array(on_only, dtype=np.bool_)
+
+
+def get_all_spitze_inputs():
+    """Every possible bitmap of the sizes 4, 7 and 11 with and without on_only"""
+    bitmaps, sizes, on_only = [], [], []
+    for size in (4, 7, 11):
+        for flag in (False, True):
+            bitmaps.append(np.arange(1 << size, dtype=np.uint32))
+            sizes.append(np.full(1 << size, size, dtype=np.int64))
+            on_only.append(np.full(1 << size, flag, dtype=np.bool_))
+    return np.concatenate(bitmaps), np.concatenate(sizes), np.concatenate(on_only)
+
+
+def get_all_null_color_inputs():
+    """Every possible combination of cards of a single color, for every color"""
+    return np.concatenate([np.arange(256, dtype=np.uint32) << (8 * color) for color in range(4)]).astype(np.uint32)
+
+
+@njit(cache=True)
+def apply_spitze(variant, bitmaps, sizes, on_only):
+    results = np.empty(bitmaps.shape[0], dtype=np.int64)
+    for i in range(bitmaps.shape[0]):
+        results[i] = variant(bitmaps[i], sizes[i], on_only[i])
+    return results
+
+
+@njit(cache=True)
+def loop_spitze(variant, bitmaps, sizes, on_only, repetitions):
+    total = 0
+    for _ in range(repetitions):
+        for i in range(bitmaps.shape[0]):
+            total += variant(bitmaps[i], sizes[i], on_only[i])
+    return total
+
+
+@njit(cache=True)
+def apply_null_color_gaps(variant, hands):
+    results = np.empty((hands.shape[0], 4), dtype=np.float64)
+    for i in range(hands.shape[0]):
+        results[i] = variant(hands[i])
+    return results
+
+
+@njit(cache=True)
+def loop_null_color_gaps(variant, hands, repetitions):
+    total = 0.0
+    for _ in range(repetitions):
+        for i in range(hands.shape[0]):
+            total += variant(hands[i]).sum()
+    return total
+
+
+def time_loop(loop, args, repetitions):
+    """Fastest of repetitions runs of the compiled loop, in nanoseconds per call"""
+    loop(*args, 1)  # compile
+    best = np.inf
+    for _ in range(repetitions):
+        start = perf_counter()
+        loop(*args, 10)
+        best = min(best, perf_counter() - start)
+    return 1e9 * best / (10 * args[1].shape[0])
+
+
+def benchmark_variants(variants, apply, loop, realistic_inputs, all_inputs, repetitions=15):
+    """
+    Checks every variant against the first one (the reference implementation) on all inputs and times it on
+    realistic inputs.
+
+    Returns:
+        list: dicts with name, correct, mismatches and ns_per_call
+    """
+    reference_name = next(iter(variants))
+    references = [apply(variants[reference_name], *inputs) for inputs in (realistic_inputs, all_inputs)]
+    results = []
+    for name, variant in variants.items():
+        try:
+            mismatches = sum(int(np.sum(np.any((apply(variant, *inputs) != reference).reshape(reference.shape[0], -1), axis=1)))
+                             for inputs, reference in zip((realistic_inputs, all_inputs), references))
+            ns_per_call = time_loop(loop, (variant, *realistic_inputs), repetitions)
+        except Exception as e:  # Variants that don't compile for the argument types of calculate_bid
+            results.append({"name": name, "correct": False, "mismatches": None, "ns_per_call": None, "error": type(e).__name__})
+            continue
+        results.append({"name": name, "correct": mismatches == 0, "mismatches": mismatches, "ns_per_call": ns_per_call})
+    return results
+
+
+def get_fastest_correct(results):
+    correct = [r for r in results if r["correct"]]
+    return min(correct, key=lambda r: r["ns_per_call"])["name"]
+
+
+def run_primitives_benchmark(number_of_deals=10_000, seed=0):
+    """
+    Returns:
+        dict: Results per group of variants, including the fastest correct variant
+    """
+    hands, hands_with_skat = deal_hands(number_of_deals, seed)
+    groups = {
+        "spitze": benchmark_variants(SPITZE_VARIANTS, apply_spitze, loop_spitze, get_spitze_inputs(hands_with_skat), get_all_spitze_inputs()),
+        "null_color_gaps": benchmark_variants(NULL_COLOR_GAPS_VARIANTS, apply_null_color_gaps, loop_null_color_gaps,
+                                              (np.concatenate([hands, hands_with_skat]),), (get_all_null_color_inputs(),)),
+    }
+    used = {"spitze": bid_spitze.py_func.__name__, "null_color_gaps": bid_null_color_gaps.py_func.__name__}
+    return {name: {"variants": results, "fastest": get_fastest_correct(results), "used_by_calculate_bid": used[name]} for name, results in groups.items()}
+
+
+def print_results(results):
+    for group, group_results in results.items():
+        data = [[r["name"], "yes" if r["correct"] else r.get("error", f"no ({r['mismatches']} mismatches)"),
+                 round(r["ns_per_call"], 2) if r["ns_per_call"] is not None else "-"] for r in group_results["variants"]]
+        print(tabulate(data, headers=["Variant", "Correct", "ns per call"]))
+        print(f"Fastest correct {group} variant: {group_results['fastest']}, used by calculate_bid: {group_results['used_by_calculate_bid']}\n")
+
+
+# Usage: python -m benchmarks.primitives_benchmark [--json results.json]
+if __name__ == "__main__":
+    primitives_results = run_primitives_benchmark()
+    print_results(primitives_results)
+    if "--json" in sys.argv:
+        with open(sys.argv[sys.argv.index("--json") + 1], "w") as f:
+            json.dump(primitives_results, f, indent=2)
@@ -0,0 +1,114 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from tabulate import tabulate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, so that import and JIT times are measured like in a newly started worker process
+STARTUP_SCRIPT = """
+from time import perf_counter
+start = perf_counter()
+import json
+import numpy as np
+from SkatGame import SkatGame
+from agents.BasicAI import BasicAI
+from skat import deal_new_cards_as_bitmaps, RESULT_PASSED
+from skat_text import VERBOSE_SILENT
+from warmup import warmup
+imported = perf_counter()
+warmup_time = warmup() if {use_warmup} else 0.0
+warmed_up = perf_counter()
+players = np.array([BasicAI(), BasicAI(), BasicAI()])
+game_result = RESULT_PASSED
+while game_result == RESULT_PASSED:
+    game_result, _ = SkatGame(players, 0, deal_new_cards_as_bitmaps(), VERBOSE_SILENT).run()
+first_game = perf_counter()
+print(json.dumps({{"import": imported - start, "warmup": warmup_time, "first_game": first_game - warmed_up, "total": first_game - start}}))
+"""
+
+
+def measure_startup(cache_dir, use_warmup=False):
+    """
+    Starts a new Python process and measures import time, warmup time and the time until the first game is finished.
+
+    Args:
+        cache_dir (str): NUMBA_CACHE_DIR of the process. An empty directory measures a cold start.
+        use_warmup (bool): Call warmup() before the first game
+
+    Returns:
+        dict: Seconds for import, warmup, first_game and total
+    """
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir, PYTHONPATH=os.pathsep.join([ROOT, os.path.join(ROOT, "reinforcement_learning")]))
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT.format(use_warmup=use_warmup)], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup_benchmark(repetitions=3):
+    """
+    Measures a cold start (empty numba cache) and warm starts (filled cache), each with and without warmup(),
+    and workers forked from a warmed up WorkerPool.
+
+    Returns:
+        dict: Results per scenario, warm starts are the fastest of the repetitions
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results["cold"] = measure_startup(cache_dir)
+        results["cold_warmup"] = measure_startup(tempfile.mkdtemp(dir=cache_dir), True)
+        results["warm"] = min((measure_startup(cache_dir) for _ in range(repetitions)), key=lambda r: r["total"])
+        results["warm_warmup"] = min((measure_startup(cache_dir, True) for _ in range(repetitions)), key=lambda r: r["total"])
+    results["forked_worker"] = measure_worker_startup()
+    return results
+
+
+def play_first_game(_):
+    """Task for measure_worker_startup, plays one game that wasn't passed and returns the seconds it took"""
+    from time import perf_counter
+    import numpy as np
+    from SkatGame import SkatGame
+    from agents.BasicAI import BasicAI
+    from skat import deal_new_cards_as_bitmaps, RESULT_PASSED
+    from skat_text import VERBOSE_SILENT
+
+    start = perf_counter()
+    players = np.array([BasicAI(), BasicAI(), BasicAI()])
+    game_result = RESULT_PASSED
+    while game_result == RESULT_PASSED:
+        game_result, _ = SkatGame(players, 0, deal_new_cards_as_bitmaps(), VERBOSE_SILENT).run()
+    return perf_counter() - start
+
+
+def measure_worker_startup(tasks=8):
+    """
+    Measures workers of a WorkerPool that are recycled after every task, so every task runs in a freshly forked worker.
+
+    Returns:
+        dict: Seconds for import, warmup (in the parent), first_game (slowest first game of a new worker) and total
+        (pool start plus the slowest first game)
+    """
+    from time import perf_counter
+    start = perf_counter()
+    from WorkerPool import WorkerPool
+    imported = perf_counter()
+    with WorkerPool(1, max_tasks_per_child=1) as pool:
+        first_game = max(pool.map(play_first_game, range(tasks)))
+        return {"import": imported - start, "warmup": pool.warmup_time, "first_game": first_game, "total": pool.startup_time + first_game}
+
+
+def print_results(results):
+    data = [[name, round(r["import"], 3), round(r["warmup"], 3), round(r["first_game"], 3), round(r["total"], 3)] for name, r in results.items()]
+    print(tabulate(data, headers=["Start", "Import (s)", "Warmup (s)", "First game (s)", "Import to first game (s)"]))
+
+
+# Usage: python -m benchmarks.startup_benchmark [--json]
+if __name__ == "__main__":
+    startup_results = run_startup_benchmark()
+    if "--json" in sys.argv:
+        print(json.dumps(startup_results, indent=2))
+    else:
+        print_results(startup_results)
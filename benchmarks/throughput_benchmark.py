@@ -0,0 +1,292 @@
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from time import perf_counter
+
+import numba
+import numpy as np
+from tabulate import tabulate
+
+from SkatRunner import SkatRunner
+from ThreadPool import ThreadPool
+from WorkerPool import WorkerPool, seed_numba
+from agents.BasicAI import BasicAI
+from agents.RandomAI import RandomAI
+from agents.StaticAI import StaticAI
+from agents.bidding.BasicBiddingAI import BasicBiddingAI, calculate_announcement_with_skat
+from agents.playing.ISMCTSPlayingAI import ISMCTSPlayingAI
+from benchmarks.primitives_benchmark import deal_hands
+from benchmarks.startup_benchmark import measure_startup, ROOT
+from bidding_simulation import run_biddings, run_biddings_parallel
+from history import new_history
+from skat import deal_new_cards_as_bitmaps, GRAND
+from warmup import warmup
+
+AGENT_MIXES = {
+    "BasicAI x3": (BasicAI, BasicAI, BasicAI),
+    "RandomAI x3": (RandomAI, RandomAI, RandomAI),
+    "BasicAI RandomAI StaticAI": (BasicAI, RandomAI, StaticAI),
+}
+
+# Metrics where a lower value is better, all others are throughputs
+LOWER_IS_BETTER = ("peak_rss_mb", "jit_warmup_s")
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def measure_games(agents, number_of_rounds):
+    """Games/s of SkatRunner.run_liste"""
+    runner = SkatRunner(*[agent() for agent in agents])
+    start = perf_counter()
+    runner.run_liste(number_of_rounds, verbosity=0)
+    return runner.games_played / (perf_counter() - start)
+
+
+def measure_biddings(number_of_biddings):
+    """Bids/s of bidding_simulation.run_biddings, its printed statistics are discarded"""
+    start = perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_biddings(BasicBiddingAI(), number_of_biddings)
+    return number_of_biddings / (perf_counter() - start)
+
+
+def measure_announcements(number_of_announcements):
+    """Announcements/s of calculate_announcement_with_skat, for hands with Skat of random deals"""
+    _, hands_with_skat = deal_hands((number_of_announcements + 2) // 3)
+    hands_with_skat = [int(hand) for hand in hands_with_skat[:number_of_announcements]]
+    start = perf_counter()
+    for i, hand in enumerate(hands_with_skat):
+        calculate_announcement_with_skat(hand, i % 3, 0.95, 18)
+    return number_of_announcements / (perf_counter() - start)
+
+
+def import_env():
+    """
+    Returns:
+        SkatPlayingEnv class or None if it can't be imported (gymnasium missing)
+    """
+    if os.path.join(ROOT, "reinforcement_learning") not in sys.path:
+        sys.path.append(os.path.join(ROOT, "reinforcement_learning"))
+    try:
+        from SkatPlayingEnv import SkatPlayingEnv
+    except ImportError:
+        return None
+    return SkatPlayingEnv
+
+
+def measure_env_steps(SkatPlayingEnv, number_of_steps):
+    """Steps/s of SkatPlayingEnv with random valid actions, including resets"""
+    rng = np.random.default_rng(0)
+    env = SkatPlayingEnv()
+    env.reset(seed=0)
+    start = perf_counter()
+    for _ in range(number_of_steps):
+        _, _, terminated, _, _ = env.step(rng.choice(np.flatnonzero(env.action_masks())))
+        if terminated:
+            env.reset()
+    return number_of_steps / (perf_counter() - start)
+
+
+def measure_ismcts_iterations(pool, iterations):
+    """Iterations/s of a root parallel ISMCTSPlayingAI searching the first card of a Grand, iterations on every worker"""
+    seed_numba(0)
+    cards = deal_new_cards_as_bitmaps()
+    agent = ISMCTSPlayingAI(iterations, pool=pool, seed=0)
+    agent.start_playing(GRAND, 0, cards[0], 0, 0, 0, None)
+    start = perf_counter()
+    agent.play_card(cards[0], cards[0], np.full(3, -1), 0, new_history(0))
+    return agent.last_iterations / (perf_counter() - start)
+
+
+def get_worker_counts():
+    """1, 2, 4, ... up to os.cpu_count(), which is always included"""
+    cpu_count = os.cpu_count()
+    counts = [2 ** i for i in range(cpu_count.bit_length()) if 2 ** i < cpu_count]
+    return counts + [cpu_count]
+
+
+def measure_ismcts_scaling(iterations, repetitions):
+    """
+    Root parallel ISMCTS with a growing number of workers, each searching the same number of iterations. The scaling
+    efficiency is the throughput relative to worker count times the throughput of a single worker, 1 is perfect.
+
+    Returns:
+        dict: ismcts_iterations_per_s and ismcts_scaling_efficiency for every worker count
+    """
+    metrics = {}
+    for processes in get_worker_counts():
+        with WorkerPool(processes, max_tasks_per_child=None, seed=0) as pool:
+            measure_ismcts_iterations(pool, 1000)  # loads the search kernels in the workers
+            throughput = max(measure_ismcts_iterations(pool, iterations) for _ in range(repetitions))
+        metrics[f"ismcts_iterations_per_s {processes} workers"] = throughput
+        metrics[f"ismcts_scaling_efficiency {processes} workers"] = throughput / (processes * metrics["ismcts_iterations_per_s 1 workers"])
+    return metrics
+
+
+def measure_thread_biddings(pool, number_of_biddings):
+    """Bids/s of bidding_simulation.run_biddings_parallel on the threads of the pool"""
+    start = perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_biddings_parallel(pool, number_of_biddings, batch_size=max(1, number_of_biddings // (4 * pool.processes)))
+    return number_of_biddings / (perf_counter() - start)
+
+
+def measure_thread_scaling(number_of_biddings, repetitions):
+    """
+    Compiled bidding simulations on a ThreadPool with a growing number of threads, like measure_ismcts_scaling
+
+    Returns:
+        dict: thread_bids_per_s and thread_scaling_efficiency for every thread count
+    """
+    metrics = {}
+    for threads in get_worker_counts():
+        with ThreadPool(threads, seed=0) as pool:
+            measure_thread_biddings(pool, 100)  # compiles the signatures of run_biddings_parallel
+            throughput = max(measure_thread_biddings(pool, number_of_biddings) for _ in range(repetitions))
+        metrics[f"thread_bids_per_s {threads} threads"] = throughput
+        metrics[f"thread_scaling_efficiency {threads} threads"] = throughput / (threads * metrics["thread_bids_per_s 1 threads"])
+    return metrics
+
+
+def measure_jit_warmup():
+    """Seconds warmup() takes in a new process with an empty numba cache"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        return measure_startup(cache_dir, True)["warmup"]
+
+
+def get_commit():
+    """Hash of the current commit, with a -dirty suffix if there are uncommitted changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def run_throughput_benchmark(quick=False, repetitions=3):
+    """
+    Runs all throughput benchmarks in this process after warmup(), so JIT compilation isn't part of the throughputs.
+    JIT warmup time is measured separately in a new process with an empty numba cache.
+
+    Args:
+        quick (bool): 10 times fewer games, bids, announcements, steps and ISMCTS iterations
+        repetitions (int): Every throughput is the best of this many runs
+
+    Returns:
+        dict: commit, environment information and the metrics
+    """
+    scale = 10 if quick else 1
+    metrics = {"jit_warmup_s": measure_jit_warmup()}
+    SkatPlayingEnv = import_env()
+    warmup(env=SkatPlayingEnv is not None)
+    benchmarks = {f"games_per_s {name}": (measure_games, agents, 3000) for name, agents in AGENT_MIXES.items()}
+    benchmarks["bids_per_s"] = (measure_biddings, 30_000)
+    benchmarks["announcements_per_s"] = (measure_announcements, 30_000)
+    if SkatPlayingEnv is not None:
+        benchmarks["env_steps_per_s"] = (measure_env_steps, SkatPlayingEnv, 30_000)
+    for metric, (measure, *args, size) in benchmarks.items():
+        measure(*args, 10)  # compiles signatures warmup() doesn't cover
+        metrics[metric] = max(measure(*args, size // scale) for _ in range(repetitions))
+    metrics.update(measure_ismcts_scaling(200_000 // scale, repetitions))
+    metrics.update(measure_thread_scaling(100_000 // scale, repetitions))
+    metrics["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {
+        "commit": get_commit(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "quick": quick,
+        "metrics": metrics,
+    }
+
+
+def compare(base, new, threshold=DEFAULT_THRESHOLD):
+    """
+    Args:
+        base (dict): Results of run_throughput_benchmark to compare against
+        new (dict): Newer results
+        threshold (float): Relative change that counts as regression, 0.1 is 10%
+
+    Returns:
+        list: [metric, base value, new value, relative change, regression] for every metric present in both. A base value of 0
+        has an infinite (nan if both are 0) change and always counts as regression.
+    """
+    rows = []
+    for metric, base_value in base["metrics"].items():
+        if metric not in new["metrics"]:
+            continue
+        new_value = new["metrics"][metric]
+        if base_value == 0:
+            # No relative change from a broken or skipped base run, flag it so it gets looked at
+            change = math.copysign(math.inf, new_value) if new_value != 0 else math.nan
+            regression = True
+        else:
+            change = (new_value - base_value) / base_value
+            regression = change > threshold if metric in LOWER_IS_BETTER else change < -threshold
+        rows.append([metric, base_value, new_value, change, regression])
+    return rows
+
+
+def print_results(results):
+    print(f"Commit {results['commit']}, Python {results['python']}, numba {results['numba']}, {results['cpu_count']} CPUs")
+    print(tabulate([[metric, round(value, 2)] for metric, value in results["metrics"].items()], headers=["Metric", "Value"]))
+
+
+def print_comparison(rows, base, new, threshold):
+    print(f"Comparing {new['commit']} against {base['commit']} (threshold {round(100 * threshold)}%)")
+    data = [[metric, round(base_value, 2), round(new_value, 2), f"{round(100 * change, 1)}%", "REGRESSION" if regression else ""]
+            for metric, base_value, new_value, change, regression in rows]
+    print(tabulate(data, headers=["Metric", "Base", "New", "Change", ""]))
+
+
+def main():
+    """
+    Usage:
+        python -m benchmarks.throughput_benchmark run [--json results.json] [--quick]
+        python -m benchmarks.throughput_benchmark compare base.json new.json [--threshold 0.1]
+
+    compare exits with status 1 if any metric regressed by more than the threshold.
+    """
+    parser = argparse.ArgumentParser(description="End-to-end throughput benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run")
+    run_parser.add_argument("--json", help="Write the results to this file")
+    run_parser.add_argument("--quick", action="store_true")
+    compare_parser = commands.add_parser("compare")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_throughput_benchmark(args.quick)
+        print_results(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+    else:
+        with open(args.base) as f:
+            base = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare(base, new, args.threshold)
+        print_comparison(rows, base, new, args.threshold)
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
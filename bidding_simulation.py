@@ -1,5 +1,6 @@
 import numpy as np
-from agents.bidding.BasicBiddingAI import BasicBiddingAI, calculate_bid
+from numba import njit
+from agents.bidding.BasicBiddingAI import BasicBiddingAI, calculate_bid, calculate_announcement_with_skat
 from tabulate import tabulate
 from time import time
 from skat import add_skat_to_hand, get_bitmap, NULL, deal_new_cards_from_deck, NUMBER_OF_CARDS
@@ -12,7 +13,7 @@ def simulate_bidding(agent, cards, skat, table_position, verbose=True, comment=N
     if verbose:
         print(f"Hand dealt: {get_bitmap_text(cards)} ({cards}, {skat})")
     agent.receive_hand_cards(cards, table_position, risk_taking)
-    bid = agent.simplified_bidding(cards)
+    bid, _, _ = agent.simplified_bidding(cards)
     passed = bid == 0
     if passed:
         game_type = -1
@@ -40,7 +41,6 @@ def simulate_bidding(agent, cards, skat, table_position, verbose=True, comment=N
 def run_biddings(agent, nr_of_biddings, risk_taking=1, rng_seed=12345):
     print(f"Simuliere {nr_of_biddings} Ansagen (risk_taking {risk_taking}, seed {rng_seed})")
     rng = np.random.default_rng(rng_seed)
-    column_names = GAME_TYPE_NAMES
     game_types = np.zeros(6, dtype=np.float64)
     extra_tiers = np.zeros((6,5), dtype=np.float64)
     passes = 0
@@ -58,7 +58,70 @@ def run_biddings(agent, nr_of_biddings, risk_taking=1, rng_seed=12345):
         else:
             game_types[game_type] += 1
             extra_tiers[game_type, extra_tier] += 1
-    simulation_time = time() - start
+    print_bidding_statistics(nr_of_biddings, passes, game_types, extra_tiers, time() - start)
+
+
+@njit(nogil=True, cache=True)
+def simulate_biddings(decks, first_table_position, risk_taking, bidding_wars):
+    """
+    Compiled simulate_bidding of BasicBiddingAI for many deals, releases the GIL so several threads can run it at once.
+    The hand of player 0 is used, the table position cycles through 0-2 starting at first_table_position.
+
+    Args:
+        decks: 2d array (n, 32) of shuffled card ids
+        first_table_position (int): Table position of the first deal
+        risk_taking (float): Passed to calculate_bid
+        bidding_wars: array (n), share of the maximum bid that is reached in bidding, between 0 and 1
+
+    Returns:
+        tuple: (game_type, extra_tier) arrays of size n, -1 if passed
+    """
+    n = decks.shape[0]
+    game_types = np.full(n, -1, dtype=np.int64)
+    extra_tiers = np.full(n, -1, dtype=np.int64)
+    for i in range(n):
+        cards, _, _, skat = deal_new_cards_from_deck(decks[i])
+        table_position = (first_table_position + i) % 3
+        bid, game_type, extra_tier, _, use_skat = calculate_bid(cards, table_position, 0, True, 0, risk_taking)
+        if bid == 0:
+            continue
+        if use_skat:
+            final_bid = 18 + int(round(bidding_wars[i] * (bid - 18)))
+            game_type, extra_tier, _ = calculate_announcement_with_skat(add_skat_to_hand(cards, skat), table_position, risk_taking, final_bid)
+        game_types[i] = game_type
+        extra_tiers[i] = extra_tier
+    return game_types, extra_tiers
+
+
+def run_biddings_parallel(pool, nr_of_biddings, risk_taking=1, rng_seed=12345, batch_size=10_000):
+    """
+    Like run_biddings with BasicBiddingAI, but the deals are split into batches that are simulated by simulate_biddings
+    on the threads of a ThreadPool (or the workers of a WorkerPool).
+
+    Args:
+        pool (ThreadPool): Pool that runs the batches
+        batch_size (int): Deals per task
+    """
+    print(f"Simuliere {nr_of_biddings} Ansagen (risk_taking {risk_taking}, seed {rng_seed}, {pool.processes} Threads)")
+    rng = np.random.default_rng(rng_seed)
+    start = time()
+    rand_vals = rng.random(size=(nr_of_biddings, NUMBER_OF_CARDS), dtype=np.float32)
+    shuffled_decks = np.argsort(rand_vals, axis=1)
+    bidding_wars = rng.random(size=nr_of_biddings, dtype=np.float32)
+    tasks = [(shuffled_decks[i:i + batch_size], i % 3, float(risk_taking), bidding_wars[i:i + batch_size])
+             for i in range(0, nr_of_biddings, batch_size)]
+    results = pool.starmap(simulate_biddings, tasks)
+    game_type = np.concatenate([r[0] for r in results])
+    extra_tier = np.concatenate([r[1] for r in results])
+    played = game_type >= 0
+    game_types = np.bincount(game_type[played], minlength=6).astype(np.float64)
+    extra_tiers = np.zeros((6, 5), dtype=np.float64)
+    np.add.at(extra_tiers, (game_type[played], extra_tier[played]), 1)
+    print_bidding_statistics(nr_of_biddings, nr_of_biddings - played.sum(), game_types, extra_tiers, time() - start)
+
+
+def print_bidding_statistics(nr_of_biddings, passes, game_types, extra_tiers, simulation_time):
+    column_names = GAME_TYPE_NAMES
     print(f"\nGepasst:\n{(passes * 100) / nr_of_biddings}%")
     not_passed = nr_of_biddings - passes
     game_types *= 100/not_passed
@@ -0,0 +1,104 @@
+import os
+from time import perf_counter
+
+import numba
+import numpy as np
+from llvmlite import binding, ir
+from numba import njit, types
+from numba.extending import intrinsic
+from tabulate import tabulate
+
+# Enabled with the environment variable SKAT_COUNTERS=1, which has to be set before counters is imported. When disabled,
+# count() compiles to nothing. The value is compiled into the cached kernels, changing COUNTERS_ENABLED later has no effect.
+COUNTERS_ENABLED = os.environ.get("SKAT_COUNTERS", "0") == "1"
+
+# Counter ids, usable as constants in compiled code
+COUNTER_CALCULATE_BID = 0
+COUNTER_ANNOUNCEMENTS = 1
+COUNTER_SETUPS_SIMULATED = 2
+COUNTER_NODES = 3
+COUNTER_ROLLOUTS = 4
+COUNTER_TABLEBASE_HITS = 5
+
+COUNTER_NAMES = ("calculate_bid", "announcements", "setups_simulated", "nodes", "rollouts", "tablebase_hits")
+
+NUMBER_OF_COUNTERS = 64
+
+# Counter values of this process. Compiled code increments them through the symbol below, which is resolved when the
+# code is loaded, so cached kernels work in every process.
+COUNTS = np.zeros(NUMBER_OF_COUNTERS, dtype=np.int64)
+_SYMBOL = "skat_counters"
+binding.add_symbol(_SYMBOL, COUNTS.ctypes.data)
+
+if COUNTERS_ENABLED:
+    # Kernels are cached with the flag compiled in, so cache them separately from the ones without counters
+    numba.config.CACHE_DIR = os.path.join(numba.config.CACHE_DIR or os.path.join(os.path.dirname(os.path.abspath(__file__)), "__pycache__"), "counters")
+
+
+@intrinsic
+def _add_to_counter(typingctx, counter_id, n):
+    """Atomic add, so counters stay exact with kernels running in several threads"""
+    sig = types.void(counter_id, n)
+
+    def codegen(context, builder, signature, args):
+        module = builder.module
+        counters = module.globals.get(_SYMBOL)
+        if counters is None:
+            counters = ir.GlobalVariable(module, ir.ArrayType(ir.IntType(64), NUMBER_OF_COUNTERS), _SYMBOL)
+            counters.linkage = "external"
+        index = context.cast(builder, args[0], signature.args[0], types.int64)
+        value = context.cast(builder, args[1], signature.args[1], types.int64)
+        pointer = builder.gep(counters, [ir.Constant(ir.IntType(64), 0), index])
+        builder.atomic_rmw("add", pointer, value, "monotonic")
+        return context.get_dummy_value()
+
+    return sig, codegen
+
+
+@njit(inline='always', cache=True)
+def count(counter_id, n=1):
+    """
+    Increments a counter from compiled (or Python) code. Does nothing if COUNTERS_ENABLED is False.
+
+    Args:
+        counter_id (int): COUNTER_ constant
+        n (int): Amount to add
+    """
+    if COUNTERS_ENABLED:
+        _add_to_counter(counter_id, n)
+
+
+def reset():
+    COUNTS[:] = 0
+
+
+def snapshot():
+    """
+    Returns:
+        tuple: (perf_counter time, copy of the counter values)
+    """
+    return perf_counter(), COUNTS.copy()
+
+
+def get_rates(before, after=None):
+    """
+    Args:
+        before: snapshot()
+        after: later snapshot(), now if None
+
+    Returns:
+        dict: name -> (increase, increase per second) for every counter that increased
+    """
+    if after is None:
+        after = snapshot()
+    seconds = after[0] - before[0]
+    increases = after[1] - before[1]
+    return {name: (int(increases[i]), float(increases[i] / seconds) if seconds > 0 else 0.0) for i, name in enumerate(COUNTER_NAMES) if increases[i] != 0}
+
+
+def print_rates(before, after=None):
+    if not COUNTERS_ENABLED:
+        print("Counters are disabled, set the environment variable SKAT_COUNTERS=1 before starting Python")
+        return
+    data = [[name, increase, round(rate, 1)] for name, (increase, rate) in get_rates(before, after).items()]
+    print(tabulate(data, headers=["Counter", "Count", "Per second"]))
@@ -0,0 +1,173 @@
+import numpy as np
+from numba import njit
+
+from skat import BIDDING_VALUES
+
+# The history of a game is a single np.uint8 array of HISTORY_SIZE, appended to by SkatGame and given to the agents as
+# a read-only view, so reading it costs no copy. All players are indexes in SkatGame.players.
+#
+# Layout:
+#   header: forehand, number of bidding events, number of played cards
+#   bidding events: player << 6 | bid code. Bid code 0 is a pass, otherwise the index in BIDDING_VALUES + 1.
+#                   Saying a bid and accepting it (hear) are both stored with the code of the bid.
+#   played cards: player << 5 | card
+
+HISTORY_FOREHAND = 0
+HISTORY_NUMBER_OF_BIDDING_EVENTS = 1
+HISTORY_NUMBER_OF_PLAYED_CARDS = 2
+HISTORY_HEADER_SIZE = 3
+
+# Every bid can be said and heard once, plus three passes and forehand saying 18 if the others passed
+MAX_BIDDING_EVENTS = 2 * len(BIDDING_VALUES) + 4
+NUMBER_OF_PLAYED_CARDS = 30
+
+HISTORY_BIDDING_OFFSET = HISTORY_HEADER_SIZE
+HISTORY_CARDS_OFFSET = HISTORY_BIDDING_OFFSET + MAX_BIDDING_EVENTS
+HISTORY_SIZE = HISTORY_CARDS_OFFSET + NUMBER_OF_PLAYED_CARDS
+
+# Packed played cards, 10 cards of 5 bits in each word
+CARDS_PER_WORD = 10
+PACKED_WORDS = NUMBER_OF_PLAYED_CARDS // CARDS_PER_WORD
+
+
+@njit("uint8[::1](int64)", cache=True)
+def new_history(forehand):
+    history = np.zeros(HISTORY_SIZE, dtype=np.uint8)
+    history[HISTORY_FOREHAND] = forehand
+    return history
+
+
+@njit("void(uint8[::1], int64, int64)", cache=True)
+def add_bidding_event(history, player, bid):
+    """
+    Args:
+        history: np.uint8 array
+        player (int): Player who said, heard or passed
+        bid (int): Bid said or accepted, 0 for passing
+    """
+    code = 0
+    if bid > 0:
+        while BIDDING_VALUES[code] != bid:
+            code += 1
+        code += 1
+    n = history[HISTORY_NUMBER_OF_BIDDING_EVENTS]
+    history[HISTORY_BIDDING_OFFSET + n] = (player << 6) | code
+    history[HISTORY_NUMBER_OF_BIDDING_EVENTS] = n + 1
+
+
+@njit("void(uint8[::1], int64, int64)", cache=True)
+def add_played_card(history, player, card):
+    n = history[HISTORY_NUMBER_OF_PLAYED_CARDS]
+    history[HISTORY_CARDS_OFFSET + n] = (player << 5) | card
+    history[HISTORY_NUMBER_OF_PLAYED_CARDS] = n + 1
+
+
+# Accessors have no explicit signatures, because agents read the history through a read-only view
+
+@njit(cache=True)
+def get_forehand(history):
+    return np.int64(history[HISTORY_FOREHAND])
+
+
+@njit(cache=True)
+def get_number_of_bidding_events(history):
+    return np.int64(history[HISTORY_NUMBER_OF_BIDDING_EVENTS])
+
+
+@njit(cache=True)
+def get_bidding_event(history, i):
+    """
+    Returns:
+        tuple: (player, bid) of the i-th bidding event, bid 0 is a pass
+    """
+    event = np.int64(history[HISTORY_BIDDING_OFFSET + i])
+    code = event & 0x3F
+    bid = np.int64(BIDDING_VALUES[code - 1]) if code > 0 else np.int64(0)
+    return event >> 6, bid
+
+
+@njit(cache=True)
+def get_highest_bid(history):
+    """
+    Returns:
+        int: Highest bid so far, 0 if no one said anything yet
+    """
+    highest_code = 0
+    for i in range(history[HISTORY_NUMBER_OF_BIDDING_EVENTS]):
+        highest_code = max(highest_code, history[HISTORY_BIDDING_OFFSET + i] & 0x3F)
+    return np.int64(BIDDING_VALUES[highest_code - 1]) if highest_code > 0 else np.int64(0)
+
+
+@njit(cache=True)
+def get_number_of_played_cards(history):
+    return np.int64(history[HISTORY_NUMBER_OF_PLAYED_CARDS])
+
+
+@njit(cache=True)
+def get_played_card(history, i):
+    """
+    Returns:
+        tuple: (player, card) of the i-th played card
+    """
+    entry = np.int64(history[HISTORY_CARDS_OFFSET + i])
+    return entry >> 5, entry & 0x1F
+
+
+@njit(cache=True)
+def get_played_cards(history):
+    """
+    Returns:
+        np.uint32: Bitmap of all cards played so far
+    """
+    cards = np.uint32(0)
+    for i in range(history[HISTORY_NUMBER_OF_PLAYED_CARDS]):
+        cards |= np.uint32(1) << np.uint32(history[HISTORY_CARDS_OFFSET + i] & 0x1F)
+    return cards
+
+
+@njit(cache=True)
+def get_trick(history, trick):
+    """
+    Returns:
+        np.array: int8 size 3, card played by each player in the trick, -1 if not played yet
+    """
+    cards = np.full(3, -1, dtype=np.int8)
+    end = min(3 * trick + 3, np.int64(history[HISTORY_NUMBER_OF_PLAYED_CARDS]))
+    for i in range(3 * trick, end):
+        entry = history[HISTORY_CARDS_OFFSET + i]
+        cards[entry >> 5] = entry & 0x1F
+    return cards
+
+
+@njit(cache=True)
+def pack_played_cards(history):
+    """
+    Packs the played cards into 5 bits each, for storing games. The players can be restored by replaying the tricks.
+
+    Returns:
+        np.array: uint64 size PACKED_WORDS
+    """
+    packed = np.zeros(PACKED_WORDS, dtype=np.uint64)
+    for i in range(history[HISTORY_NUMBER_OF_PLAYED_CARDS]):
+        card = np.uint64(history[HISTORY_CARDS_OFFSET + i] & 0x1F)
+        packed[i // CARDS_PER_WORD] |= card << np.uint64(5 * (i % CARDS_PER_WORD))
+    return packed
+
+
+@njit(cache=True)
+def unpack_played_cards(packed, number_of_cards):
+    """
+    Returns:
+        np.array: int8 of the first number_of_cards cards of pack_played_cards
+    """
+    cards = np.empty(number_of_cards, dtype=np.int8)
+    for i in range(number_of_cards):
+        cards[i] = (packed[i // CARDS_PER_WORD] >> np.uint64(5 * (i % CARDS_PER_WORD))) & np.uint64(0x1F)
+    return cards
+
+
+def get_read_only_view(history):
+    """Zero-copy view of the history for the agents, which can't be written to"""
+    view = history.view()
+    view.flags.writeable = False
+    return view
@@ -40,14 +40,14 @@ native_clz = llvm_intrinsic("ctlz", has_is_zero_undef=False)
 native_ctz = llvm_intrinsic("cttz", has_is_zero_undef=False)
 
 # --- Easy-to-use wrappers ---
-@numba.njit(inline='always')
+@numba.njit(inline='always', cache=True)
 def popcount(x):
     return native_popcount(x)
 
-@numba.njit(inline='always')
+@numba.njit(inline='always', cache=True)
 def clz(x):
     return native_clz(x)
 
-@numba.njit(inline='always')
+@numba.njit(inline='always', cache=True)
 def ctz(x):
     return native_ctz(x)
\ No newline at end of file
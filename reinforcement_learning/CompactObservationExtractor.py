@@ -0,0 +1,41 @@
+import numpy as np
+import torch
+from gymnasium import spaces
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+import observation
+
+
+class CompactObservationExtractor(BaseFeaturesExtractor):
+    """
+    Features extractor for SB3 policies trained on compact observations (SkatPlayingEnv(compact=True)).
+    Rollout and replay buffers keep the np.uint8 observations, they are only unpacked to float32 here, once per batch.
+
+    Usage: PPO("MlpPolicy", env, policy_kwargs=dict(features_extractor_class=CompactObservationExtractor))
+    """
+
+    def __init__(self, observation_space: spaces.Box, spec=None):
+        """
+        Args:
+            observation_space: Box of the compact observations
+            spec: ObservationSpec the environment uses, None for all features
+        """
+        if spec is None:
+            spec = observation.ObservationSpec()
+        assert observation_space.shape == (spec.compact_size,)
+        super().__init__(observation_space, features_dim=spec.size)
+        self.size = spec.size
+        self.bool_bytes = (spec.bool_indices.shape[0] + 7) // 8
+        self.register_buffer("bool_indices", torch.as_tensor(spec.bool_indices, dtype=torch.int64), persistent=False)
+        self.register_buffer("float_indices", torch.as_tensor(spec.float_indices, dtype=torch.int64), persistent=False)
+        self.register_buffer("shifts", torch.arange(7, -1, -1, dtype=torch.int64), persistent=False)
+
+    def forward(self, observations):
+        # SB3 hands over the np.uint8 values already converted to float
+        packed = observations.to(torch.int64)
+        n = packed.shape[0]
+        bits = (packed[:, :self.bool_bytes, None] >> self.shifts) & 1
+        obs = torch.zeros((n, self.size), dtype=torch.float32, device=observations.device)
+        obs[:, self.bool_indices] = bits.reshape(n, -1)[:, :self.bool_indices.shape[0]].to(torch.float32)
+        obs[:, self.float_indices] = packed[:, self.bool_bytes:].to(torch.float32) / 255
+        return obs
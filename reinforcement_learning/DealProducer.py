@@ -0,0 +1,230 @@
+import threading
+
+import numpy as np
+from numba import njit
+
+from agents.bidding.BasicBiddingAI import calculate_bid
+from counters import count, COUNTER_SETUPS_SIMULATED
+from skat import deal_new_cards_from_deck, get_next_bid, NUMBER_OF_CARDS
+
+
+class DealProducer:
+    """
+    Keeps a ring buffer of ready to play game setups for SkatPlayingEnv.
+
+    A background thread deals cards, runs the simplified bidding for all three hands and stores the result
+    (hands, forehand, solo player, game type, extra tier and bids). Games where everyone passed are skipped.
+    reset() of the environment then only has to pop a setup, which is O(1).
+
+    The producer blocks while the buffer is full (backpressure) and the consumer blocks while it is empty.
+    """
+
+    def __init__(self, capacity=4096, batch_size=256, game_type_weights=None, max_extra_tier=4, risk_taking=1.0, seed=None):
+        """
+        Args:
+            capacity (int): Number of setups the ring buffer can hold
+            batch_size (int): Number of deals simulated per call of the compiled kernel
+            game_type_weights: Acceptance weight per game type (4 Colors, Grand, Null), None accepts everything.
+                Weights are relative, [1, 1, 1, 1, 1, 0] for example keeps everything except Null games.
+            max_extra_tier (int): Setups with a higher extra tier are discarded
+            risk_taking (float): Passed to calculate_bid, 1 is normal
+            seed (int): Seed for dealing cards and filtering
+        """
+        self.capacity = capacity
+        self.batch_size = batch_size
+        if game_type_weights is None:
+            game_type_weights = np.ones(6, dtype=np.float64)
+        game_type_weights = np.asarray(game_type_weights, dtype=np.float64)
+        assert game_type_weights.shape == (6,) and game_type_weights.max() > 0
+        self.acceptance = game_type_weights / game_type_weights.max()
+        self.max_extra_tier = max_extra_tier
+        self.risk_taking = np.float32(risk_taking)
+        self.rng = np.random.default_rng(seed)
+
+        # Ring buffer
+        self.cards = np.zeros((capacity, 4), dtype=np.uint32)
+        self.forehand = np.zeros(capacity, dtype=np.int64)
+        self.solo_player = np.zeros(capacity, dtype=np.int64)
+        self.game_type = np.zeros(capacity, dtype=np.int64)
+        self.extra_tier = np.zeros(capacity, dtype=np.int64)
+        self.bids = np.zeros((capacity, 3), dtype=np.int64)
+        self.public_bids = np.zeros((capacity, 3), dtype=np.int64)
+        self.rear_declined = np.zeros(capacity, dtype=np.bool_)
+        self.head = 0  # next setup to pop
+        self.count = 0
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.deals_simulated = 0
+        self.setups_produced = 0
+
+    def start(self):
+        """Start the background thread. Does nothing if it is already running."""
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="DealProducer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __len__(self):
+        return self.count
+
+    def pop(self, timeout=None):
+        """
+        Take the oldest setup out of the buffer. Blocks while the buffer is empty. If the producer thread isn't running
+        the buffer is refilled synchronously instead.
+
+        Returns:
+            tuple: (cards, forehand, solo_player, game_type, extra_tier, bids, public_bids, rear_declined)
+        """
+        with self.condition:
+            while self.count == 0:
+                if not self.running:
+                    self._fill()
+                elif not self.condition.wait(timeout):
+                    raise TimeoutError("DealProducer didn't produce a setup in time")
+            i = self.head
+            setup = (self.cards[i].copy(), self.forehand[i], self.solo_player[i], self.game_type[i], self.extra_tier[i],
+                     self.bids[i].copy(), self.public_bids[i].copy(), self.rear_declined[i])
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+            self.condition.notify_all()
+        return setup
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.running and self.count == self.capacity:
+                    self.condition.wait()
+                if not self.running:
+                    return
+            # Simulate outside of the lock so that the consumer can pop in the meantime
+            batch = self._simulate_batch()
+            with self.condition:
+                self._push(*batch)
+                self.condition.notify_all()
+
+    def _fill(self):
+        """Synchronous refill, used when no producer thread is running"""
+        while self.count == 0:
+            self._push(*self._simulate_batch())
+
+    def _simulate_batch(self):
+        n = self.batch_size
+        decks = self.rng.permuted(np.tile(np.arange(NUMBER_OF_CARDS), (n, 1)), axis=1)
+        forehands = self.rng.integers(3, size=n)
+        setups = simulate_setups(decks, forehands, self.risk_taking)
+        cards, solo_player, game_type, extra_tier, bids, public_bids, rear_declined = setups
+        accepted = (bids.max(axis=1) > 0) & (extra_tier <= self.max_extra_tier)
+        accepted &= self.rng.random(n) < self.acceptance[game_type]
+        self.deals_simulated += n
+        return cards[accepted], forehands[accepted], solo_player[accepted], game_type[accepted], extra_tier[accepted], bids[accepted], public_bids[accepted], rear_declined[accepted]
+
+    def _push(self, cards, forehand, solo_player, game_type, extra_tier, bids, public_bids, rear_declined):
+        """Append setups to the ring buffer. Setups that don't fit anymore are dropped. Caller must hold the lock."""
+        n = min(cards.shape[0], self.capacity - self.count)
+        if n == 0:
+            return
+        slots = (self.head + self.count + np.arange(n)) % self.capacity
+        self.cards[slots] = cards[:n]
+        self.forehand[slots] = forehand[:n]
+        self.solo_player[slots] = solo_player[:n]
+        self.game_type[slots] = game_type[:n]
+        self.extra_tier[slots] = extra_tier[:n]
+        self.bids[slots] = bids[:n]
+        self.public_bids[slots] = public_bids[:n]
+        self.rear_declined[slots] = rear_declined[:n]
+        self.count += n
+        self.setups_produced += n
+
+
+@njit(nogil=True, cache=True)
+def simulate_setups(decks, forehands, risk_taking):
+    """
+    Deals the given decks and runs the simplified bidding for each of them.
+    Releases the GIL, so it can run in a background thread while the main thread is training.
+
+    Args:
+        decks: 2d array (n, 32) of shuffled card ids
+        forehands: array (n) with the forehand player for each deal
+        risk_taking (float): Passed to calculate_bid
+
+    Returns:
+        tuple: (cards, solo_player, game_type, extra_tier, bids, public_bids, rear_declined) with n entries each.
+        Games where all players passed have all bids 0.
+    """
+    n = decks.shape[0]
+    count(COUNTER_SETUPS_SIMULATED, n)
+    cards = np.empty((n, 4), dtype=np.uint32)
+    solo_player = np.zeros(n, dtype=np.int64)
+    game_type = np.zeros(n, dtype=np.int64)
+    extra_tier = np.zeros(n, dtype=np.int64)
+    bids = np.zeros((n, 3), dtype=np.int64)
+    public_bids = np.zeros((n, 3), dtype=np.int64)
+    rear_declined = np.zeros(n, dtype=np.bool_)
+    game_types = np.empty(3, dtype=np.int64)
+    extra_tiers = np.empty(3, dtype=np.int64)
+    for j in range(n):
+        cards[j, 0], cards[j, 1], cards[j, 2], cards[j, 3] = deal_new_cards_from_deck(decks[j])
+        forehand = forehands[j]
+        for i in range(3):
+            bid, game_types[i], extra_tiers[i], _, _ = calculate_bid(cards[j, i], (3 + i - forehand) % 3, 0, True, 0, risk_taking)
+            bids[j, i] = bid
+        solo_player[j], rear_declined[j] = resolve_simplified_bidding(bids[j], forehand, public_bids[j])
+        game_type[j] = game_types[solo_player[j]]
+        extra_tier[j] = extra_tiers[solo_player[j]]
+    return cards, solo_player, game_type, extra_tier, bids, public_bids, rear_declined
+
+
+@njit(nogil=True, cache=True)
+def resolve_simplified_bidding(bids, forehand, public_bids):
+    """
+    Determines the solo player from the maximum bids of all players and the bids that became public during bidding.
+
+    Args:
+        bids: array of length 3, maximum bid of each player (0 is passing)
+        forehand (int): index of forehand player
+        public_bids: array of length 3 that gets filled with the public bids
+
+    Returns:
+        tuple: (solo_player, rear_declined)
+    """
+    middlehand = (forehand + 1) % 3
+    rearhand = (forehand + 2) % 3
+    public_bids[:] = 0
+    if bids[middlehand] > bids[forehand]:
+        public_bids[forehand] = bids[forehand]
+        public_bid = get_next_bid(bids[forehand])
+        if bids[rearhand] > bids[middlehand]:
+            solo_player = rearhand  # Rear plays
+            public_bids[middlehand] = bids[middlehand]
+            public_bids[rearhand] = get_next_bid(bids[middlehand])
+        else:
+            solo_player = middlehand  # Middle plays
+            public_bids[rearhand] = bids[rearhand] if bids[rearhand] > public_bid else 0
+            public_bids[middlehand] = min(18, public_bid, bids[rearhand])
+    else:
+        public_bids[middlehand] = bids[middlehand]
+        public_bid = bids[middlehand]
+        if bids[rearhand] > bids[forehand]:
+            solo_player = rearhand  # Rear plays
+            public_bids[forehand] = bids[forehand]
+            public_bids[rearhand] = get_next_bid(bids[forehand])
+        else:
+            solo_player = forehand  # Fore plays
+            public_bids[forehand] = min(18, public_bid, bids[rearhand])
+            public_bids[rearhand] = bids[rearhand] if bids[rearhand] > public_bid else 0
+
+    # Flag that shows if rear player only declined a higher bid, which gives its pass another meaning
+    rear_declined = public_bids[rearhand] == 0 and bids[rearhand] > 0
+    return solo_player, rear_declined
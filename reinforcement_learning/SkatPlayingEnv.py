@@ -3,11 +3,13 @@ import numpy as np
 from numba import njit
 import observation
 
+import tracing
+from DealProducer import DealProducer
 from SkatGame import SkatGame
-from agents.bidding.BasicBiddingAI import BasicBiddingAI
 from agents.playing.GreedyPlayingAI import GreedyPlayingAI
 from observation import *
-from skat import deal_new_cards_as_bitmaps, deal_new_cards, BIDDING_VALUES, BIDDING_BASE_VALUES, BIDDING_NULL, NULL, GRAND, get_next_bid
+from skat import deal_new_cards_as_bitmaps, deal_new_cards, NULL, GRAND, get_next_bid, count_points, get_valid_actions, \
+    must_follow_suit, get_card_color, JACKS, remove_card, get_trick_winner, get_bitmap, is_card_present, EXTRA_TIER_SCHWARZ, EXTRA_TIER_SCHNEIDER
 
 
 class SkatPlayingEnv(gym.Env):
@@ -21,15 +23,47 @@ class SkatPlayingEnv(gym.Env):
     Trained model is always index 0 at the table, the others are 1 and 2.
 
     This class implements similar logic to SkatGame, but in a structure useful for reinforcement learning.
+    The Skat is not exchanged, the solo player plays the dealt hand and gets the Augen of the Skat at the end.
     """
-    def __init__(self):
+    def __init__(self, deal_producer=None, tricks_layout=TRICKS_LAYOUT_SHIFTED, compact=False, card_tokens=False, spec=None):
+        """
+        Args:
+            deal_producer: DealProducer that supplies game setups. Start it (deal_producer.start()) to prepare setups in
+                a background thread. If None, an unstarted DealProducer is used, which refills synchronously.
+            tricks_layout: TRICKS_LAYOUT_ constant, how FEATURE_TRICKS is filled
+            compact (bool): Return compact np.uint8 observations (see observation.pack_obs). Decode them per training batch
+                with observation.unpack_obs_batch or CompactObservationExtractor.
+            card_tokens (bool): Return a gymnasium.spaces.Dict observation, where the trick history is a sequence of
+                (card_id, player, trick_index) tokens ("tokens") next to all other features ("dense").
+            spec: ObservationSpec with the features to compute, None for all features
+        """
+        assert not (compact and card_tokens)
         self.action_space = gym.spaces.Discrete(32)  # e.g., card index
-        self.observation_space = gym.spaces.Box(low=0, high=1, shape=(observation.SIZE,), dtype=np.float32)
-        self.obs = observation.create_obs()
+        self.compact = compact
+        self.card_tokens = card_tokens
+        if spec is None:
+            spec = ObservationSpec()
+        if card_tokens:
+            # The trick history is covered by the tokens, everything else makes up the dense part
+            spec = spec.without(FEATURE_TRICKS)
+        self.spec = spec
+        self.features = spec.features
+        if card_tokens:
+            self.observation_space = gym.spaces.Dict({
+                "dense": gym.spaces.Box(low=0, high=1, shape=(spec.size,), dtype=np.float32),
+                "tokens": gym.spaces.Box(low=0, high=np.tile(TOKEN_PAD, (TOKEN_LENGTH, 1)), shape=(TOKEN_LENGTH, 3), dtype=np.int64),
+            })
+        elif compact:
+            self.observation_space = gym.spaces.Box(low=0, high=255, shape=(spec.compact_size,), dtype=np.uint8)
+        else:
+            self.observation_space = gym.spaces.Box(low=0, high=1, shape=(spec.size,), dtype=np.float32)
+        self.obs = spec.create_obs()
+        self.tokens = create_tokens()
+        self.token_count = 0
+        self.tricks_layout = tricks_layout
         self.rng = None
-        self.bidding_agent = BasicBiddingAI()
-        self.playing_agent1 = GreedyPlayingAI()
-        self.playing_agent2 = GreedyPlayingAI()
+        self.deal_producer = deal_producer
+        self.playing_agents = [None, GreedyPlayingAI(), GreedyPlayingAI()]
         self.cards = None
         self.forehand = 0
 
@@ -37,67 +71,177 @@ class SkatPlayingEnv(gym.Env):
         self.game_type = 0
         self.extra_tier = 0
 
+        self.leader = 0
+        self.possible_cards = np.zeros(3, dtype=np.uint32)  # From trainee POV: own hand and cards the other players might still hold
         self.current_trick = np.full(3, -1, dtype=np.int64)
-        self.current_trick_size = 3
+        self.current_trick_size = 0
         self.tricks = 0
+        self.solo_points = 0
+        self.team_points = 0
+        self.team_tricks = 0
+        self.solo_win = False
         self.game_over = False
+        self.trace = False
 
         #self.reset()
 
     def reset(self, seed=None):
         super().reset(seed=seed)
-        print("Reset env")
+        self.trace = tracing.start_sample() # Record spans of this episode, see tracing
+        if self.trace:
+            reset_start = tracing.now()
 
         # Reset everything
         self.rng = self.np_random
+        if self.deal_producer is None:
+            self.deal_producer = DealProducer(capacity=256, batch_size=32, seed=self.rng.integers(2**32))
         self.obs.fill(0)
-        self.current_trick_size = 3 # Prompts the logic to start a new trick and thus the game
+        self.tokens[:] = TOKEN_PAD
+        self.token_count = 0
+        self.current_trick.fill(-1)
+        self.current_trick_size = 0
         self.tricks = 0
+        self.team_points = 0
+        self.team_tricks = 0
+        self.solo_win = False
         self.game_over = False
 
-        # Deal new cards
-        self._deal_new_cards()
-
-        # Simulate bidding
+        # Deal new cards and simulate bidding
         self._bidding()
 
         # Start playing
+        self.leader = self.forehand
+        self.solo_points = count_points(self.cards[3])
+        self.possible_cards[0] = self.cards[0]
+        self.possible_cards[1] = self.possible_cards[2] = ~self.cards[0] & 0xFFFFFFFF
+        for i in (1, 2):
+            self.playing_agents[i].start_playing(self.game_type, self.extra_tier, self.cards[i], i, self.solo_player, 0, None)
         self._play_until_trainee()
+        if self.trace:
+            tracing.add_span("env reset", "env", reset_start, {"game_type": int(self.game_type), "solo_player": int(self.solo_player)})
 
         # Return initial observation for AI
         info = {}
-        return self.obs.copy(), info
+        return self._get_obs(), info
 
-    def _play_until_trainee(self):
-        if self.current_trick_size == 3:
-            self.tricks += 1
+    def action_masks(self):
+        """Valid actions of the trainee as bool array of length 32 (used by sb3_contrib MaskablePPO)"""
+        valid_actions = self._get_valid_actions(0)
+        return ((valid_actions >> np.arange(32, dtype=np.uint32)) & 1).astype(np.bool_)
 
-            if self.tricks == 10:
-                # All cards played, game regularly finished
-                self.game_over = True
-            else:
+    def _get_valid_actions(self, player):
+        hand_cards = self.cards[player]
+        if self.current_trick_size == 0:
+            return hand_cards
+        return get_valid_actions(self.game_type, self.current_trick[self.leader], hand_cards)
 
-                # start new trick
-                self.current_trick.fill(-1)
-            pass
+    def _play_until_trainee(self):
+        """Lets the other players play until the trainee has to play a card or the game is over. Updates the observation."""
+        while not self.game_over:
+            if self.current_trick_size == 3:
+                self._finish_trick()
+                continue
+            player = (self.leader + self.current_trick_size) % 3
+            if player == 0:
+                break
+            valid_actions = self._get_valid_actions(player)
+            card = self.playing_agents[player].play_card(self.cards[player], valid_actions, self.current_trick, self.leader, None)
+            self._play_card(player, card)
+
+        if not self.game_over:
+            if self.tricks_layout == TRICKS_LAYOUT_SLOTS:
+                set_feature_trick(self.obs, self.tricks, self.current_trick, self.features)
+            else:
+                set_feature_add_trick(self.obs, self.current_trick, self.features)
+            set_features_state(self.obs, self.game_type, self.possible_cards, self.leader, self._get_valid_actions(0), self.solo_points, self.team_points, self.team_tricks, self.features)
+
+    def _play_card(self, player, card):
+        if self.current_trick_size > 0 and player != 0:
+            # Not following suit reveals that the player doesn't hold any more cards of that group
+            first_card = self.current_trick[self.leader]
+            if not must_follow_suit(self.game_type, np.uint32(1 << card), first_card):
+                g = 4 if self.game_type == GRAND and first_card in JACKS else get_card_color(first_card)
+                self.possible_cards[player] &= ~CARD_GROUPS[self.game_type, g]
+        self.cards[player] = remove_card(self.cards[player], card)
+        for i in range(3):
+            self.possible_cards[i] = remove_card(self.possible_cards[i], card)
+        self.current_trick[player] = card
+        self.current_trick_size += 1
+        if self.card_tokens:
+            self.token_count = add_card_token(self.tokens, self.token_count, card, player, self.tricks)
+
+    def _finish_trick(self):
+        winner = get_trick_winner(self.game_type, self.current_trick, self.current_trick[self.leader])
+        points = count_points(get_bitmap(self.current_trick))
+        trick_index = self.tricks if self.tricks_layout == TRICKS_LAYOUT_SLOTS else 0
+        set_feature_finish_trick(self.obs, self.current_trick, trick_index, self.features)
+        self.tricks += 1
+        self.current_trick.fill(-1)
+        self.current_trick_size = 0
+        self.leader = winner
+
+        if winner == self.solo_player:
+            self.solo_points += points
+            if self.game_type == NULL:
+                # Solo player loses upon getting a trick in a Null game
+                self._end_game(False)
+                return
         else:
-            # Finish trick. Trainee has already played.
-            pass
-        pass
+            self.team_points += points
+            self.team_tricks += 1
+            if self.game_type != NULL and self.extra_tier >= EXTRA_TIER_SCHWARZ:
+                # Solo player loses upon giving up a trick in a Schwarz or Ouvert game
+                self._end_game(False)
+                return
+
+        if self.tricks == 10:
+            # All cards played, game regularly finished
+            if self.game_type == NULL:
+                self._end_game(True)
+            elif self.extra_tier == EXTRA_TIER_SCHNEIDER:
+                self._end_game(self.team_points <= 30)
+            else:
+                self._end_game(self.solo_points > 60)
+
+    def _end_game(self, solo_win):
+        self.solo_win = solo_win
+        self.game_over = True
+
+    def _get_obs(self):
+        if self.card_tokens:
+            return {"dense": self.obs.copy(), "tokens": self.tokens.copy()}
+        if self.compact:
+            return pack_obs(self.obs, self.spec.bool_indices, self.spec.float_indices)
+        return self.obs.copy()
+
+    def _get_reward(self):
+        """1 if the trainee's side won the game, -1 if it lost, 0 while the game is still running"""
+        if not self.game_over:
+            return 0.0
+        trainee_won = self.solo_win == (self.solo_player == 0)
+        return 1.0 if trainee_won else -1.0
 
     def step(self, action):
+        if self.trace:
+            step_start = tracing.now()
+        if not is_card_present(self._get_valid_actions(0), action):
+            # Invalid action, game is lost
+            self.game_over = True
+            return self._get_obs(), -1.0, True, False, {"invalid_action": True}
 
         # Apply trainee action
-        self.game.play_card(player=1, card=action)
+        self._play_card(0, action)
 
         # Simulate until trainee plays next card
         self._play_until_trainee()
 
-        obs = self.obs.copy()
+        obs = self._get_obs()
         reward = self._get_reward()
         terminated = self.game_over
         truncated = False
         info = {}
+        if self.trace:
+            tracing.add_span("env step", "env", step_start, {"action": int(action), "reward": float(reward)})
         return obs, reward, terminated, truncated, info
 
 
@@ -107,101 +251,26 @@ class SkatPlayingEnv(gym.Env):
     def close(self):
         pass
 
-    def _deal_new_cards(self):
-        self.cards = deal_new_cards(self.rng)
-        self.forehand = self.rng.integers(3)
-
     def _bidding(self):
         """
         Uses a simplified bidding process to determine game type and fill bids features in the observation space.
-        Deals new cards as often as necessary to skip eingepasste games.
+        Setups come from the DealProducer, which deals new cards as often as necessary to skip eingepasste games.
         """
-        bids = np.empty(3, dtype=np.int64)
-        game_types = np.empty(3, dtype=np.int64)
-        extra_tiers = np.empty(3, dtype=np.int64)
-
-        all_passed = True
-        while all_passed:
-            forehand = self.forehand
-            middlehand = (forehand + 1) % 3
-            rearhand = (forehand + 2) % 3
-
-            for i in range(3):
-                self.bidding_agent.receive_hand_cards(self.cards[i], (3+i-forehand) % 3)
-                bids[i], game_types[i], extra_tiers[i] = self.bidding_agent.simplified_bidding(self.cards[i])
-
-            all_passed = np.max(bids) == 0
-            if all_passed:
-                self._deal_new_cards()
-
-        feature_bids = create_empty_data(FEATURE_BIDS)  # (float) Normalized point value of bidding for each player
-        feature_bids_game_type = create_empty_data(FEATURE_BIDS_GAME_TYPE) # 4 Colors, Grand, Null
-        feature_bids_tier = create_empty_data(FEATURE_BIDS_TIER) # Gewinnstufen (capped)
-
-        rear_declined = False  # Flag that shows if rear player only declined a higher bid, which gives its pass another meaning
-
-        public_bids = np.zeros(3, dtype=np.int64)
-        if bids[middlehand] > bids[forehand]:
-            public_bids[forehand] = bids[forehand]
-            public_bid = get_next_bid(bids[forehand])
-            if bids[rearhand] > bids[middlehand]:
-                self.solo_player = rearhand  # Rear plays
-                public_bids[middlehand] = bids[middlehand]
-                public_bids[rearhand] = get_next_bid(bids[middlehand])
-            else:
-                self.solo_player = middlehand  # Middle plays
-                public_bids[rearhand] = bids[rearhand] if bids[rearhand] > public_bid else 0
-                public_bids[middlehand] = min(18, public_bid, bids[rearhand])
-        else:
-            public_bids[middlehand] = bids[middlehand]
-            public_bid = bids[middlehand]
-            if bids[rearhand] > bids[forehand]:
-                self.solo_player = rearhand  # Rear plays
-                public_bids[forehand] = bids[forehand]
-                public_bids[rearhand] = get_next_bid(bids[forehand])
-            else:
-                self.solo_player = forehand # Fore plays
-                public_bids[forehand] = min(18, public_bid, bids[rearhand])
-                public_bids[rearhand] = bids[rearhand] if bids[rearhand] > public_bid else 0
+        cards, forehand, solo_player, game_type, extra_tier, bids, public_bids, rear_declined = self.deal_producer.pop()
+        self.cards = cards
+        self.forehand = forehand
+        self.solo_player = solo_player
+        self.game_type = game_type
+        self.extra_tier = extra_tier
 
-        for i in range(3):
-            bid = public_bids[i]
-            if bid > 0:
-                game_type, tier = _analyse_bid(bid)
-                feature_bids_game_type[i * 6 + game_type] = 1
-                feature_bids_tier[i * 5 + tier] = 1
-                feature_bids[i] = _normalize_bid(bid)
-            elif i == rearhand and bids[rearhand] > 0:
-                rear_declined = True
-
-        self.game_type = game_types[self.solo_player]
-        self.extra_tier = extra_tiers[self.solo_player]
-
-        set_feature(self.obs, FEATURE_BIDS, feature_bids)
-        set_feature(self.obs, FEATURE_BIDS_GAME_TYPE, feature_bids_game_type)
-        set_feature(self.obs, FEATURE_BIDS_TIER, feature_bids_tier)
-        set_feature_bool(self.obs, FEATURE_BIDS_REAR_DECLINED, rear_declined)
+        set_features_bidding(self.obs, public_bids, rear_declined, self.features)
 
         # General game information features
-        set_feature_scalar(self.obs, FEATURE_GAME_TYPE, self.game_type)
-        set_feature_scalar(self.obs, FEATURE_EXTRA_TIER, self.extra_tier)
-        set_feature_scalar(self.obs, FEATURE_SOLO_PLAYER, self.solo_player)
-
-
-@njit(inline='always')
-def _normalize_bid(bid):
-    return bid / BIDDING_VALUES[-1]
-
-@njit
-def _analyse_bid(bid):
-    if bid in BIDDING_NULL:
-        return NULL, -1
-    game_type = -1
-    for i in range(GRAND, -1, -1):
-        if bid % BIDDING_BASE_VALUES[i] == 0:
-            game_type = i
-            break
-    return game_type, bid / BIDDING_BASE_VALUES[game_type] - 2
+        set_feature_scalar(self.obs, FEATURE_GAME_TYPE, self.game_type, self.features)
+        if self.extra_tier > 0:
+            set_feature_scalar(self.obs, FEATURE_EXTRA_TIER, self.extra_tier - 1, self.features)
+        set_feature_scalar(self.obs, FEATURE_SOLO_PLAYER, self.solo_player, self.features)
+
 
 # Register the environment so we can create it with gym.make()
 gym.register(
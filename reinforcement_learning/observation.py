@@ -1,18 +1,20 @@
 import numpy as np
 from numba import njit
 
+from skat import CARD_GROUPS, BIDDING_VALUES, BIDDING_BASE_VALUES, BIDDING_NULL, NULL, GRAND
+
 # Neural network input for card playing phase
 # The model receives game state from its POV and also secondary information, that a human player can count/calculate from game state
 
-FEATURES = np.empty((0, 3), dtype=np.int32) # Holds start [0] and end [1] indices for all features and length [2]
+FEATURES = np.empty((0, 4), dtype=np.int32) # Holds start [0] and end [1] indices for all features, length [2] and if it holds float data [3]
 SIZE = 0
 
-def _add_feature(length):
+def _add_feature(length, is_float=False):
     global SIZE, FEATURES
     index = SIZE
     feature_id = FEATURES.shape[0]
     SIZE += length
-    FEATURES = np.vstack([FEATURES, [index, index+length, length]])
+    FEATURES = np.vstack([FEATURES, [index, index+length, length, int(is_float)]])
     return feature_id
 
 # A feature is a collection of datapoints in the observation space
@@ -25,30 +27,109 @@ FEATURE_EXTRA_TIER = _add_feature(4)  # Hand, Schneider angesagt, Schwarz angesa
 FEATURE_SOLO_PLAYER = _add_feature(3)  # Which player is playing solo (Alleinspieler)
 
 # Bidding results
-FEATURE_BIDS = _add_feature(3)  # (float) Normalized point value of bidding for each player
+FEATURE_BIDS = _add_feature(3, True)  # (float) Normalized point value of bidding for each player
 FEATURE_BIDS_GAME_TYPE = _add_feature(3 * 6) # 4 Colors, Grand, Null, when ambiguity lower tier is assumed (so Grand T2 instead of Diamonds T4 for example)
 FEATURE_BIDS_TIER = _add_feature(3 * 5) # Gewinnstufen (capped) (Not filled for Null, so that Jack understanding isn't affected)
 FEATURE_BIDS_REAR_DECLINED = _add_feature(1) # Flag that shows if rear player only declined a higher bid, which gives its pass another meaning
 
 # Current state
 FEATURE_PLAYER_CARDS = _add_feature(3 * 32)  # Own hand and theoretically possible cards held by the other players
-FEATURE_TRICKS = _add_feature(3 * 10 * 32)  # Index 0 is currently ongoing trick, index 1 is last completed and so on. Not yet played tricks just contain full zeros
-FEATURE_TRICKS_PLAYED = _add_feature(1) # (float) Number of tricks already played (including ongoing trick). Normalized to 0-1
+FEATURE_TRICKS = _add_feature(3 * 10 * 32)  # Index 0 is currently ongoing trick, index 1 is last completed and so on. Not yet played tricks just contain full zeros (see TRICKS_LAYOUT_ for alternatives)
+FEATURE_TRICKS_PLAYED = _add_feature(1, True) # (float) Number of tricks already played (including ongoing trick). Normalized to 0-1
 FEATURE_LEADER = _add_feature(3)  # Who plays/played the first card this trick
 FEATURE_VALID_ACTIONS = _add_feature(32)  # which cards am I allowed to play
 
 # Secondary information
 FEATURE_COLORS_LEFT = _add_feature(3 * 5)  # Colors+Trumps potentially available per player
-FEATURE_AUGEN = _add_feature(2) # (float) Augen collected per team, normalized to 0-1
+FEATURE_AUGEN = _add_feature(2, True) # (float) Augen collected per team, normalized to 0-1
 FEATURE_SCHNEIDER_ESCAPED = _add_feature(1)  # Gegenspieler team already escaped Schneider
 FEATURE_SCHWARZ_ESCAPED = _add_feature(1)  # Gegenspieler team already escaped Schwarz
 
-@njit
+# Layouts of FEATURE_TRICKS
+# Shifted: Index 0 is the ongoing trick, index 1 the last completed one and so on. All tricks move back by one slot when a new trick starts.
+# Slots: Every trick is written once to the slot of its trick index (0-9). FEATURE_TRICKS_PLAYED tells which slot is the ongoing trick.
+# Slots only costs O(cards played) per step, use convert_tricks_to_shifted to feed models trained on the shifted layout.
+TRICKS_LAYOUT_SHIFTED = 0
+TRICKS_LAYOUT_SLOTS = 1
+
+# Compact observation (np.uint8): All boolean values bit-packed in np.packbits layout, followed by the float values quantized to 0-255
+# Use it to shrink rollout/replay storage, unpack_obs_batch restores the np.float32 observations when a training batch is formed
+def _calculate_compact_indices(features, size):
+    is_float = np.zeros(size, dtype=np.bool_)
+    for feature in features:
+        if feature[3] and feature[0] >= 0:
+            is_float[feature[0]:feature[1]] = True
+    return np.flatnonzero(~is_float).astype(np.int32), np.flatnonzero(is_float).astype(np.int32)
+
+BOOL_INDICES, FLOAT_INDICES = _calculate_compact_indices(FEATURES, SIZE)
+COMPACT_BOOL_BYTES = (BOOL_INDICES.shape[0] + 7) // 8
+COMPACT_SIZE = COMPACT_BOOL_BYTES + FLOAT_INDICES.shape[0]
+
+# Card token observation: FEATURE_TRICKS is replaced by a sequence of played cards, one (card_id, player, trick_index) token per card
+# The dense part holds all other features, in the same order as obs
+TOKEN_LENGTH = 30  # At most 30 cards are played in a game
+TOKEN_PAD = np.array([32, 3, 10], dtype=np.int64)  # Token for unused positions, one above the highest real value of each field
+DENSE_SIZE = SIZE - FEATURES[FEATURE_TRICKS, 2]
+
+
+class ObservationSpec:
+    """
+    Selects a subset of the features, for ablation runs and small models. Features that aren't selected are not computed at all.
+    Selected features keep their order, their offsets are recalculated for the smaller observation.
+
+    spec.features has the same format as FEATURES. Pass it as features argument to the set_feature functions,
+    start and end index are -1 for features that aren't selected, which makes these functions skip them.
+    """
+
+    def __init__(self, feature_ids=None):
+        """
+        Args:
+            feature_ids: FEATURE_ constants to select, None selects all features
+        """
+        if feature_ids is None:
+            feature_ids = range(FEATURES.shape[0])
+        self.feature_ids = np.array(sorted(set(feature_ids)), dtype=np.int32)
+        self.features = FEATURES.copy()
+        self.features[:, :2] = -1
+        size = 0
+        for feature_id in self.feature_ids:
+            self.features[feature_id, 0] = size
+            size += FEATURES[feature_id, 2]
+            self.features[feature_id, 1] = size
+        self.size = size
+        self.bool_indices, self.float_indices = _calculate_compact_indices(self.features, size)
+        self.compact_size = (self.bool_indices.shape[0] + 7) // 8 + self.float_indices.shape[0]
+
+    def is_selected(self, feature_id):
+        return self.features[feature_id, 0] >= 0
+
+    def without(self, feature_id):
+        """Returns a new spec with the same features, except for feature_id"""
+        return ObservationSpec([f for f in self.feature_ids if f != feature_id])
+
+    def create_obs(self):
+        return np.zeros(self.size, np.float32)
+
+    def select(self, obs):
+        """
+        Extracts the selected features from full observations (with all features)
+
+        Args:
+            obs: np.float32 array (SIZE) or (n, SIZE)
+        """
+        indices = np.concatenate([np.arange(FEATURES[f, 0], FEATURES[f, 1]) for f in self.feature_ids])
+        return obs[..., indices]
+
+@njit(cache=True)
 def create_obs():
     return np.zeros(SIZE, np.float32)
 
-@njit
-def set_feature(obs, feature_id, data):
+@njit(inline='always', cache=True)
+def is_feature_selected(features, feature_id):
+    return features[feature_id, 0] >= 0
+
+@njit(cache=True)
+def set_feature(obs, feature_id, data, features=FEATURES):
     """
     Fill data of a feature into the observation space
 
@@ -56,34 +137,139 @@ def set_feature(obs, feature_id, data):
         obs: observation space (np array)
         feature_id: FEATURE_ constant
         data: 1d numpy array
+        features: FEATURES or ObservationSpec.features
     """
-    feature = FEATURES[feature_id]
+    if not is_feature_selected(features, feature_id):
+        return
+    feature = features[feature_id]
     assert data.dtype == obs.dtype
     assert feature[2] == data.shape[0]
     obs[feature[0]:feature[1]] = data
 
-@njit
-def set_feature_bool(obs, feature_id, value):
+@njit(cache=True)
+def set_feature_bool(obs, feature_id, value, features=FEATURES):
     """
     Fills the feature of length 1, with 1 or 0, for true or false
     """
-    assert FEATURES[feature_id, 2] == 1
-    b = 1 if value else 0
-    data = np.full(1, b, dtype=np.float32)
-    set_feature(obs, feature_id, data)
+    assert features[feature_id, 2] == 1
+    if is_feature_selected(features, feature_id):
+        obs[features[feature_id, 0]] = 1 if value else 0
 
-@njit
-def set_feature_scalar(obs, feature_id, scalar):
+@njit(cache=True)
+def set_feature_scalar(obs, feature_id, scalar, features=FEATURES):
     """
     Fills the feature with new data, where the nth value (scalar) is set to 1 and everything else 0
     """
-    assert scalar < FEATURES[feature_id, 2]
-    data = create_empty_data(feature_id)
-    data[scalar] = 1
-    set_feature(obs, feature_id, data)
+    assert scalar < features[feature_id, 2]
+    if not is_feature_selected(features, feature_id):
+        return
+    start = features[feature_id, 0]
+    obs[start:features[feature_id, 1]] = 0
+    obs[start + scalar] = 1
 
-@njit
-def set_feature_finish_trick(obs, trick):
+@njit(cache=True)
+def set_feature_bitmap(obs, feature_id, bitmap, index=0, features=FEATURES):
+    """
+    Fills 32 values of a feature with the cards of a bitmap, 1 for every card present
+
+    Args:
+        obs: observation space (np array)
+        feature_id: FEATURE_ constant
+        bitmap: np.uint32 bitmap of length 32
+        index: Which block of 32 values in the feature to fill (player index for FEATURE_PLAYER_CARDS for example)
+        features: FEATURES or ObservationSpec.features
+    """
+    if not is_feature_selected(features, feature_id):
+        return
+    start = features[feature_id, 0] + index * 32
+    assert start + 32 <= features[feature_id, 1]
+    for card_id in range(32):
+        obs[start + card_id] = (bitmap >> card_id) & 1
+
+@njit(cache=True)
+def set_features_state(obs, game_type, possible_cards, leader, valid_actions, solo_points, team_points, team_tricks, features=FEATURES):
+    """
+    Fills all features of the current state except for the tricks, which are updated incrementally.
+    Called directly before trainee is expected to play a card. Only selected features are computed.
+
+    Args:
+        obs:
+        game_type: Colors (0-3), Grand (4), Null (5)
+        possible_cards: array of 3 bitmaps. Own hand and cards the other players might still hold
+        leader: player who plays the first card this trick
+        valid_actions: bitmap of cards the trainee is allowed to play
+        solo_points: Augen collected by the solo player (including Skat)
+        team_points: Augen collected by the Gegenspieler team
+        team_tricks: Number of tricks won by the Gegenspieler team
+        features: FEATURES or ObservationSpec.features
+    """
+    if is_feature_selected(features, FEATURE_PLAYER_CARDS):
+        for i in range(3):
+            set_feature_bitmap(obs, FEATURE_PLAYER_CARDS, possible_cards[i], i, features)
+    set_feature_scalar(obs, FEATURE_LEADER, leader, features)
+    set_feature_bitmap(obs, FEATURE_VALID_ACTIONS, valid_actions, 0, features)
+
+    if is_feature_selected(features, FEATURE_COLORS_LEFT):
+        colors_left = features[FEATURE_COLORS_LEFT, 0]
+        for i in range(3):
+            for g in range(5):
+                obs[colors_left + i * 5 + g] = (possible_cards[i] & CARD_GROUPS[game_type, g]) != 0
+
+    if is_feature_selected(features, FEATURE_AUGEN):
+        augen = features[FEATURE_AUGEN, 0]
+        obs[augen] = solo_points / 120
+        obs[augen + 1] = team_points / 120
+    set_feature_bool(obs, FEATURE_SCHNEIDER_ESCAPED, team_points > 30, features)
+    set_feature_bool(obs, FEATURE_SCHWARZ_ESCAPED, team_tricks > 0, features)
+
+@njit(inline='always', cache=True)
+def normalize_bid(bid):
+    return bid / BIDDING_VALUES[-1]
+
+@njit(cache=True)
+def analyse_bid(bid):
+    """
+    Returns:
+        tuple: (game type, tier) the bid stands for. Tier is -1 for Null. When ambiguous the lower tier is assumed.
+    """
+    if bid in BIDDING_NULL:
+        return NULL, -1
+    game_type = -1
+    for i in range(GRAND, -1, -1):
+        if bid % BIDDING_BASE_VALUES[i] == 0:
+            game_type = i
+            break
+    return game_type, bid // BIDDING_BASE_VALUES[game_type] - 2
+
+@njit(cache=True)
+def set_features_bidding(obs, public_bids, rear_declined, features=FEATURES):
+    """
+    Fills the bidding features
+
+    Args:
+        obs:
+        public_bids: array of length 3, highest bid each player made public (0 for none), by player index of the observation
+        rear_declined: If the rear player only declined a higher bid
+        features: FEATURES or ObservationSpec.features
+    """
+    feature_bids = create_empty_data(FEATURE_BIDS)
+    feature_bids_game_type = create_empty_data(FEATURE_BIDS_GAME_TYPE)
+    feature_bids_tier = create_empty_data(FEATURE_BIDS_TIER)
+    for i in range(3):
+        bid = public_bids[i]
+        if bid > 0:
+            bid_game_type, tier = analyse_bid(bid)
+            feature_bids_game_type[i * 6 + bid_game_type] = 1
+            if tier >= 0:
+                feature_bids_tier[i * 5 + min(tier, 4)] = 1
+            feature_bids[i] = normalize_bid(bid)
+    set_feature(obs, FEATURE_BIDS, feature_bids, features)
+    set_feature(obs, FEATURE_BIDS_GAME_TYPE, feature_bids_game_type, features)
+    set_feature(obs, FEATURE_BIDS_TIER, feature_bids_tier, features)
+    set_feature_bool(obs, FEATURE_BIDS_REAR_DECLINED, rear_declined, features)
+
+@njit(cache=True)
+def set_feature_finish_trick(obs, trick, trick_index=0, features=FEATURES):
     """
     Fills FEATURE_TRICKS with the latest (finished) trick cards and updates FEATURE_TRICKS_PLAYED.
     Called when a trick has been finished.
@@ -92,33 +278,194 @@ def set_feature_finish_trick(obs, trick):
     Args:
         obs:
         trick: array of length 3 with card ids. No card is represented by value < 0
+        trick_index: Slot of the trick in FEATURE_TRICKS. Always 0 for TRICKS_LAYOUT_SHIFTED, index of the trick (0-9) for TRICKS_LAYOUT_SLOTS
+        features: FEATURES or ObservationSpec.features
 
     """
-    tricks_played_index = FEATURES[FEATURE_TRICKS_PLAYED, 0]
-    obs[tricks_played_index] += 0.1
+    if is_feature_selected(features, FEATURE_TRICKS_PLAYED):
+        obs[features[FEATURE_TRICKS_PLAYED, 0]] += 0.1
 
-    tricks_index = FEATURES[FEATURE_TRICKS, 0]
-    for i in range(3):
-        if trick[i] >= 0:
-            obs[tricks_index + i * 32 + trick[i]] = 1
+    set_feature_trick(obs, trick_index, trick, features)
 
-@njit
-def set_feature_add_trick(obs, trick):
+@njit(cache=True)
+def set_feature_add_trick(obs, trick, features=FEATURES):
     """
     Moves existing tricks backwards in FEATURE_TRICKS and fills the new (unfinished) trick to position reserved for current trick.
     This will be called directly before trainee is expected to play a card.
     Args:
         obs:
         trick: array of length 3 with card ids. No card is represented by value < 0
+        features: FEATURES or ObservationSpec.features
     """
-    feature = FEATURES[FEATURE_TRICKS]
+    if not is_feature_selected(features, FEATURE_TRICKS):
+        return
+    feature = features[FEATURE_TRICKS]
     obs[feature[0] + 3 * 32:feature[1]] = obs[feature[0]:feature[0] + 3 * 9 * 32]
     obs[feature[0]:feature[0] + 3 * 32] = 0
     for i in range(3):
         if trick[i] >= 0:
             obs[feature[0] + i * 32 + trick[i]] = 1
 
-@njit
+@njit(cache=True)
 def create_empty_data(feature_id):
     feature = FEATURES[feature_id]
     return np.zeros(feature[2], dtype=np.float32)
+
+@njit(cache=True)
+def set_feature_trick(obs, trick_index, trick, features=FEATURES):
+    """
+    Writes the cards of a trick to its slot in FEATURE_TRICKS, without touching any other trick.
+    Cards are only ever added, so the same trick can be written again when more cards have been played.
+
+    Args:
+        obs:
+        trick_index: slot in FEATURE_TRICKS (0-9)
+        trick: array of length 3 with card ids. No card is represented by value < 0
+        features: FEATURES or ObservationSpec.features
+    """
+    if not is_feature_selected(features, FEATURE_TRICKS):
+        return
+    slot_index = features[FEATURE_TRICKS, 0] + trick_index * 3 * 32
+    for i in range(3):
+        if trick[i] >= 0:
+            obs[slot_index + i * 32 + trick[i]] = 1
+
+@njit(cache=True)
+def get_current_trick_index(obs):
+    """
+    Index of the ongoing trick (0-9), derived from FEATURE_TRICKS_PLAYED.
+    Only valid for observations where the trainee is about to play a card (every observation but the terminal one).
+    """
+    tricks_played = int(round(obs[FEATURES[FEATURE_TRICKS_PLAYED, 0]] * 10))
+    return min(tricks_played, 9)
+
+@njit(cache=True)
+def convert_tricks_to_shifted(obs, current_trick_index):
+    """
+    Converts an observation with TRICKS_LAYOUT_SLOTS into TRICKS_LAYOUT_SHIFTED, so it can be used with models trained on the shifted layout.
+
+    Args:
+        obs: observation with TRICKS_LAYOUT_SLOTS
+        current_trick_index: index of the ongoing trick (0-9), see get_current_trick_index
+
+    Returns:
+        New observation with TRICKS_LAYOUT_SHIFTED
+    """
+    result = obs.copy()
+    start = FEATURES[FEATURE_TRICKS, 0]
+    trick_size = 3 * 32
+    result[start:FEATURES[FEATURE_TRICKS, 1]] = 0
+    for i in range(current_trick_index + 1):
+        source = start + (current_trick_index - i) * trick_size
+        target = start + i * trick_size
+        result[target:target + trick_size] = obs[source:source + trick_size]
+    return result
+
+@njit(cache=True)
+def convert_tricks_to_shifted_batch(obs_batch):
+    """
+    Converts a 2d array of observations with TRICKS_LAYOUT_SLOTS into TRICKS_LAYOUT_SHIFTED.
+    The ongoing trick is derived with get_current_trick_index.
+    """
+    result = np.empty_like(obs_batch)
+    for i in range(obs_batch.shape[0]):
+        result[i] = convert_tricks_to_shifted(obs_batch[i], get_current_trick_index(obs_batch[i]))
+    return result
+
+@njit(cache=True)
+def pack_obs(obs, bool_indices=BOOL_INDICES, float_indices=FLOAT_INDICES):
+    """
+    Converts an observation into the compact uint8 format (see COMPACT_SIZE)
+
+    Args:
+        obs: np.float32 observation
+        bool_indices: BOOL_INDICES or ObservationSpec.bool_indices
+        float_indices: FLOAT_INDICES or ObservationSpec.float_indices
+
+    Returns:
+        np.uint8 array of length COMPACT_SIZE (or ObservationSpec.compact_size)
+    """
+    bool_bytes = (bool_indices.shape[0] + 7) // 8
+    packed = np.zeros(bool_bytes + float_indices.shape[0], dtype=np.uint8)
+    for i in range(bool_indices.shape[0]):
+        if obs[bool_indices[i]] > 0.5:
+            packed[i >> 3] |= np.uint8(128 >> (i & 7))
+    for i in range(float_indices.shape[0]):
+        value = min(max(obs[float_indices[i]], 0.0), 1.0)
+        packed[bool_bytes + i] = np.uint8(round(value * 255))
+    return packed
+
+def unpack_obs_batch(packed, spec=None):
+    """
+    Restores np.float32 observations from compact ones. Vectorized, meant to be called on whole training batches.
+
+    Args:
+        packed: np.uint8 array (n, COMPACT_SIZE) or a single compact observation
+        spec: ObservationSpec the observations were created with, None for all features
+
+    Returns:
+        np.float32 array (n, SIZE)
+    """
+    size, bool_indices, float_indices = (SIZE, BOOL_INDICES, FLOAT_INDICES) if spec is None else (spec.size, spec.bool_indices, spec.float_indices)
+    bool_bytes = (bool_indices.shape[0] + 7) // 8
+    packed = np.atleast_2d(packed)
+    obs = np.zeros((packed.shape[0], size), dtype=np.float32)
+    obs[:, bool_indices] = np.unpackbits(packed[:, :bool_bytes], axis=1, count=bool_indices.shape[0])
+    obs[:, float_indices] = packed[:, bool_bytes:] * np.float32(1 / 255)
+    return obs
+
+@njit(cache=True)
+def create_tokens():
+    """Card token sequence of length TOKEN_LENGTH, filled with TOKEN_PAD"""
+    tokens = np.empty((TOKEN_LENGTH, 3), dtype=np.int64)
+    for i in range(TOKEN_LENGTH):
+        tokens[i] = TOKEN_PAD
+    return tokens
+
+@njit(cache=True)
+def add_card_token(tokens, token_count, card_id, player, trick_index):
+    """
+    Appends a played card to the token sequence.
+
+    Args:
+        tokens: see create_tokens
+        token_count: number of cards already in tokens
+        card_id: 0-31
+        player: self 0, left 1, right 2
+        trick_index: 0-9
+
+    Returns:
+        int: new token_count
+    """
+    tokens[token_count, 0] = card_id
+    tokens[token_count, 1] = player
+    tokens[token_count, 2] = trick_index
+    return token_count + 1
+
+@njit(cache=True)
+def get_dense_obs(obs):
+    """
+    Extracts all features except FEATURE_TRICKS
+
+    Returns:
+        np.float32 array of length DENSE_SIZE
+    """
+    start = FEATURES[FEATURE_TRICKS, 0]
+    end = FEATURES[FEATURE_TRICKS, 1]
+    dense = np.empty(DENSE_SIZE, dtype=np.float32)
+    dense[:start] = obs[:start]
+    dense[start:] = obs[end:]
+    return dense
+
+@njit(cache=True)
+def convert_tokens_to_slots(tokens, token_count):
+    """
+    Builds FEATURE_TRICKS in TRICKS_LAYOUT_SLOTS from a token sequence
+
+    Returns:
+        np.float32 array with the length of FEATURE_TRICKS
+    """
+    tricks = np.zeros(FEATURES[FEATURE_TRICKS, 2], dtype=np.float32)
+    for i in range(token_count):
+        tricks[(tokens[i, 2] * 3 + tokens[i, 1]) * 32 + tokens[i, 0]] = 1
+    return tricks
@@ -0,0 +1,107 @@
+import numpy as np
+from numba import njit, prange
+
+import intrinsic
+from agents.playing.GreedyPlayingAI import get_greedy_card
+from counters import count, COUNTER_ROLLOUTS
+from skat import get_valid_actions, get_trick_winner, count_points, get_bitmap, remove_card, NULL, EXTRA_TIER_SCHNEIDER, EXTRA_TIER_SCHWARZ
+
+# Rollouts play a position out to the last trick many times with a simple policy for every player, for estimators and
+# search agents. rollouts runs them on all threads (prange) without holding the GIL. Results only depend on the seed,
+# not on the number of threads: rollouts are split into chunks of ROLLOUTS_PER_SEED, each seeded on its own.
+
+POLICY_RANDOM = 0  # Uniformly random valid card
+POLICY_GREEDY = 1  # get_greedy_card, like GreedyPlayingAI
+POLICY_EPSILON_GREEDY = 2  # Random card with probability epsilon, greedy otherwise
+
+ROLLOUTS_PER_SEED = 1024
+
+
+@njit(nogil=True, cache=True)
+def choose_card(policy, epsilon, game_type, hand_cards, valid_actions, trick, leader, player, solo_player):
+    """
+    Returns:
+        int: Card of valid_actions chosen by the POLICY_ constant
+    """
+    if policy == POLICY_GREEDY or (policy == POLICY_EPSILON_GREEDY and np.random.random() >= epsilon):
+        return get_greedy_card(game_type, hand_cards, valid_actions, trick, leader, player, solo_player)
+    cards = valid_actions
+    for _ in range(np.random.randint(intrinsic.popcount(valid_actions))):
+        cards &= cards - np.uint32(1)
+    return np.int64(intrinsic.ctz(cards))
+
+
+@njit(nogil=True, cache=True)
+def play_out(game_type, extra_tier, solo_player, hands, trick, leader, solo_points, team_points, team_tricks, policy, epsilon):
+    """
+    Plays all remaining cards once. hands and trick are changed.
+
+    Returns:
+        tuple: (solo points, solo win), the win decided like in SkatGame.playing
+    """
+    solo_tricks = 0
+    while hands[0] | hands[1] | hands[2] or (trick >= 0).any():
+        for i in range(3):
+            player = (leader + i) % 3
+            if trick[player] >= 0:
+                continue
+            valid_actions = hands[player] if i == 0 else get_valid_actions(game_type, trick[leader], hands[player])
+            card = choose_card(policy, epsilon, game_type, hands[player], valid_actions, trick, leader, player, solo_player)
+            trick[player] = card
+            hands[player] = remove_card(hands[player], card)
+        winner = get_trick_winner(game_type, trick, trick[leader])
+        points = count_points(get_bitmap(trick))
+        if winner == solo_player:
+            solo_points += points
+            solo_tricks += 1
+        else:
+            team_points += points
+            team_tricks += 1
+        trick[:] = -1
+        leader = winner
+    if game_type == NULL:
+        return solo_points, solo_tricks == 0
+    if extra_tier >= EXTRA_TIER_SCHWARZ and team_tricks > 0:
+        return solo_points, False
+    if extra_tier == EXTRA_TIER_SCHNEIDER:
+        return solo_points, team_points <= 30
+    return solo_points, solo_points > 60
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def rollouts(game_type, extra_tier, solo_player, hands, trick, leader, solo_points, team_points, team_tricks, policy, n, seed, epsilon=0.1):
+    """
+    Plays a position out n times on all threads.
+
+    Args:
+        game_type (int): Colors (0-3), Grand (4), Null (5)
+        extra_tier (int): EXTRA_TIER_ constant
+        solo_player (int): 0-2
+        hands: np.uint32 array, remaining cards of the 3 players
+        trick: np array of length 3, cards of the current trick by player, -1 if not played yet
+        leader (int): Player who leads the current trick
+        solo_points (int): Points of the solo player so far, including the Skat
+        team_points (int): Points of the team so far
+        team_tricks (int): Tricks of the team so far, for Schwarz announced games. In Null games the solo player must not
+            have a trick yet.
+        policy (int): POLICY_ constant, used by all players
+        n (int): Number of rollouts
+        seed (int): Seed of the random policies
+        epsilon (float): Share of random cards with POLICY_EPSILON_GREEDY
+
+    Returns:
+        tuple: (solo points, solo wins) np.int64 and np.bool_ arrays of size n
+    """
+    final_points = np.empty(n, dtype=np.int64)
+    wins = np.empty(n, dtype=np.bool_)
+    for chunk in prange((n + ROLLOUTS_PER_SEED - 1) // ROLLOUTS_PER_SEED):
+        np.random.seed(np.uint32((seed * 1_000_003 + chunk) & 0xFFFFFFFF))
+        rollout_hands = np.empty(3, dtype=np.uint32)
+        rollout_trick = np.empty(3, dtype=np.int64)
+        for i in range(chunk * ROLLOUTS_PER_SEED, min(n, (chunk + 1) * ROLLOUTS_PER_SEED)):
+            count(COUNTER_ROLLOUTS)
+            rollout_hands[:] = hands
+            rollout_trick[:] = trick
+            final_points[i], wins[i] = play_out(game_type, extra_tier, solo_player, rollout_hands, rollout_trick, leader, solo_points,
+                                                team_points, team_tricks, policy, epsilon)
+    return final_points, wins
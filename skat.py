@@ -65,6 +65,35 @@ RESULT_TEAM_WIN = 0
 RESULT_SOLO_WIN = 1
 RESULT_PASSED = 2
 
+# Game events, logged as (event type, player, card, value) tuples. -1 if player or card doesn't apply.
+EVENT_GAME_START = 0  # player: forehand
+EVENT_CARDS_DEALT = 1  # player: 0-2 or CARD_LOCATION_SKAT, value: bitmap
+EVENT_PASS = 2  # player
+EVENT_SAY = 3  # player, value: bid
+EVENT_HEAR = 4  # player
+EVENT_HIGHEST_BID = 5  # player, value: bid
+EVENT_PICKUP_SKAT = 6  # player, value: 1 picked up, 0 not
+EVENT_SKAT_PUT_BACK = 7  # player, value: bitmap
+EVENT_ANNOUNCE = 8  # player, card: game type, value: extra tier
+EVENT_TRICK_HAND = 9  # player, card: trick index, value: bitmap of hand cards before the trick
+EVENT_CARD_PLAYED = 10  # player, card
+EVENT_TRICK_WON = 11  # player, value: points of the trick
+EVENT_NULL_LOST = 12
+EVENT_SCHWARZ_LOST = 13
+EVENT_ALL_CARDS_PLAYED = 14
+EVENT_NULL_WON = 15
+EVENT_POINTS_COUNTED = 16  # value: points of the solo player (Augen)
+EVENT_SCHNEIDER = 17
+EVENT_SCHWARZ = 18
+EVENT_WINNER = 19  # value: 1 solo player wins, 0 team wins
+EVENT_GAME_VALUE = 20  # card: tier (not for Null), value: extra tier including Schneider/Schwarz, Null: game value
+EVENT_GAME_POINTS = 21  # player: solo player, value: points
+EVENT_GAME_OVER = 22
+EVENT_ALL_PASSED = 23
+EVENT_START_CARDS = 24  # player: 0-2 or CARD_LOCATION_SKAT, value: bitmap
+EVENT_OUTCOME_DECIDED = 25  # value: points of the solo player so far
+NUMBER_OF_EVENT_TYPES = 26
+
 # Bidding
 BIDDING_BASE_VALUES = np.array([9, 10, 11, 12, 24], dtype=np.uint32)
 BIDDING_NULL = np.array([23, 35, 46, 59], dtype=np.uint32)
@@ -82,7 +111,7 @@ def calculate_bidding_values():
 
 BIDDING_VALUES = calculate_bidding_values()
 
-@njit
+@njit("int64(int64)", nogil=True, cache=True)
 def get_next_bid(bid):
     for i in range(BIDDING_VALUES.shape[0]):
         if BIDDING_VALUES[i] > bid:
@@ -92,7 +121,7 @@ def get_next_bid(bid):
 
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_card_color(card_id):
     """Get the color of a card.
 
@@ -105,7 +134,7 @@ def get_card_color(card_id):
     return card_id >> 3 # shifting right by 3 bits, equivalent to floor division by 2^3, so equivalent to card_id // 8
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_card_rank(card_id):
     """Get the rank of a card.
 
@@ -117,7 +146,7 @@ def get_card_rank(card_id):
     """
     return card_id & 7 # bitmask 7 in binary is 00111, & 7 isolates the three lowest bids, which equals modulo 8
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_cards_that_have_been_removed(cards_a, cards_b):
     """
     This checks what cards have been present in a, but are no longer present in b
@@ -132,19 +161,19 @@ def get_cards_that_have_been_removed(cards_a, cards_b):
     return cards_a & (~cards_b & 0xFFFFFFFF)
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_card_points(card_id):
     return CARD_RANK_POINTS[get_card_rank(card_id)]
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_card_id(color, rank):
     # return color * 8 + rank
 
     # Equivalent with bit operators:
     return (color << 3) | rank
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def is_card_present(cards, card_id):
     """Check if a card group contains a specific card.
 
@@ -158,7 +187,7 @@ def is_card_present(cards, card_id):
     return (cards & (1 << card_id)) != 0
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def add_card(cards, card_id):
     """Add a card to a card group bitmap.
 
@@ -172,7 +201,7 @@ def add_card(cards, card_id):
     return cards | (np.uint32(1) << card_id)
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def remove_card(cards, card_id):
     """Remove a card from a card group bitmap.
 
@@ -186,7 +215,7 @@ def remove_card(cards, card_id):
     return cards & ~(np.uint32(1) << card_id)
 
 
-@njit
+@njit(nogil=True, cache=True)
 def get_bitmap(card_list):
     """
     Get the np.uint32 bitmap of length 32 for a list of card ids
@@ -201,7 +230,7 @@ def get_bitmap(card_list):
     return bitmap
 
 
-@njit
+@njit(nogil=True, cache=True)
 def get_card_list(bitmap):
     result = np.empty(32, dtype=np.uint32)
     count = 0
@@ -212,7 +241,7 @@ def get_card_list(bitmap):
     return result[:count]  # slice to actual length
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def add_skat_to_hand(hand_cards, skat):
     """
 
@@ -225,7 +254,7 @@ def add_skat_to_hand(hand_cards, skat):
     """
     return hand_cards | skat
 
-@njit
+@njit("int64(uint32)", nogil=True, cache=True)
 def count_points(cards):
     """
     Args:
@@ -242,7 +271,7 @@ def count_points(cards):
     return points
 
 
-@njit
+@njit(nogil=True, cache=True)
 def deal_new_cards_as_bitmaps():
     """
     Deal 10 cards to each player, keeping 2 in the Skat
@@ -257,7 +286,7 @@ def deal_new_cards_as_bitmaps():
     cards_skat = get_bitmap(deck[30:])
     return np.array([cards_p0, cards_p1, cards_p2, cards_skat], dtype=np.uint32)
 
-@njit
+@njit(nogil=True, cache=True)
 def deal_new_cards_from_deck(shuffled_deck):
     """
     Deal 10 cards to each player, keeping 2 in the Skat
@@ -290,7 +319,7 @@ def deal_new_cards(rng):
 
 
 
-@njit
+@njit(nogil=True, cache=True)
 def generate_hands_without_skat(hand_cards_with_skat):
     """
     Generate all 66 permutations of 10 card hands out of 12 cards
@@ -323,7 +352,7 @@ def generate_hands_without_skat(hand_cards_with_skat):
     return out
 
 
-@njit
+@njit(nogil=True, cache=True)
 def random_cards(number_of_cards):
     """
 
@@ -355,7 +384,7 @@ def random_cards(number_of_cards):
 
     return x
 
-@njit("uint32(uint32)")
+@njit("uint32(uint32)", nogil=True, cache=True)
 def extract_jacks(cards):
     """
 
@@ -373,7 +402,7 @@ def extract_jacks(cards):
         ((cards >> 7)  & 1)
     )
 
-@njit("uint32(uint32)")
+@njit("uint32(uint32)", nogil=True, cache=True)
 def extract_aces(cards):
     """
 
@@ -391,7 +420,7 @@ def extract_aces(cards):
         ((cards >> 6)  & 1)
     )
 
-@njit #("uint32(uint32, int)", inline='always')
+@njit(nogil=True, cache=True) #("uint32(uint32, int)", inline='always')
 def extract_color_without_jack(cards, color):
     """
     Args:
@@ -403,7 +432,7 @@ def extract_color_without_jack(cards, color):
     return (cards >> (color << 3)) & 0x7F
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def extract_color_with_jack(cards, color):
     """
     Args:
@@ -414,7 +443,7 @@ def extract_color_with_jack(cards, color):
     """
     return (cards >> (color << 3)) & 0xFF
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def combine_jacks_and_color(jack_bits, color_bits):
     """
     Args:
@@ -428,7 +457,7 @@ def combine_jacks_and_color(jack_bits, color_bits):
     return color_bits | (jack_bits << 7)
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def extract_color_trumps(cards, color):
     """
 
@@ -446,7 +475,7 @@ def extract_color_trumps(cards, color):
 
 
 # 2. The 32-bit Implementation
-@njit
+@njit(nogil=True, cache=True)
 def get_spitze32(bitmap, bitmap_size, on_only=False):
     # Force input to 32-bit unsigned
     val = numba.uint32(bitmap)
@@ -483,7 +512,7 @@ def get_spitze32(bitmap, bitmap_size, on_only=False):
     return cnt
 
 
-@njit
+@njit(nogil=True, cache=True)
 def get_spitze_neu(bitmap, bitmap_size, on_only=False):
     """
     Args:
@@ -505,12 +534,13 @@ def get_spitze_neu(bitmap, bitmap_size, on_only=False):
     return min(size, cnt)
 
 
-@njit
-def get_spitze64(bitmap, bitmap_size, on_only=False):
+@njit("int64(uint32, int64, boolean)", nogil=True, cache=True)
+def get_spitze64(bitmap, bitmap_size, on_only):
     """
     Args:
         bitmap (int): limited bitmap for specific cards only
         bitmap_size (int): 4 or 11 for trump bitmaps for example
+        on_only (bool): Only count present top cards ("mit"), not missing ones ("ohne")
 
     Returns:
         int: Spitze, number of top trumps present/missing
@@ -546,12 +576,13 @@ def get_spitze64(bitmap, bitmap_size, on_only=False):
 
     return cnt
 
-@njit
-def get_spitze(bitmap, bitmap_size, on_only=False):
+@njit("int64(uint32, int64, boolean)", nogil=True, cache=True)
+def get_spitze(bitmap, bitmap_size, on_only):
     """
     Args:
         bitmap (int): limited bitmap for specific cards only
         bitmap_size (int): 4 or 11 for trump bitmaps for example
+        on_only (bool): Only count present top cards ("mit"), not missing ones ("ohne")
 
     Returns:
         int: Spitze, number of top trumps present/missing
@@ -571,7 +602,7 @@ def get_spitze(bitmap, bitmap_size, on_only=False):
     return cnt
 
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_spitze_cgpt(bitmap, bitmap_size, on_only=False):
     bitmap = numba.int64(bitmap)
     shift = 64 - numba.int64(bitmap_size)
@@ -581,7 +612,7 @@ def get_spitze_cgpt(bitmap, bitmap_size, on_only=False):
     x = bitmap ^ (-invert_mask)  # XOR with all-ones if invert_mask=1
     return min(bitmap_size, intrinsic.clz(x))
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def count_cards(card_bitmap):
     return intrinsic.popcount(card_bitmap)
 
@@ -603,7 +634,7 @@ def calculate_null_lookup_table():
 
 NULL_LUT8 = calculate_null_lookup_table()
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def extract_color_null_ordered(hand_cards, color):
     """
     Args:
@@ -636,16 +667,16 @@ def calculate_trump_cards():
 
 TRUMP_CARDS = calculate_trump_cards()
 
-@njit(inline='always')
+@njit(inline='always', nogil=True, cache=True)
 def get_trump_cards(game_type):
     """Return bitmap of all trump cards for the given game type."""
     return TRUMP_CARDS[game_type]
 
-@njit
+@njit(nogil=True, cache=True)
 def is_card_trump(game_type, card_id):
     return is_card_present(get_trump_cards(game_type), card_id)
 
-@njit
+@njit(nogil=True, cache=True)
 def get_trump_cards_in_hand(game_type, hand_cards):
     """Return the cards in hand that are trump.
     Args:
@@ -657,7 +688,7 @@ def get_trump_cards_in_hand(game_type, hand_cards):
     return hand_cards & get_trump_cards(game_type)
 
 
-@njit
+@njit(nogil=True, cache=True)
 def calculate_card_groups():
     """
     Card groups are the cards that have to be played following another card of its group as the first card in a trick. Different groups for each game type.
@@ -684,7 +715,7 @@ def calculate_card_groups():
 CARD_GROUPS = calculate_card_groups()
 
 
-@njit
+@njit("uint32(int64, int64, uint32)", nogil=True, cache=True)
 def get_valid_actions(game_type, first_card, hand_cards):
     g = 4 if game_type == GRAND and first_card in JACKS else get_card_color(first_card)
     follow_cards = CARD_GROUPS[game_type, g]
@@ -694,7 +725,7 @@ def get_valid_actions(game_type, first_card, hand_cards):
     return hand_cards
 
 
-@njit
+@njit(nogil=True, cache=True)
 def must_follow_suit(game_type, hand_cards, first_card):
     """
 
@@ -712,7 +743,7 @@ def must_follow_suit(game_type, hand_cards, first_card):
 
 
 
-@njit
+@njit(nogil=True, cache=True)
 def must_follow_suit_old(game_type, hand_cards, first_card) :
     color = get_card_color(first_card)
     rank = get_card_rank(first_card)
@@ -728,7 +759,7 @@ def must_follow_suit_old(game_type, hand_cards, first_card) :
         return extract_color_without_jack(hand_cards, color)
 
 
-@njit
+@njit(nogil=True, cache=True)
 def get_card_strength(game_type, card_id, first_card):
     r = get_card_rank(card_id)
     if game_type == NULL:
@@ -745,7 +776,7 @@ def get_card_strength(game_type, card_id, first_card):
 
     return r + t
 
-#@njit
+@njit(nogil=True, cache=True)
 def get_trick_winner(game_type, cards, first_card):
     """
     Determine which cards wins the trick
@@ -771,7 +802,76 @@ def get_trick_winner(game_type, cards, first_card):
     return winner
 
 
-@njit
+@njit(nogil=True, cache=True)
+def solo_wins_remaining_tricks(game_type, solo_cards, team_cards):
+    """
+    Claim check for the solo player leading the next trick: the team has no trumps and every remaining card of the
+    solo player in each color is higher than all cards of the team in that color. Not for Null games.
+
+    Args:
+        game_type (int): Color (0-3), Grand (4)
+        solo_cards (int): bitmap of the hand of the solo player
+        team_cards (int): bitmap of both hands of the team
+
+    Returns:
+        bool: If the solo player wins every remaining trick, however it is played
+    """
+    trumps = get_trump_cards(game_type)
+    if team_cards & trumps:
+        return False
+    for color in range(4):
+        color_mask = np.uint32(0xFF) << np.uint32(8 * color)
+        solo_color = solo_cards & color_mask & ~trumps
+        team_color = team_cards & color_mask & ~trumps
+        # Card ids rise with rank within a color, so the team has a higher card if its bits exceed the lowest solo bit
+        if solo_color and team_color > (solo_color & (~solo_color + np.uint32(1))):
+            return False
+    return True
+
+
+@njit(nogil=True, cache=True)
+def get_decided_outcome(game_type, extra_tier, solo_points, team_points, solo_cards, team_cards, solo_leads):
+    """
+    Checks after a trick if the outcome of the game is fixed, so it doesn't have to be played out. The outcome is the
+    same as SkatGame.playing decides after all tricks: solo win, Schneider (team points <= 30) and Schwarz (team points 0).
+    Null games and lost Schwarz announced games already end early in SkatGame.playing and aren't decided here.
+
+    Args:
+        game_type (int): Color (0-3), Grand (4), Null (5)
+        extra_tier (int): EXTRA_TIER_ constant
+        solo_points (int): Points of the solo player so far, including the Skat
+        team_points (int): Points of the team so far
+        solo_cards (int): bitmap of the hand of the solo player
+        team_cards (int): bitmap of both hands of the team
+        solo_leads (bool): If the solo player leads the next trick
+
+    Returns:
+        tuple: (decided, solo_win, schneider, schwarz), the last three only valid if decided
+    """
+    if game_type == NULL:
+        return False, False, False, False
+    if solo_leads and solo_wins_remaining_tricks(game_type, solo_cards, team_cards):
+        schneider = team_points <= 30
+        solo_win = schneider if extra_tier == EXTRA_TIER_SCHNEIDER else 120 - team_points > 60
+        return True, solo_win, schneider, team_points == 0
+    if extra_tier >= EXTRA_TIER_SCHWARZ:
+        return False, False, False, False
+    remaining_points = 120 - solo_points - team_points
+    if (team_points == 0 < remaining_points) or (team_points <= 30 < team_points + remaining_points):
+        # Schwarz or Schneider still open
+        return False, False, False, False
+    schneider = team_points <= 30
+    schwarz = team_points == 0
+    if extra_tier == EXTRA_TIER_SCHNEIDER:
+        return True, schneider, schneider, schwarz
+    if solo_points > 60:
+        return True, True, schneider, schwarz
+    if solo_points + remaining_points <= 60:
+        return True, False, schneider, schwarz
+    return False, False, False, False
+
+
+@njit("int64(int64, uint32)", nogil=True, cache=True)
 def calculate_game_tier(game_type, hand_cards_with_skat):
     """
     Args:
@@ -787,11 +887,11 @@ def calculate_game_tier(game_type, hand_cards_with_skat):
     spitze = 0
     bitmap_known_jacks = extract_jacks(hand_cards_with_skat)
     if game_type == GRAND:
-        spitze = get_spitze(bitmap_known_jacks, 4)
+        spitze = get_spitze(bitmap_known_jacks, 4, False)
     elif game_type < 4:
         # Color game
         bitmap_color_without_jacks = extract_color_without_jack(hand_cards_with_skat, game_type)
-        spitze = get_spitze(combine_jacks_and_color(bitmap_known_jacks, bitmap_color_without_jacks), 11)
+        spitze = get_spitze(combine_jacks_and_color(bitmap_known_jacks, bitmap_color_without_jacks), 11, False)
     return spitze + 1
 
 
@@ -1,4 +1,8 @@
-from skat import get_card_color, get_card_rank, CLUBS, R_J, NULL_RANK_ORDER, GRAND, NULL, get_card_list, get_bitmap
+from skat import get_card_color, get_card_rank, CLUBS, R_J, NULL_RANK_ORDER, GRAND, NULL, get_card_list, get_bitmap, BIDDING_BASE_VALUES, \
+    CARD_LOCATION_SKAT, EVENT_GAME_START, EVENT_CARDS_DEALT, EVENT_PASS, EVENT_SAY, EVENT_HEAR, EVENT_HIGHEST_BID, EVENT_PICKUP_SKAT, \
+    EVENT_SKAT_PUT_BACK, EVENT_ANNOUNCE, EVENT_TRICK_HAND, EVENT_CARD_PLAYED, EVENT_TRICK_WON, EVENT_NULL_LOST, EVENT_SCHWARZ_LOST, \
+    EVENT_ALL_CARDS_PLAYED, EVENT_NULL_WON, EVENT_POINTS_COUNTED, EVENT_SCHNEIDER, EVENT_SCHWARZ, EVENT_WINNER, EVENT_GAME_VALUE, \
+    EVENT_GAME_POINTS, EVENT_GAME_OVER, EVENT_ALL_PASSED, EVENT_START_CARDS, EVENT_OUTCOME_DECIDED, NUMBER_OF_EVENT_TYPES
 
 SUIT_SYMBOLS = ["♦", "♥", "♠", "♣"]
 RANK_SYMBOLS = ["7", "8", "9", "D", "K", "10", "A", "B"]
@@ -17,6 +21,11 @@ VERBOSE_PRIVATE_INFO = 2
 VERBOSE_DEBUG = 3
 VERBOSE_FINEST = 4
 
+# Verbosity an event is shown at, indexed by EVENT_ constant
+EVENT_VERBOSITY = [VERBOSE_PUBLIC_INFO] * NUMBER_OF_EVENT_TYPES
+for _event in (EVENT_CARDS_DEALT, EVENT_SKAT_PUT_BACK, EVENT_TRICK_HAND):
+    EVENT_VERBOSITY[_event] = VERBOSE_PRIVATE_INFO
+
 def get_game_name(game_type, extra_tier):
     """
     Args:
@@ -91,4 +100,117 @@ def get_bitmap_text(cards, sorting_mode=CLUBS):
         sorting_mode (int): 0-4 Colors, 5 Grand, 6 Null
     """
     card_list = get_card_list(cards)
-    return get_list_text(card_list)
\ No newline at end of file
+    return get_list_text(card_list)
+
+
+class EventRenderer:
+    """
+    Renders game events (see EVENT_ constants in skat) to text. Remembers the announced game of the events it rendered,
+    so events of a game have to be rendered in order, starting with EVENT_ANNOUNCE.
+    """
+
+    def __init__(self, player_texts, behaviours):
+        """
+        Args:
+            player_texts: Text of each player, like 'BasicAI (0)'
+            behaviours: Behaviour of each player
+        """
+        self.player_texts = player_texts
+        self.behaviours = behaviours
+        self.game_type = CLUBS
+        self.extra_tier = 0
+
+    def get_location_text(self, location):
+        return "Skat" if location == CARD_LOCATION_SKAT else self.player_texts[location]
+
+    @staticmethod
+    def ends_line(event):
+        """
+        Events that are logged once per player (hand cards of a trick, final card distribution) are rendered on one line.
+
+        Args:
+            event: (event type, player, card, value)
+
+        Returns:
+            bool: False if the text of the next event continues the line of this one
+        """
+        event_type, player = event[0], event[1]
+        if event_type == EVENT_TRICK_HAND:
+            return player == 2
+        if event_type == EVENT_START_CARDS:
+            return player == CARD_LOCATION_SKAT
+        return True
+
+    def render(self, event):
+        """
+        Args:
+            event: (event type, player, card, value)
+
+        Returns:
+            str: German text of the event, as printed by SkatGame. Continues the previous line if ends_line() of the
+            previous event is False.
+        """
+        event_type, player, card, value = event
+        if event_type == EVENT_CARD_PLAYED:
+            return f"{self.player_texts[player]} spielt {get_card_name(card)}"
+        if event_type == EVENT_TRICK_WON:
+            return f"Stich geht an {self.player_texts[player]}"
+        if event_type == EVENT_TRICK_HAND:
+            text = f"{self.player_texts[player]} {get_bitmap_text(value, self.game_type)}"
+            return f"Stich {card + 1} Handkarten: {text}" if player == 0 else f"     {text}"
+        if event_type == EVENT_GAME_START:
+            return f"Beginne Spiel mit {self.player_texts[0]} {self.player_texts[1]} {self.player_texts[2]}. Vorhand: {self.player_texts[player]} Verhalten: {self.behaviours}"
+        if event_type == EVENT_CARDS_DEALT:
+            text = f"{self.get_location_text(player)} {get_bitmap_text(value)}"
+            return f"Karten ausgeteilt:\n{text}" if player == 0 else text
+        if event_type == EVENT_PASS:
+            return f"{self.player_texts[player]} passt."
+        if event_type == EVENT_SAY:
+            return f"{self.player_texts[player]} sagt {value}."
+        if event_type == EVENT_HEAR:
+            return f"{self.player_texts[player]} sagt Ja."
+        if event_type == EVENT_HIGHEST_BID:
+            return f"{self.player_texts[player]} hat mit {value} das höchste Gebot abgegeben und sagt an."
+        if event_type == EVENT_PICKUP_SKAT:
+            pickup_text = "" if value else "nicht "
+            return f"{self.player_texts[player]} nimmt den Skat {pickup_text}auf."
+        if event_type == EVENT_SKAT_PUT_BACK:
+            return f"{self.player_texts[player]} legt {get_bitmap_text(value)} zurück in den Skat."
+        if event_type == EVENT_ANNOUNCE:
+            self.game_type = card
+            self.extra_tier = value
+            return f"{self.player_texts[player]} spielt {get_game_name(card, value)}"
+        if event_type == EVENT_NULL_LOST:
+            return "Alleinspieler hat einen Stich bekommen: Nullspiel verloren."
+        if event_type == EVENT_SCHWARZ_LOST:
+            return "Gegenpartei hat einen Stich bekommen: Schwarz kann nicht mehr erreicht werden."
+        if event_type == EVENT_ALL_CARDS_PLAYED:
+            return "Alle Karten wurden gespielt."
+        if event_type == EVENT_NULL_WON:
+            return "Alleinspieler hat keinen einzigen Stich bekommen: Nullspiel gewonnen"
+        if event_type == EVENT_POINTS_COUNTED:
+            return f"Augen - Alleinspieler: {value} Gegenpartei: {120 - value}"
+        if event_type == EVENT_SCHNEIDER:
+            return "Schneider erreicht"
+        if event_type == EVENT_SCHWARZ:
+            return "Schwarz erreicht"
+        if event_type == EVENT_WINNER:
+            return "Alleinspieler gewinnt" if value else "Gegenpartei gewinnt"
+        if event_type == EVENT_GAME_VALUE:
+            game_name = get_game_name(self.game_type, self.extra_tier)
+            if self.game_type == NULL:
+                return f"Spielwert {game_name}: {value} Punkte"
+            base_value = BIDDING_BASE_VALUES[self.game_type]
+            return f"Spielwert {game_name}: Farbwert {base_value} Stufe {card} extra {value} Punkte gesamt {base_value * (card + value)}"
+        if event_type == EVENT_GAME_POINTS:
+            return f"Alleinspieler {self.player_texts[player]} bekommt {value} Punkte"
+        if event_type == EVENT_GAME_OVER:
+            return "Spiel vorbei."
+        if event_type == EVENT_ALL_PASSED:
+            return "Alle haben gepasst, Spiel vorbei."
+        if event_type == EVENT_START_CARDS:
+            text = f"{self.get_location_text(player)}: {get_bitmap_text(value)}"
+            return f"Kartenverteilung war {text}" if player == 0 else f" {text}"
+        if event_type == EVENT_OUTCOME_DECIDED:
+            return f"Ergebnis steht fest, die restlichen Stiche werden nicht gespielt. Augen Alleinspieler bisher: {value}"
+        raise ValueError(f"Unknown event type {event_type}")
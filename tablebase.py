@@ -0,0 +1,234 @@
+import os
+import sys
+from math import comb
+from time import perf_counter
+
+import numpy as np
+from numba import njit, prange
+
+import intrinsic
+from counters import count, COUNTER_TABLEBASE_HITS
+from skat import get_valid_actions, get_card_strength, get_card_points, remove_card, NULL
+
+# Endgame tablebase: the exact result of the last n tricks (n <= MAX_TRICKS) for every distribution of the remaining
+# cards, with optimal play of both sides. The solo player maximizes its card points, the team minimizes them. In Null
+# games the value is the number of tricks the solo player can't avoid, which it minimizes.
+#
+# Positions are indexed relative to the leader: the hands are rotated so the leader comes first, the solo player is
+# stored relative to the leader, and the three hands are ranked in the combinatorial number system (the first hand among
+# all 32 cards, the second among the cards left over and so on). Suits that are interchangeable (all four in Grand and
+# Null, the three non-trump suits in color games) are not folded together, every suit permutation has its own entry.
+# There is one table per game type and n, of shape (3, get_table_size(n)) uint8, stored as .npy and memory-mapped for
+# probing.
+#
+# Table sizes are C(32,n) * C(32-n,n) * C(32-2n,n) * 3 bytes per game type: 89 KB for n=1 and 245 MB for n=2 (about a
+# minute to build on one core). n=3 would need 141 GB per game type with this indexing, so tables stop at 2 tricks.
+#
+# ISMCTSPlayingAI(tablebase_tricks=n) looks up the last n tricks of its playouts instead of playing them out at random.
+
+MAX_TRICKS = 2
+
+TABLEBASE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebase")
+
+BINOMIAL = np.array([[comb(n, k) for k in range(MAX_TRICKS + 1)] for n in range(33)], dtype=np.int64)
+
+
+def get_table_size(n):
+    return comb(32, n) * comb(32 - n, n) * comb(32 - 2 * n, n)
+
+
+def get_tablebase_path(game_type, n, directory=TABLEBASE_DIRECTORY):
+    return os.path.join(directory, f"tablebase_{game_type}_{n}.npy")
+
+
+@njit(inline='always', cache=True)
+def rank_hand(hand, available):
+    """Rank of the cards of hand among the available cards, in the combinatorial number system"""
+    rank = 0
+    i = 0
+    while hand:
+        card = np.uint32(intrinsic.ctz(hand))
+        hand &= hand - np.uint32(1)
+        i += 1
+        rank += BINOMIAL[intrinsic.popcount(available & ((np.uint32(1) << card) - np.uint32(1))), i]
+    return rank
+
+
+@njit(cache=True)
+def unrank_hand(rank, n, available):
+    """
+    Returns:
+        np.uint32: bitmap of the n available cards with the rank (inverse of rank_hand)
+    """
+    available = np.uint32(available)
+    hand = np.uint32(0)
+    position = intrinsic.popcount(available) - 1
+    for i in range(n, 0, -1):
+        while BINOMIAL[position, i] > rank:
+            position -= 1
+        rank -= BINOMIAL[position, i]
+        # Select the available card at this position
+        remaining = available
+        for _ in range(position):
+            remaining = np.uint32(remaining & (remaining - np.uint32(1)))
+        hand = np.uint32(hand | (np.uint32(1) << np.uint32(intrinsic.ctz(remaining))))
+        position -= 1
+    return hand
+
+
+@njit(inline='always', cache=True)
+def get_position_index(hand0, hand1, hand2, n):
+    """Index of the hands in a table of n tricks, hand0 belongs to the leader"""
+    available = np.uint32(0xFFFFFFFF)
+    rank0 = rank_hand(hand0, available)
+    available = np.uint32(available & ~hand0)
+    rank1 = rank_hand(hand1, available)
+    available = np.uint32(available & ~hand1)
+    rank2 = rank_hand(hand2, available)
+    return (rank0 * BINOMIAL[32 - n, n] + rank1) * BINOMIAL[32 - 2 * n, n] + rank2
+
+
+@njit(inline='always', cache=True)
+def _choose(best, value, high):
+    if best < 0:
+        return value
+    return max(best, value) if high else min(best, value)
+
+
+@njit(cache=True)
+def solve_trick(game_type, hand0, hand1, hand2, solo, n, lower):
+    """
+    Value of a position with n tricks left by trying every card of the next trick and looking up the rest in the
+    table of n - 1 tricks.
+
+    Args:
+        hand0: bitmap of the leader, hand1 and hand2 of the next players
+        solo (int): Solo player relative to the leader (0-2)
+        lower: table of n - 1 tricks, unused if n is 1
+    """
+    normal = game_type != NULL
+    best0 = np.int64(-1)
+    cards0 = hand0
+    while cards0:
+        card0 = np.int64(intrinsic.ctz(cards0))
+        cards0 &= cards0 - np.uint32(1)
+        best1 = np.int64(-1)
+        cards1 = get_valid_actions(game_type, card0, hand1)
+        while cards1:
+            card1 = np.int64(intrinsic.ctz(cards1))
+            cards1 &= cards1 - np.uint32(1)
+            best2 = np.int64(-1)
+            cards2 = get_valid_actions(game_type, card0, hand2)
+            while cards2:
+                card2 = np.int64(intrinsic.ctz(cards2))
+                cards2 &= cards2 - np.uint32(1)
+                # The first card always beats the cards not following it, so ties can't decide the trick
+                strength0 = get_card_strength(game_type, card0, card0)
+                strength1 = get_card_strength(game_type, card1, card0)
+                strength2 = get_card_strength(game_type, card2, card0)
+                winner = 0
+                if strength1 > strength0:
+                    winner = 1
+                if strength2 > strength1 and strength2 > strength0:
+                    winner = 2
+                value = np.int64(0)
+                if winner == solo:
+                    value = np.int64(get_card_points(card0) + get_card_points(card1) + get_card_points(card2)) if normal else np.int64(1)
+                if n > 1:
+                    hands = (remove_card(hand0, card0), remove_card(hand1, card1), remove_card(hand2, card2))
+                    index = get_position_index(hands[winner], hands[(winner + 1) % 3], hands[(winner + 2) % 3], n - 1)
+                    value += np.int64(lower[(solo - winner) % 3, index])
+                best2 = _choose(best2, value, (solo == 2) == normal)
+            best1 = _choose(best1, best2, (solo == 1) == normal)
+        best0 = _choose(best0, best1, (solo == 0) == normal)
+    return best0
+
+
+@njit(parallel=True, cache=True)
+def build_table(game_type, n, lower, table):
+    """Fills table (3, get_table_size(n)) for n tricks, lower is the table for n - 1 tricks"""
+    size1 = BINOMIAL[32 - n, n]
+    size2 = BINOMIAL[32 - 2 * n, n]
+    for rank0 in prange(BINOMIAL[32, n]):
+        hand0 = unrank_hand(rank0, n, np.uint32(0xFFFFFFFF))
+        available1 = np.uint32(~hand0)
+        for rank1 in range(size1):
+            hand1 = unrank_hand(rank1, n, available1)
+            available2 = np.uint32(available1 & ~hand1)
+            for rank2 in range(size2):
+                hand2 = unrank_hand(rank2, n, available2)
+                index = (rank0 * size1 + rank1) * size2 + rank2
+                for solo in range(3):
+                    table[solo, index] = solve_trick(game_type, hand0, hand1, hand2, solo, n, lower)
+
+
+def build_tablebase(game_type, n, directory=TABLEBASE_DIRECTORY, verbose=True):
+    """
+    Builds the tables of 1 to n tricks for a game type, each one from the one before. Existing tables are reused.
+
+    Returns:
+        str: Path of the table for n tricks
+    """
+    if not 1 <= n <= MAX_TRICKS:
+        raise ValueError(f"n has to be between 1 and {MAX_TRICKS}")
+    os.makedirs(directory, exist_ok=True)
+    lower = np.zeros((3, 1), dtype=np.uint8)
+    for tricks in range(1, n + 1):
+        path = get_tablebase_path(game_type, tricks, directory)
+        if not os.path.exists(path):
+            start = perf_counter()
+            table = np.lib.format.open_memmap(path + ".part", mode="w+", dtype=np.uint8, shape=(3, get_table_size(tricks)))
+            build_table(game_type, tricks, lower, np.asarray(table))
+            table.flush()
+            del table
+            os.replace(path + ".part", path)
+            if verbose:
+                print(f"Built {path} in {perf_counter() - start:.1f} s")
+        lower = load_tablebase(game_type, tricks, directory)
+    return get_tablebase_path(game_type, n, directory)
+
+
+def load_tablebase(game_type, n, directory=TABLEBASE_DIRECTORY):
+    """
+    Returns:
+        np.array: read-only memory-mapped table for n tricks, for probe
+    """
+    return np.asarray(np.load(get_tablebase_path(game_type, n, directory), mmap_mode="r"))
+
+
+# Tables loaded by get_tablebase, by (game_type, n, directory). Memory-mapped, so all threads of a process share them.
+_loaded_tables = {}
+
+
+def get_tablebase(game_type, n, directory=TABLEBASE_DIRECTORY):
+    """
+    Returns:
+        np.array: load_tablebase(game_type, n, directory), loaded once per process, None if the table isn't built
+    """
+    key = (game_type, n, directory)
+    if key not in _loaded_tables:
+        _loaded_tables[key] = load_tablebase(game_type, n, directory) if os.path.exists(get_tablebase_path(game_type, n, directory)) else None
+    return _loaded_tables[key]
+
+
+@njit(cache=True)
+def probe(table, n, hands, leader, solo_player):
+    """
+    Args:
+        table: load_tablebase(game_type, n)
+        n (int): Tricks left, every hand has n cards and no card of the current trick is played yet
+        hands: np.uint32 array of the 3 hands
+        leader (int): Player leading the next trick
+        solo_player (int): 0-2
+
+    Returns:
+        int: Card points the solo player gets in the remaining tricks (Null: tricks it gets)
+    """
+    count(COUNTER_TABLEBASE_HITS)
+    index = get_position_index(hands[leader], hands[(leader + 1) % 3], hands[(leader + 2) % 3], n)
+    return np.int64(table[(solo_player - leader) % 3, index])
+
+
+# Usage: python tablebase.py game_type n [directory]
+if __name__ == "__main__":
+    build_tablebase(int(sys.argv[1]), int(sys.argv[2]), *sys.argv[3:4])
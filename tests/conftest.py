@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The repository has no package structure: modules import each other from the root and from reinforcement_learning
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "reinforcement_learning")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from SkatGame import SkatGame
+from WorkerPool import seed_numba
+from agents.playing.GreedyPlayingAI import GreedyPlayingAI
+from history import get_number_of_played_cards
+from skat import deal_new_cards_as_bitmaps, GRAND, EXTRA_TIER_NONE, EXTRA_TIER_SCHNEIDER, EXTRA_TIER_SCHWARZ, EXTRA_TIER_OUVERT
+from skat_text import VERBOSE_SILENT
+
+
+class ForcedGamePlayer:
+    """
+    Player 0 bids 18 and announces a fixed game, the others pass. The solo player plays greedy, the team random cards
+    of a seeded generator, so a game plays the same cards with and without claim_outcome until it is claimed.
+    """
+
+    def __init__(self, game_type, extra_tier, solo, seed):
+        self.game_type = game_type
+        self.extra_tier = extra_tier
+        self.solo = solo
+        self.rng = np.random.default_rng(seed)
+        self.greedy = GreedyPlayingAI()
+
+    def get_name(self):
+        return "ForcedGamePlayer"
+
+    def receive_hand_cards(self, hand_cards, table_position, behaviour=1):
+        self.hand_cards = hand_cards
+
+    def say(self, next_bid, history):
+        return next_bid if self.solo and next_bid == 18 else 0
+
+    def hear(self, bid, history):
+        return self.solo and bid <= 18
+
+    def pickup_skat(self, bid, history):
+        return False  # Hand, so every extra tier can be announced
+
+    def announce(self, hand_cards):
+        return self.game_type, self.extra_tier, hand_cards
+
+    def start_playing(self, game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour=1):
+        self.greedy.start_playing(game_type, extra_tier, hand_cards, position, solo_player, ouvert_hand, bidding_history, behaviour)
+
+    def play_card(self, hand_cards, valid_actions, current_trick, trick_giver, history):
+        if self.solo:
+            return self.greedy.play_card(hand_cards, valid_actions, current_trick, trick_giver, history)
+        return int(self.rng.choice([card for card in range(32) if valid_actions >> card & 1]))
+
+
+def play(game_type, extra_tier, cards, seed, claim_outcome):
+    players = [ForcedGamePlayer(game_type, extra_tier, i == 0, seed + i) for i in range(3)]
+    game = SkatGame(players, 0, cards.copy(), VERBOSE_SILENT, claim_outcome=claim_outcome)
+    result, points = game.run()
+    return (result, points.tolist(), game.solo_win, game.schneider, game.schwarz), get_number_of_played_cards(game.history)
+
+
+@pytest.mark.parametrize("extra_tier", [EXTRA_TIER_NONE, EXTRA_TIER_SCHNEIDER, EXTRA_TIER_SCHWARZ, EXTRA_TIER_OUVERT])
+def test_claimed_outcome_equals_play_out(extra_tier):
+    claimed_games = 0
+    for game_type in (0, 3, GRAND):
+        seed_numba(game_type * 10 + extra_tier)
+        for seed in range(150):
+            cards = deal_new_cards_as_bitmaps()
+            claimed, claimed_cards = play(game_type, extra_tier, cards, seed, True)
+            played, played_cards = play(game_type, extra_tier, cards, seed, False)
+            assert claimed == played
+            claimed_games += claimed_cards < played_cards
+    # Schwarz announced and Ouvert games already end with the first trick of the team, they are rarely claimed
+    assert claimed_games > 0 or extra_tier >= EXTRA_TIER_SCHWARZ
@@ -0,0 +1,39 @@
+import numpy as np
+
+from DealProducer import DealProducer
+from skat import NULL
+
+
+def pop_setups(producer, n):
+    return [producer.pop(timeout=60) for _ in range(n)]
+
+
+def assert_same_setups(a, b):
+    assert len(a) == len(b)
+    for x, y in zip(a, b):
+        for u, v in zip(x, y):
+            np.testing.assert_array_equal(u, v)
+
+
+def test_seed_reproduces_setups():
+    setups = pop_setups(DealProducer(capacity=64, batch_size=16, seed=1), 100)
+    assert_same_setups(setups, pop_setups(DealProducer(capacity=64, batch_size=16, seed=1), 100))
+    producer = DealProducer(capacity=64, batch_size=16, seed=1).start()
+    try:
+        assert_same_setups(setups, pop_setups(producer, 100))
+    finally:
+        producer.stop()
+    other = pop_setups(DealProducer(capacity=64, batch_size=16, seed=2), 100)
+    assert any((x[0] != y[0]).any() for x, y in zip(setups, other))
+
+
+def test_pop_without_start():
+    producer = DealProducer(capacity=64, batch_size=16, game_type_weights=[1, 1, 1, 1, 1, 0], max_extra_tier=1, seed=3)
+    assert len(producer) == 0
+    for cards, forehand, solo_player, game_type, extra_tier, bids, public_bids, rear_declined in pop_setups(producer, 200):
+        # Every card is dealt exactly once
+        assert np.bitwise_or.reduce(cards) == 0xFFFFFFFF and sum(bin(hand).count("1") for hand in cards) == 32
+        assert bids.max() > 0 and bids[solo_player] == bids.max()
+        assert game_type != NULL and extra_tier <= 1
+    assert producer.thread is None and not producer.running
+    assert producer.setups_produced - len(producer) == 200
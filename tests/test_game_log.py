@@ -0,0 +1,29 @@
+import numpy as np
+
+from SkatGame import SkatGame
+from WorkerPool import seed_numba
+from agents.BasicAI import BasicAI
+from skat import deal_new_cards_as_bitmaps, RESULT_PASSED
+from skat_text import VERBOSE_PRIVATE_INFO
+
+
+def test_log_matches_printed_text(capsys):
+    seed_numba(0)
+    players = np.array([BasicAI(), BasicAI(), BasicAI()])
+    games = 0
+    while games < 5:
+        game = SkatGame(players, games % 3, deal_new_cards_as_bitmaps(), VERBOSE_PRIVATE_INFO, log=True, claim_outcome=False)
+        result, _ = game.run()
+        printed = capsys.readouterr().out
+        if result == RESULT_PASSED:
+            continue
+        games += 1
+        assert printed == game.log.get_text(VERBOSE_PRIVATE_INFO) + "\n"
+
+        # Hand cards of all players before a trick and the final card distribution are on one line each
+        lines = game.log.get_lines()
+        trick_lines = [line for line in lines if line.startswith("Stich ") and "Handkarten" in line]
+        assert 1 <= len(trick_lines) <= 10  # Lost Null and Schwarz games end early
+        for i, line in enumerate(trick_lines):
+            assert line.startswith(f"Stich {i + 1} Handkarten") and all(game.get_player_text(player) in line for player in range(3))
+        assert lines[-1].startswith("Kartenverteilung war ") and "Skat: " in lines[-1]
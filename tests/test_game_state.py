@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from GameState import GameState
+from WorkerPool import seed_numba
+from skat import deal_new_cards_as_bitmaps, GRAND, NULL, EXTRA_TIER_NONE, EXTRA_TIER_SCHWARZ
+
+
+def snapshot(state):
+    return (state.hands.copy(), state.get_current_trick().copy(), state.tricks.copy(), state.leader, state.player, state.trick_number,
+            state.cards_in_trick, state.points.copy(), state.tricks_won.copy(), state.is_terminal())
+
+
+def assert_same(a, b):
+    for x, y in zip(a, b):
+        np.testing.assert_array_equal(x, y)
+
+
+@pytest.mark.parametrize("game_type, extra_tier", [(0, EXTRA_TIER_NONE), (2, EXTRA_TIER_SCHWARZ), (GRAND, EXTRA_TIER_NONE), (NULL, EXTRA_TIER_NONE)])
+def test_unmake_restores_every_position(game_type, extra_tier):
+    seed_numba(game_type)
+    rng = np.random.default_rng(game_type)
+    for _ in range(50):
+        cards = deal_new_cards_as_bitmaps()
+        state = GameState(cards[:3].copy(), cards[3], game_type, extra_tier, 0, int(rng.integers(3)))
+        snapshots = [snapshot(state)]
+        for _ in range(30):
+            legal = state.get_legal_moves()
+            state.make_move(int(rng.choice([card for card in range(32) if legal >> card & 1])))
+            snapshots.append(snapshot(state))
+        assert state.trick_number == 10 and state.is_terminal()
+        assert state.points.sum() == 120 or game_type == NULL
+        for expected in reversed(snapshots[:-1]):
+            state.unmake_move()
+            assert_same(snapshot(state), expected)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from history import new_history, add_bidding_event, add_played_card, get_forehand, get_number_of_bidding_events, get_bidding_event, \
+    get_highest_bid, get_number_of_played_cards, get_played_card, get_played_cards, get_trick, pack_played_cards, unpack_played_cards, \
+    get_read_only_view, MAX_BIDDING_EVENTS
+from skat import BIDDING_VALUES
+
+
+def test_round_trip():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        forehand = int(rng.integers(3))
+        history = new_history(forehand)
+        bids = [(int(rng.integers(3)), int(rng.choice(BIDDING_VALUES)) if rng.random() < 0.8 else 0)
+                for _ in range(rng.integers(MAX_BIDDING_EVENTS + 1))]
+        for player, bid in bids:
+            add_bidding_event(history, player, bid)
+        cards = rng.permutation(32)[:30]
+        players = rng.integers(3, size=30)
+        number_of_cards = int(rng.integers(31))
+        for i in range(number_of_cards):
+            add_played_card(history, int(players[i]), int(cards[i]))
+
+        assert get_forehand(history) == forehand
+        assert get_number_of_bidding_events(history) == len(bids)
+        assert [get_bidding_event(history, i) for i in range(len(bids))] == bids
+        assert get_highest_bid(history) == max([bid for _, bid in bids], default=0)
+        assert get_number_of_played_cards(history) == number_of_cards
+        assert [get_played_card(history, i) for i in range(number_of_cards)] == list(zip(players[:number_of_cards], cards[:number_of_cards]))
+        assert get_played_cards(history) == sum(1 << int(card) for card in cards[:number_of_cards])
+        for trick in range(10):
+            expected = np.full(3, -1)
+            for i in range(3 * trick, min(3 * trick + 3, number_of_cards)):
+                expected[players[i]] = cards[i]
+            np.testing.assert_array_equal(get_trick(history, trick), expected)
+        np.testing.assert_array_equal(unpack_played_cards(pack_played_cards(history), number_of_cards), cards[:number_of_cards])
+
+
+def test_read_only_view():
+    history = new_history(1)
+    view = get_read_only_view(history)
+    with pytest.raises(ValueError):
+        view[0] = 2
+    with pytest.raises(Exception):
+        add_played_card(view, 0, 5)
+    # The view shares memory with the history and works with the compiled accessors
+    add_played_card(history, 2, 7)
+    assert get_number_of_played_cards(view) == 1
+    assert get_played_card(view, 0) == (2, 7)
+    assert get_forehand(view) == 1
@@ -0,0 +1,53 @@
+import numpy as np
+
+from ThreadPool import ThreadPool
+from WorkerPool import seed_numba
+from agents.playing.ISMCTSPlayingAI import ISMCTSPlayingAI
+from history import new_history, add_played_card
+from skat import deal_new_cards_as_bitmaps, get_valid_actions, get_trick_winner, remove_card, is_card_present, NULL
+
+
+def find_decided_null_position():
+    """
+    A Null game where the solo player (forehand, who never holds ♦7) took the first trick, so the game is lost
+    already and the search has nothing to expand when the solo player leads the second trick.
+
+    Returns:
+        tuple: (hand of the solo player, history)
+    """
+    seed_numba(0)
+    while True:
+        cards = deal_new_cards_as_bitmaps()
+        hands = cards[:3].copy()
+        if is_card_present(hands[0], 0):
+            continue
+        trick = np.full(3, -1, dtype=np.int64)
+        trick[0] = int(np.uint32(hands[0])).bit_length() - 1  # Highest card id of the solo player
+        for player in (1, 2):
+            valid = get_valid_actions(NULL, trick[0], hands[player])
+            trick[player] = (int(valid) & -int(valid)).bit_length() - 1  # Lowest valid card
+        if get_trick_winner(NULL, trick, trick[0]) != 0:
+            continue
+        history = new_history(0)
+        for player in range(3):
+            add_played_card(history, player, trick[player])
+            hands[player] = remove_card(hands[player], trick[player])
+        return hands[0], history
+
+
+def test_decided_root_plays_a_valid_card():
+    hand, history = find_decided_null_position()
+    agent = ISMCTSPlayingAI(200, seed=0)
+    agent.start_playing(NULL, 0, hand, 0, 0, 0, None)
+    card = agent.play_card(hand, hand, np.full(3, -1), 0, history)
+    assert is_card_present(hand, card)
+
+
+def test_decided_root_plays_a_valid_card_root_parallel():
+    hand, history = find_decided_null_position()
+    with ThreadPool(2, seed=0) as pool:
+        agent = ISMCTSPlayingAI(200, pool=pool, seed=0)
+        agent.start_playing(NULL, 0, hand, 0, 0, 0, None)
+        card = agent.play_card(hand, hand, np.full(3, -1), 0, history)
+    assert agent.root_statistics[0].max() == 0
+    assert is_card_present(hand, card)
@@ -0,0 +1,72 @@
+import numpy as np
+import torch
+
+from CompactObservationExtractor import CompactObservationExtractor
+from SkatPlayingEnv import SkatPlayingEnv
+from observation import TRICKS_LAYOUT_SHIFTED, TRICKS_LAYOUT_SLOTS, convert_tricks_to_shifted, convert_tricks_to_shifted_batch, \
+    get_current_trick_index, pack_obs, unpack_obs_batch, ObservationSpec, BOOL_INDICES, FLOAT_INDICES, FEATURE_BIDS, FEATURE_AUGEN, \
+    FEATURE_VALID_ACTIONS, FEATURE_TRICKS_PLAYED
+
+
+def play_episodes(tricks_layout, episodes, **kwargs):
+    """Observations of a few seeded episodes, the trainee always plays its lowest valid card"""
+    env = SkatPlayingEnv(tricks_layout=tricks_layout, **kwargs)
+    observations = []
+    for seed in range(episodes):
+        obs, _ = env.reset(seed=seed)
+        terminated = False
+        while not terminated:
+            observations.append(obs)
+            obs, _, terminated, _, _ = env.step(int(np.argmax(env.action_masks())))
+    return observations
+
+
+def test_slots_convert_to_shifted():
+    slots = play_episodes(TRICKS_LAYOUT_SLOTS, 20)
+    shifted = play_episodes(TRICKS_LAYOUT_SHIFTED, 20)
+    assert len(slots) == len(shifted)
+    for obs_slots, obs_shifted in zip(slots, shifted):
+        np.testing.assert_array_equal(convert_tricks_to_shifted(obs_slots, get_current_trick_index(obs_slots)), obs_shifted)
+    np.testing.assert_array_equal(convert_tricks_to_shifted_batch(np.array(slots)), np.array(shifted))
+
+
+def random_observations(spec, n, rng):
+    """Random booleans and floats in 0-1 at the positions of the spec"""
+    obs = np.zeros((n, spec.size), dtype=np.float32)
+    obs[:, spec.bool_indices] = rng.integers(2, size=(n, spec.bool_indices.shape[0]))
+    obs[:, spec.float_indices] = rng.random((n, spec.float_indices.shape[0]))
+    return obs
+
+
+def assert_round_trip(obs, unpacked, spec):
+    np.testing.assert_array_equal(unpacked[:, spec.bool_indices], obs[:, spec.bool_indices])
+    assert np.abs(unpacked[:, spec.float_indices] - obs[:, spec.float_indices]).max() <= 1 / 255
+
+
+def test_compact_round_trip():
+    rng = np.random.default_rng(0)
+    full = ObservationSpec()
+    subset = ObservationSpec([FEATURE_BIDS, FEATURE_TRICKS_PLAYED, FEATURE_VALID_ACTIONS, FEATURE_AUGEN])
+    cases = [(np.array(play_episodes(TRICKS_LAYOUT_SHIFTED, 5)), full), (random_observations(full, 100, rng), full),
+             (random_observations(subset, 100, rng), subset)]
+    for obs, spec in cases:
+        packed = np.array([pack_obs(o, spec.bool_indices, spec.float_indices) for o in obs])
+        assert packed.dtype == np.uint8 and packed.shape == (obs.shape[0], spec.compact_size)
+
+        # numpy path, used by replay storage
+        unpacked = unpack_obs_batch(packed, spec if spec is subset else None)
+        assert unpacked.dtype == np.float32 and unpacked.shape == obs.shape
+        assert_round_trip(obs, unpacked, spec)
+
+        # torch path, SB3 passes the uint8 observations as float tensors
+        extractor = CompactObservationExtractor(SkatPlayingEnv(compact=True, spec=spec).observation_space, spec)
+        with torch.no_grad():
+            decoded = extractor(torch.as_tensor(packed, dtype=torch.float32)).numpy()
+        assert_round_trip(obs, decoded, spec)
+        np.testing.assert_allclose(decoded, unpacked, atol=1e-6)
+
+
+def test_compact_env_observations():
+    compact = play_episodes(TRICKS_LAYOUT_SHIFTED, 5, compact=True)
+    dense = play_episodes(TRICKS_LAYOUT_SHIFTED, 5)
+    np.testing.assert_array_equal(np.array(compact), np.array([pack_obs(obs, BOOL_INDICES, FLOAT_INDICES) for obs in dense]))
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from GameState import GameState
+from agents.playing.ISMCTSPlayingAI import new_tree, search, get_root_statistics
+from history import new_history, add_played_card
+from skat import get_valid_actions, get_trick_winner, count_points, get_bitmap, GRAND, NULL
+from tablebase import build_tablebase, load_tablebase, probe
+
+
+def get_cards(bitmap):
+    return [card for card in range(32) if bitmap >> card & 1]
+
+
+def solve_last_trick(game_type, hands, leader, solo_player):
+    """Minimax over all plays of the last trick, like the tablebase: solo points, Null: solo tricks"""
+    best = None
+    for card0 in get_cards(hands[leader]):
+        best1 = None
+        for card1 in get_cards(get_valid_actions(game_type, card0, hands[(leader + 1) % 3])):
+            best2 = None
+            for card2 in get_cards(get_valid_actions(game_type, card0, hands[(leader + 2) % 3])):
+                trick = np.full(3, -1, dtype=np.int64)
+                trick[leader], trick[(leader + 1) % 3], trick[(leader + 2) % 3] = card0, card1, card2
+                solo_takes = get_trick_winner(game_type, trick, card0) == solo_player
+                value = int(solo_takes) if game_type == NULL else count_points(get_bitmap(trick)) * solo_takes
+                best2 = choose(best2, value, game_type, (leader + 2) % 3 == solo_player)
+            best1 = choose(best1, best2, game_type, (leader + 1) % 3 == solo_player)
+        best = choose(best, best1, game_type, leader == solo_player)
+    return best
+
+
+def choose(best, value, game_type, solo_moves):
+    if best is None:
+        return value
+    high = solo_moves == (game_type != NULL)
+    return max(best, value) if high else min(best, value)
+
+
+@pytest.mark.parametrize("game_type", [0, GRAND, NULL])
+def test_probe_matches_minimax(game_type, tmp_path):
+    build_tablebase(game_type, 1, str(tmp_path), verbose=False)
+    table = load_tablebase(game_type, 1, str(tmp_path))
+    rng = np.random.default_rng(game_type)
+    for _ in range(300):
+        cards = rng.permutation(32)[:3]
+        hands = np.array([1 << int(card) for card in cards], dtype=np.uint32)
+        leader, solo_player = rng.integers(3, size=2)
+        assert probe(table, 1, hands, leader, solo_player) == solve_last_trick(game_type, hands, leader, solo_player)
+
+
+def play_to_second_to_last_trick(seed):
+    """Deals and plays the lowest valid cards for 8 tricks of a Grand, solo player 0 is forehand"""
+    deck = np.random.default_rng(seed).permutation(32)
+    history = new_history(0)
+    state = GameState(np.zeros(3, dtype=np.uint32), get_bitmap(deck[30:32]), GRAND, 0, 0, 0)
+    hands = [int(get_bitmap(deck[10 * player:10 * player + 10])) for player in range(3)]
+    state.hands[:] = hands
+    for _ in range(24):
+        card = get_cards(state.get_legal_moves())[0]
+        add_played_card(history, state.player, card)
+        state.make_move(card)
+    return state, history
+
+
+def test_search_with_tablebase(tmp_path):
+    """Searches the second to last trick of an undecided Grand, every playout ends with a table lookup"""
+    build_tablebase(GRAND, 1, str(tmp_path), verbose=False)
+    table = load_tablebase(GRAND, 1, str(tmp_path))
+    seed = 0
+    state, history = play_to_second_to_last_trick(seed)
+    while state.get_decided_outcome()[0]:
+        seed += 1
+        state, history = play_to_second_to_last_trick(seed)
+    position = state.player
+    tree = new_tree(10_000)
+    search(tree, 0, GRAND, 0, 0, position, state.hands[position], np.uint32(0), np.uint32(0), history, 500, 0.7, table, 1)
+    visits, _ = get_root_statistics(tree, 0, state.hands[position])
+    assert visits.sum() == 500
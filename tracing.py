@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import threading
+from time import perf_counter_ns
+
+# Spans are recorded into a buffer of this process and dumped in the Chrome trace event format, which can be opened
+# offline in https://ui.perfetto.dev or chrome://tracing. Every process writes its own file, merge_traces combines them.
+#
+# Tracing is sampled per unit of work (a game, an env episode, an inference batch): start_sample() decides once if the
+# spans of the unit are recorded. Call sites check the result, so unsampled units and disabled tracing cost one check.
+
+ENABLED = False
+SAMPLE_RATE = 1.0
+MAX_EVENTS = 1_000_000
+
+events = []
+dropped_events = 0
+worker_name = None
+_random = random.Random()
+
+
+def enable(sample_rate=1.0, max_events=1_000_000, name=None, seed=None):
+    """
+    Args:
+        sample_rate (float): Fraction of games/episodes/batches that are traced
+        max_events (int): Size limit of the buffer, further spans are dropped
+        name (str): Name of this process in the trace, 'worker <pid>' if None
+        seed (int): Seed for sampling
+    """
+    global ENABLED, SAMPLE_RATE, MAX_EVENTS, worker_name
+    ENABLED = True
+    SAMPLE_RATE = sample_rate
+    MAX_EVENTS = max_events
+    worker_name = name
+    _random.seed(seed)
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def clear():
+    global dropped_events
+    events.clear()
+    dropped_events = 0
+
+
+def start_sample():
+    """
+    Returns:
+        bool: If the spans of the next game/episode/batch should be recorded
+    """
+    return ENABLED and (SAMPLE_RATE >= 1.0 or _random.random() < SAMPLE_RATE)
+
+
+def now():
+    """Timestamp for add_span, in nanoseconds"""
+    return perf_counter_ns()
+
+
+def add_span(name, category, start, args=None):
+    """
+    Records a complete span from start (now()) until now
+
+    Args:
+        name (str): Shown on the span, for example 'bidding'
+        category (str): 'game', 'agent', 'env' or 'inference'
+        start (int): now() at the beginning of the span
+        args (dict): Extra information shown when selecting the span
+    """
+    global dropped_events
+    end = perf_counter_ns()
+    if len(events) >= MAX_EVENTS:
+        dropped_events += 1
+        return
+    events.append((name, category, start, end - start, threading.get_ident(), args))
+
+
+def get_trace():
+    """
+    Returns:
+        dict: The buffer of this process in Chrome trace event format
+    """
+    pid = os.getpid()
+    trace_events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": worker_name or f"worker {pid}"}}]
+    for name, category, start, duration, tid, args in events:
+        event = {"name": name, "cat": category, "ph": "X", "ts": start / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+        if args:
+            event["args"] = args
+        trace_events.append(event)
+    return {"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": {"dropped_events": dropped_events}}
+
+
+def dump(directory):
+    """
+    Writes the buffer of this process to directory/trace-<pid>.json
+
+    Returns:
+        str: Path of the written file
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"trace-{os.getpid()}.json")
+    with open(path, "w") as f:
+        json.dump(get_trace(), f)
+    return path
+
+
+def remove_traces(directory):
+    """Deletes the trace-*.json files of a directory, so an earlier run doesn't end up in the next merge_traces"""
+    if not os.path.isdir(directory):
+        return
+    for file_name in os.listdir(directory):
+        if file_name.startswith("trace-") and file_name.endswith(".json"):
+            os.remove(os.path.join(directory, file_name))
+
+
+def merge_traces(directory, path):
+    """Combines all trace-*.json files of a directory into a single trace file"""
+    trace_events = []
+    dropped = 0
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.startswith("trace-") and file_name.endswith(".json"):
+            with open(os.path.join(directory, file_name)) as f:
+                trace = json.load(f)
+            trace_events += trace["traceEvents"]
+            dropped += trace.get("otherData", {}).get("dropped_events", 0)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms", "otherData": {"dropped_events": dropped}}, f)
+
+
+class TracedPlayer:
+    """
+    Wraps a player of a sampled game and records a span for every agent decision. Everything else is passed through.
+    """
+
+    def __init__(self, player, label):
+        self.player = player
+        self.label = label
+        for method in ("say", "hear", "pickup_skat", "announce", "play_card"):
+            setattr(self, method, self._traced(method))
+
+    def _traced(self, method):
+        function = getattr(self.player, method)
+        name = f"{method} {self.label}"
+
+        def traced(*args):
+            start = perf_counter_ns()
+            result = function(*args)
+            add_span(name, "agent", start)
+            return result
+
+        return traced
+
+    def __getattr__(self, name):
+        return getattr(self.player, name)
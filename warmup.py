@@ -0,0 +1,51 @@
+from time import perf_counter
+
+import numpy as np
+
+from SkatGame import SkatGame
+from agents.BasicAI import BasicAI
+from agents.bidding.BasicBiddingAI import calculate_bid, calculate_announcement_with_skat
+from skat import add_skat_to_hand, deal_new_cards_as_bitmaps, RESULT_PASSED
+from skat_text import VERBOSE_SILENT
+
+
+def warmup(env=False, max_games=20):
+    """
+    Compiles all njit kernels of the game engine and the basic agents, so that the first real game doesn't pay for JIT.
+    Kernels are compiled with the same argument types as in real games, by bidding and playing silent games with
+    BasicAI until one game wasn't passed. With a filled numba cache (cache=True) this only loads the compiled kernels.
+    Call it once per process, for example right after starting a worker.
+
+    Args:
+        env (bool): Also compile the kernels of SkatPlayingEnv and DealProducer by playing one episode.
+            Needs reinforcement_learning on the PYTHONPATH and gymnasium installed.
+        max_games (int): Upper limit of warmup games, in case all of them are passed
+
+    Returns:
+        float: Seconds the warmup took
+    """
+    start = perf_counter()
+    players = np.array([BasicAI(), BasicAI(), BasicAI()])
+    for i in range(max_games):
+        game_result, _ = SkatGame(players, i % 3, deal_new_cards_as_bitmaps(), VERBOSE_SILENT).run()
+        if game_result != RESULT_PASSED:
+            break
+
+    # Announcement after picking up the Skat, which the warmup games might not have reached
+    cards = deal_new_cards_as_bitmaps()
+    calculate_announcement_with_skat(int(add_skat_to_hand(cards[0], cards[3])), 0, 0.95, 18)
+    # Signature used by bidding_simulation, with the default arguments
+    calculate_bid(cards[1])
+
+    if env:
+        from SkatPlayingEnv import SkatPlayingEnv
+        skat_env = SkatPlayingEnv()
+        skat_env.reset(seed=0)
+        terminated = False
+        while not terminated:
+            _, _, terminated, _, _ = skat_env.step(int(np.flatnonzero(skat_env.action_masks())[0]))
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"Warmup took {round(warmup(), 3)} seconds")